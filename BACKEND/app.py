@@ -43,7 +43,7 @@ Session(app)
 # --- SAFETY PATCH for Flask-Session bytes bug (Python 3.13 + Werkzeug) ---
 from flask.sessions import SecureCookieSessionInterface
 
-from flask import Flask, request, jsonify, render_template, send_file, session
+from flask import Flask, request, jsonify, render_template, send_file, session, Response, stream_with_context, g, has_request_context
 from flask_cors import CORS
 from flask_session import Session
 from flask.sessions import SecureCookieSessionInterface  # ✅ use Flask’s built-in interface
@@ -63,6 +63,28 @@ import tempfile
 import io
 import uuid
 import hashlib
+import hmac
+import csv
+import time
+import sqlite3
+import queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import bisect
+import heapq
+import math
+import threading
+import gc
+import mmap
+import struct
+import random
+import atexit
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
+from ingest import iter_json_records, normalize_record, unique_doc_id
 
 # Load environment variables
 load_dotenv()
@@ -104,465 +126,3789 @@ class SafeSessionInterface(SecureCookieSessionInterface):
 app.session_interface = SafeSessionInterface()
 # --- END PATCH ---
 
+# Leveled logging for request paths. Per-request lines are sampled, so a busy
+# worker does not spend its time writing to stdout; errors are always logged.
+LOG_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+LOG_LEVEL = LOG_LEVELS.get(os.getenv('LOG_LEVEL', 'info').lower(), LOG_LEVELS['info'])
+# Fraction of sampled log lines that are printed
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', 0.01))
+
+def log(level, message, sampled=False):
+    """
+    Print message if level is enabled; a sampled message is printed for
+    LOG_SAMPLE_RATE of the calls
+    """
+    if LOG_LEVELS[level] < LOG_LEVEL:
+        return
+    if sampled and random.random() >= LOG_SAMPLE_RATE:
+        return
+    print(message)
+
+# Per-worker metrics files, added up by /metrics across the workers on this host
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'bio_astra_metrics'))
+# How often a worker writes its metrics file, in seconds
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Latency histogram bucket bounds, in seconds
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRICS_HELP = {
+    'bioastra_http_requests_total': ('counter', 'HTTP requests by route, method and status'),
+    'bioastra_http_request_errors_total': ('counter', 'HTTP requests that ended in a 5xx response'),
+    'bioastra_http_request_duration_seconds': ('histogram', 'Time to produce the response headers, by route'),
+    'bioastra_stage_duration_seconds': ('histogram', 'Time spent in internal request stages'),
+}
+
+class Metrics:
+    """
+    Request counters and latency histograms of this worker process.
+
+    Gunicorn workers do not share memory, so each one writes its numbers to
+    METRICS_DIR/<pid>.json at most every METRICS_FLUSH_INTERVAL seconds (and
+    at exit), and /metrics adds up every file in the directory. The files
+    of processes that are no longer running (such as workers gunicorn has
+    restarted) are folded into METRICS_DIR/retired.json at startup and on
+    every scrape. Their counts stay in the totals, but they are not counted
+    as live processes.
+    """
+    RETIRED_FILE = 'retired.json'
+    # Seconds after which a retire.lock left by a dead process is taken over
+    RETIRE_LOCK_TIMEOUT = 60
+
+    def __init__(self, directory, flush_interval, buckets):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.buckets = buckets
+        self.counters = {}
+        # (name, labels) -> [count per bucket, then +Inf], sum
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._retire_dead()
+        except OSError as e:
+            print(f"⚠️ Metrics directory unavailable, /metrics covers this process only: {e}")
+
+    def _dead_files(self):
+        dead = []
+        for name in os.listdir(self.directory):
+            pid = name[:-len('.json')]
+            if not (name.endswith('.json') and pid.isdigit()):
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                dead.append(name)
+            except OSError:
+                pass
+        return dead
+
+    def _retire_dead(self):
+        """
+        Fold the files of dead processes into retired.json. One process at a
+        time does this, holding retire.lock (claimed with O_EXCL); the others
+        skip it until the next scrape.
+        """
+        dead = self._dead_files()
+        if not dead:
+            return
+        lock = os.path.join(self.directory, 'retire.lock')
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) < self.RETIRE_LOCK_TIMEOUT:
+                    return
+            except OSError:
+                return
+            # Left behind by a dead process: take it over
+            os.utime(lock, None)
+        try:
+            # Listed again under the lock, so no file is folded in twice
+            names = [self.RETIRED_FILE] + self._dead_files()
+            snapshots = []
+            for name in names:
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+            counters, histograms = self._merge(snapshots)
+            path = os.path.join(self.directory, self.RETIRED_FILE)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self._snapshot_of(counters, histograms), f)
+            os.replace(temp_path, path)
+            for name in names[1:]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+    def count(self, name, labels, value=1):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        key = (name, tuple(labels.items()))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Time the enclosed block as an internal stage
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('bioastra_stage_duration_seconds', {'stage': stage}, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot_of(self.counters, self.histograms)
+
+    def _snapshot_of(self, counters, histograms):
+        return {
+            "buckets": list(self.buckets),
+            "counters": [[name, list(map(list, labels)), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(map(list, labels)), list(counts), total]
+                           for (name, labels), (counts, total) in histograms.items()],
+        }
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Write this process's metrics file, unless another thread is already at it
+        """
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_flush = time.monotonic()
+            if not self.counters and not self.histograms:
+                return
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log('warning', f"⚠️ Metrics flush failed: {e}", sampled=True)
+        finally:
+            self.flush_lock.release()
+
+    def collect(self):
+        """
+        Number of live processes, and counters and histograms summed over
+        every worker's file and retired.json, with this process's current
+        numbers in place of its (older) file
+        """
+        snapshots = [self.snapshot()]
+        processes = 1
+        own_file = f"{os.getpid()}.json"
+        try:
+            self._retire_dead()
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith('.json') or name == own_file:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+            if name != self.RETIRED_FILE:
+                processes += 1
+        return (processes,) + self._merge(snapshots)
+
+    def _merge(self, snapshots):
+        """
+        Counters and histograms summed over snapshots with this process's buckets
+        """
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            if snapshot.get("buckets") != list(self.buckets):
+                continue
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return counters, histograms
+
+    def render(self):
+        """
+        The aggregated metrics in the Prometheus text exposition format
+        """
+        processes, counters, histograms = self.collect()
+
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def label_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+        lines = [
+            '# HELP bioastra_metrics_processes Worker processes included in these metrics',
+            '# TYPE bioastra_metrics_processes gauge',
+            f'bioastra_metrics_processes {processes}',
+        ]
+        for name, (kind, help_text) in METRICS_HELP.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{label_text(labels)} {value}')
+                continue
+            for (metric, labels), (counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(self.buckets) + ['+Inf'], counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{label_text(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{label_text(labels)} {total}')
+                lines.append(f'{name}_count{label_text(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics(METRICS_DIR, METRICS_FLUSH_INTERVAL, METRICS_BUCKETS)
+atexit.register(metrics.flush)
+
+# Configure Gemini API
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+print(f"🔍 GEMINI_API_KEY found: {'Yes' if GEMINI_API_KEY else 'No'}")
+if GEMINI_API_KEY:
+    print(f"🔑 API Key: {GEMINI_API_KEY[:10]}...")
+    genai.configure(api_key=GEMINI_API_KEY)
+else:
+    print("❌ No GEMINI_API_KEY found in environment variables")
+
+# LLM backend: "gemini" (default) or "stub" for offline runs and benchmarks
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini').lower()
+# Gemini models to try, in order; the first one that answers is kept
+GEMINI_MODEL_CANDIDATES = [
+    name.strip() for name in
+    os.getenv('GEMINI_MODELS', 'gemini-2.5-flash,gemini-2.0-flash,gemini-pro-latest').split(',')
+    if name.strip()
+]
+# Probe the models in a background thread at startup instead of on first use
+LLM_PROBE_ON_START = os.getenv('LLM_PROBE_ON_START', '').lower() in ('1', 'true', 'yes')
+# Simulated generation time of the stub backend, in seconds
+STUB_LLM_LATENCY = float(os.getenv('STUB_LLM_LATENCY', '0'))
+
+class LLMUnavailableError(Exception):
+    """Raised when no LLM backend can serve a request."""
+
+class LLMBackend(ABC):
+    """
+    Minimal interface /api/chat needs from a text generation backend
+    """
+    name = 'base'
+    model_name = None
+
+    @abstractmethod
+    def generate(self, prompt, timeout=None):
+        """
+        Return the complete response text for prompt, giving up after timeout seconds
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None):
+        """
+        Yield the response text for prompt in chunks as they are generated
+        """
+        yield self.generate(prompt, timeout)
+
+class GeminiBackend(LLMBackend):
+    name = 'gemini'
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def request_options(self, timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def generate(self, prompt, timeout=None):
+        return self.model.generate_content(prompt, request_options=self.request_options(timeout)).text
+
+    def stream(self, prompt, timeout=None):
+        for chunk in self.model.generate_content(prompt, stream=True, request_options=self.request_options(timeout)):
+            if chunk.text:
+                yield chunk.text
+
+class StubBackend(LLMBackend):
+    """
+    Local stand-in that answers instantly (or after STUB_LLM_LATENCY) with a
+    deterministic markdown answer, so the app runs and benchmarks offline
+    """
+    name = 'stub'
+    model_name = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def answer(self, prompt):
+        question = next((line[len('User Question:'):].strip() for line in prompt.splitlines()
+                         if line.startswith('User Question:')), '')
+        return (
+            f"**Stub answer** to: *{question or 'your question'}*\n\n"
+            "- This response comes from the local stub backend\n"
+            "- Set LLM_BACKEND=gemini and GEMINI_API_KEY for real answers"
+        )
+
+    def generate(self, prompt, timeout=None):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.answer(prompt)
+
+    def stream(self, prompt, timeout=None):
+        # One chunk per word, with the latency spread across them
+        chunks = re.findall(r'\S+\s*', self.answer(prompt))
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+class LLMClient:
+    """
+    Lazily selected LLM backend.
+
+    Nothing touches the network at import time: the Gemini model is chosen
+    on the first generate() call (or by an optional background probe) by
+    trying GEMINI_MODEL_CANDIDATES in order, and the first one that answers
+    is cached for the life of the process.
+    """
+    def __init__(self, backend_name, candidates, api_key):
+        self.backend_name = backend_name
+        self.candidates = candidates
+        self.api_key = api_key
+        self.backend = StubBackend(STUB_LLM_LATENCY) if backend_name == 'stub' else None
+        self.status = 'ready' if self.backend else 'pending'
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return self.backend is not None or (self.backend_name == 'gemini' and bool(self.api_key))
+
+    def describe(self):
+        """
+        Backend state for /api/health
+        """
+        return {
+            "backend": self.backend_name,
+            "model": self.backend.model_name if self.backend else None,
+            "status": self.status if self.configured else 'unconfigured',
+            "error": self.last_error
+        }
+
+    def model_key(self):
+        """
+        Identifies what would answer a prompt, independent of which worker
+        selected which model: the stub, or the ordered Gemini candidates
+        """
+        if self.backend_name == 'stub':
+            return 'stub'
+        return f"{self.backend_name}:{','.join(self.candidates)}"
+
+    def start_probe(self):
+        """
+        Select the model in a daemon thread with a tiny prompt, so the first
+        chat does not pay for it. A probe started in a preloading master does
+        not survive fork; workers then select lazily.
+        """
+        if self.backend or not self.configured:
+            return
+        self.status = 'probing'
+        threading.Thread(target=self._probe, name='llm-probe', daemon=True).start()
+
+    def _probe(self):
+        try:
+            self.generate("Hello")
+        except LLMUnavailableError:
+            pass
+
+    def _select(self, attempt):
+        """
+        Run attempt(backend) on the selected backend, selecting one first if
+        needed: the first candidate model for which attempt succeeds is kept.
+        Returns (backend, result).
+        """
+        with self.lock:
+            if self.backend is not None:
+                return self.backend, attempt(self.backend)
+            self.status = 'selecting'
+            for model_name in self.candidates:
+                try:
+                    candidate = GeminiBackend(model_name)
+                    result = attempt(candidate)
+                except Exception as e:
+                    print(f"❌ Error with {model_name}: {e}")
+                    self.last_error = f"{model_name}: {e}"
+                    continue
+                self.backend = candidate
+                self.status = 'ready'
+                self.last_error = None
+                print(f"✅ Gemini API configured successfully with {model_name}")
+                return candidate, result
+            self.status = 'error'
+            raise LLMUnavailableError(f"All model attempts failed: {self.last_error}")
+
+    def generate(self, prompt, timeout=None):
+        backend = self.backend
+        if backend is not None:
+            return backend.generate(prompt, timeout)
+        if not self.configured:
+            raise LLMUnavailableError("Gemini API not configured. Please set GEMINI_API_KEY environment variable.")
+        return self._select(lambda candidate: candidate.generate(prompt, timeout))[1]
+
+    def stream(self, prompt, timeout=None):
+        """
+        Yield response chunks. While no model is selected yet, a candidate
+        counts as working once it produced its first chunk.
+        """
+        backend = self.backend
+        if backend is not None:
+            yield from backend.stream(prompt, timeout)
+            return
+        if not self.configured:
+            raise LLMUnavailableError("Gemini API not configured. Please set GEMINI_API_KEY environment variable.")
+
+        def first_chunk(candidate):
+            chunks = candidate.stream(prompt, timeout)
+            return chunks, next(chunks, None)
+
+        _, (chunks, first) = self._select(first_chunk)
+        if first is not None:
+            yield first
+        yield from chunks
+
+llm_client = LLMClient(LLM_BACKEND, GEMINI_MODEL_CANDIDATES, GEMINI_API_KEY)
+if LLM_PROBE_ON_START:
+    llm_client.start_probe()
+
+# Request threads per worker; must match --threads in the procfile
+WEB_THREADS = int(os.getenv('WEB_THREADS', 12))
+# Request threads per worker that chats may never take, kept for search, papers and exports
+LLM_RESERVED_THREADS = int(os.getenv('LLM_RESERVED_THREADS', 4))
+# A chat holds its request thread while its call runs or waits for a slot,
+# so running and waiting calls together must fit in the remaining threads
+LLM_THREAD_BUDGET = max(WEB_THREADS - LLM_RESERVED_THREADS, 1)
+# Concurrent LLM calls per worker process, and how many more may wait for a slot
+LLM_MAX_CONCURRENCY = min(int(os.getenv('LLM_MAX_CONCURRENCY', (LLM_THREAD_BUDGET + 1) // 2)), LLM_THREAD_BUDGET)
+LLM_MAX_QUEUE = min(int(os.getenv('LLM_MAX_QUEUE', LLM_THREAD_BUDGET)), LLM_THREAD_BUDGET - LLM_MAX_CONCURRENCY)
+# Seconds a chat waits for a queue position before it is turned away
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 0.05))
+
+class LLMOverloadedError(Exception):
+    """Raised when the LLM executor has no free slot; carries a Retry-After hint."""
+    def __init__(self, retry_after, message="The assistant is busy right now. Please try again shortly."):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call misses its deadline."""
+    def __init__(self):
+        super().__init__("The assistant took too long to answer. Please try again.")
+
+class LLMExecutor:
+    """
+    Bounded pool that runs LLM calls off the request thread.
+
+    At most max_concurrency calls run at once and max_queue more may wait;
+    beyond that, admission fails fast with LLMOverloadedError so a burst of
+    chats cannot tie up the threads that serve search and paper requests.
+    Hedged attempts take their slot from the same budget, and only when
+    one is free to run right away.
+    The pool is created lazily in each process, since threads do not
+    survive a preloading master's fork.
+    """
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pool_pid = None
+        self.active = 0
+        self.waiting = 0
+        self.counts = {"admitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        # Moving average of call durations, for Retry-After
+        self.average_seconds = 5.0
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None or self.pool_pid != os.getpid():
+                self.pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='llm')
+                self.pool_pid = os.getpid()
+            return self.pool
+
+    def retry_after(self):
+        """
+        Seconds until a slot is likely free: one average call per full round of the queue
+        """
+        rounds = 1 + self.waiting // max(self.max_concurrency, 1)
+        return max(1, math.ceil(self.average_seconds * rounds))
+
+    def _admit(self, queue=True):
+        with self.lock:
+            full = not queue and self.active + self.waiting >= self.max_concurrency
+        if full or not self.slots.acquire(timeout=self.queue_timeout if queue else 0):
+            with self.lock:
+                self.counts["rejected"] += 1
+            raise LLMOverloadedError(self.retry_after())
+        with self.lock:
+            self.counts["admitted"] += 1
+            self.waiting += 1
+
+    def _run(self, fn, args):
+        with self.lock:
+            self.waiting -= 1
+            self.active += 1
+        started = time.perf_counter()
+        outcome = "failed"
+        try:
+            result = fn(*args)
+            outcome = "completed"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.active -= 1
+                self.counts[outcome] += 1
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * elapsed
+            self.slots.release()
+
+    def submit(self, fn, *args, queue=True):
+        """
+        Admit fn(*args) or raise LLMOverloadedError; returns a Future.
+        With queue=False, the call is only admitted if it can start at once.
+        """
+        self._admit(queue)
+        try:
+            return self._pool().submit(self._run, fn, args)
+        except Exception:
+            with self.lock:
+                self.waiting -= 1
+            self.slots.release()
+            raise
+
+    def stream(self, make_chunks, *args, deadline=None):
+        """
+        Admit a streaming call or raise LLMOverloadedError. The chunks of
+        make_chunks(*args) are produced on a pool thread and handed over
+        through a queue; closing the returned generator stops the producer
+        at its next chunk. Past the time.monotonic() deadline, the generator
+        raises LLMTimeoutError.
+        """
+        chunks = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in make_chunks(*args):
+                    if cancelled.is_set():
+                        break
+                    chunks.put(chunk)
+            except Exception as e:
+                chunks.put(e)
+                raise
+            finally:
+                chunks.put(done)
+
+        self.submit(produce)
+
+        def consume():
+            try:
+                while True:
+                    try:
+                        item = chunks.get(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        raise LLMTimeoutError() from None
+                    if item is done:
+                        return
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                cancelled.set()
+
+        return consume()
+
+    def stats(self):
+        """
+        Pool usage of this worker for /api/health
+        """
+        with self.lock:
+            stats = dict(self.counts)
+            stats.update({
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "average_seconds": round(self.average_seconds, 3)
+            })
+        return stats
+
+llm_executor = LLMExecutor(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+def overloaded_response(error):
+    """
+    503 with a Retry-After header for a chat turned away by the LLM executor
+    """
+    response = jsonify({
+        "success": False,
+        "error": str(error),
+        "retry_after": error.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+# Seconds a chat may wait for the model, including retries
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', 45))
+# Send a second, hedged attempt when the first is slower than the recent p95
+LLM_HEDGE = os.getenv('LLM_HEDGE', '').lower() in ('1', 'true', 'yes')
+LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', 1.0))
+# Consecutive failures that open the circuit, and seconds before a trial call
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))
+
+class LLMCircuitOpenError(LLMOverloadedError):
+    """Raised without calling the model while the circuit breaker is open."""
+    def __init__(self, retry_after):
+        super().__init__(retry_after, "The assistant is temporarily unavailable. Please try again shortly.")
+
+class LatencyTracker:
+    """
+    Durations of the most recent successful calls, for percentile estimates
+    """
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, fraction, min_samples=20):
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+class CircuitBreaker:
+    """
+    Closed until threshold consecutive failures, then open: calls fail
+    immediately for reset_timeout seconds. After that a single trial call
+    is let through (half-open); its outcome closes or reopens the circuit.
+    A trial that has not reported back within trial_timeout seconds is
+    taken as lost and the next call becomes the trial.
+    """
+    def __init__(self, threshold, reset_timeout, trial_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = None
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def check(self):
+        """
+        Return whether the call is the half-open trial if it may proceed,
+        else raise LLMCircuitOpenError
+        """
+        with self.lock:
+            if self.state == 'closed':
+                return False
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.trial_started = None
+            if self.state == 'half_open' and (
+                self.trial_started is None or now - self.trial_started >= self.trial_timeout
+            ):
+                self.trial_started = now
+                return True
+            retry_after = max(1, math.ceil(self.opened_at + self.reset_timeout - now))
+        raise LLMCircuitOpenError(retry_after)
+
+    def cancel_trial(self):
+        """
+        The call allowed by check() never reached the model
+        """
+        with self.lock:
+            self.trial_started = None
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trial_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    print(f"⚠️ LLM circuit opened after {self.failures} consecutive failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trial_started = None
+
+    def describe(self):
+        with self.lock:
+            state = self.state
+            if state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                state = 'half_open'
+            return {
+                "state": state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened
+            }
+
+class LLMGuard:
+    """
+    Deadlines, hedging and failure isolation around the LLM executor.
+
+    Each chat gets LLM_DEADLINE seconds in total. With LLM_HEDGE, a second
+    attempt is sent if the first has not answered by the recent p95 latency,
+    and whichever finishes first wins. Failures and timeouts feed a circuit
+    breaker; while it is open, chats fail fast with a 503 instead of
+    queueing behind a broken upstream. Streams are not hedged.
+    """
+    def __init__(self, client, executor, deadline, hedge, hedge_min_delay, breaker):
+        self.client = client
+        self.executor = executor
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.lock = threading.Lock()
+        self.counts = {"timeouts": 0, "hedged": 0, "hedge_wins": 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def _attempt(self, prompt, timeout):
+        started = time.perf_counter()
+        with metrics.stage('llm_call'):
+            text = self.client.generate(prompt, timeout)
+        self.latency.record(time.perf_counter() - started)
+        return text
+
+    def hedge_delay(self):
+        if not self.hedge:
+            return None
+        p95 = self.latency.percentile(0.95)
+        return None if p95 is None else max(p95, self.hedge_min_delay)
+
+    def submit(self, prompt):
+        """
+        Admit a generate call, raising LLMCircuitOpenError or
+        LLMOverloadedError right away; returns a function that waits for
+        the answer and raises LLMTimeoutError past the deadline
+        """
+        trial = self.breaker.check()
+        deadline = time.monotonic() + self.deadline
+        try:
+            first = self.executor.submit(self._attempt, prompt, self.deadline)
+        except LLMOverloadedError:
+            if trial:
+                self.breaker.cancel_trial()
+            raise
+        return PendingAnswer(self, prompt, first, deadline)
+
+    def _wait(self, prompt, first, deadline):
+        pending = [first]
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None:
+            done, _ = wait(pending, timeout=min(hedge_delay, max(deadline - time.monotonic(), 0)))
+            remaining = deadline - time.monotonic()
+            if not done and remaining > 0:
+                try:
+                    pending.append(self.executor.submit(self._attempt, prompt, remaining, queue=False))
+                    self._count("hedged")
+                except LLMOverloadedError:
+                    pass
+
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                if future.exception() is None:
+                    self.breaker.record_success()
+                    if future is not first:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+
+        self.breaker.record_failure()
+        if pending:
+            self._count("timeouts")
+            raise LLMTimeoutError()
+        raise error
+
+    def stream(self, prompt):
+        """
+        Admit a streaming call like submit(); the returned GuardedStream
+        raises LLMTimeoutError if the stream has not finished by the deadline
+        and must be closed by the caller
+        """
+        trial = self.breaker.check()
+        try:
+            chunks = self.executor.stream(
+                self.client.stream, prompt, self.deadline,
+                deadline=time.monotonic() + self.deadline
+            )
+        except LLMOverloadedError:
+            if trial:
+                self.breaker.cancel_trial()
+            raise
+        return GuardedStream(self, chunks, trial)
+
+    def stats(self):
+        """
+        Deadline, hedging and breaker state for /api/health
+        """
+        with self.lock:
+            stats = dict(self.counts)
+        p95 = self.latency.percentile(0.95)
+        stats.update({
+            "deadline_seconds": self.deadline,
+            "hedging": self.hedge,
+            "p95_seconds": None if p95 is None else round(p95, 3),
+            "circuit": self.breaker.describe()
+        })
+        return stats
+
+class PendingAnswer:
+    """
+    An admitted generate call; calling it waits for the answer. A caller
+    that gives up before waiting must abandon() it, so the breaker still
+    hears how the call went.
+    """
+    def __init__(self, guard, prompt, first, deadline):
+        self.guard = guard
+        self.prompt = prompt
+        self.first = first
+        self.deadline = deadline
+
+    def __call__(self):
+        return self.guard._wait(self.prompt, self.first, self.deadline)
+
+    def abandon(self):
+        self.first.add_done_callback(self._settle)
+
+    def _settle(self, future):
+        if future.exception() is None:
+            self.guard.breaker.record_success()
+        else:
+            self.guard.breaker.record_failure()
+
+class GuardedStream:
+    """
+    Chunks of an admitted LLM stream that report to the circuit breaker
+    once: success when they run out, failure when they raise. A stream
+    closed before that, or never read because the client went away, says
+    nothing about the model, so close() hands a half-open trial back.
+    """
+    def __init__(self, guard, chunks, trial):
+        self.guard = guard
+        self.chunks = chunks
+        self.trial = trial
+        self.started = None
+        self.settled = False
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.settled:
+            raise StopIteration
+        if self.started is None:
+            self.started = time.perf_counter()
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            self._settle(self.guard.breaker.record_success)
+            raise
+        except LLMTimeoutError:
+            self.guard._count("timeouts")
+            self._settle(self.guard.breaker.record_failure)
+            raise
+        except Exception:
+            self._settle(self.guard.breaker.record_failure)
+            raise
+
+    def close(self):
+        self.chunks.close()
+        if self.trial:
+            self._settle(self.guard.breaker.cancel_trial)
+        else:
+            self._settle(None)
+
+    def _settle(self, outcome):
+        with self.lock:
+            if self.settled:
+                return
+            self.settled = True
+        if self.started is not None:
+            metrics.observe('bioastra_stage_duration_seconds', {'stage': 'llm_stream'}, time.perf_counter() - self.started)
+        if outcome is not None:
+            outcome()
+
+llm_guard = LLMGuard(
+    llm_client, llm_executor, LLM_DEADLINE, LLM_HEDGE, LLM_HEDGE_MIN_DELAY,
+    CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET, LLM_DEADLINE)
+)
+
+# Bump when the chat prompt template changes so cached answers are not reused
+CHAT_PROMPT_VERSION = 2
+DEFAULT_CHAT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'CACHE', 'chat_answers.sqlite3')
+# SQLite file shared by all workers; an empty value keeps the cache in memory only
+CHAT_CACHE_PATH = os.getenv('CHAT_CACHE_PATH', DEFAULT_CHAT_CACHE_PATH)
+CHAT_CACHE_TTL = float(os.getenv('CHAT_CACHE_TTL', 7 * 24 * 3600))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv('CHAT_CACHE_MAX_ENTRIES', 1024))
+# Paper fields the chat prompt reads
+CHAT_CONTEXT_FIELDS = ('title', 'category', 'authors', 'keywords', 'abstract', 'conclusion', 'pmcid')
+# Corpus papers whose prompt prefix is kept built
+CHAT_PREFIX_CACHE_SIZE = int(os.getenv('CHAT_PREFIX_CACHE_SIZE', 1024))
+
+def normalize_question(question):
+    """
+    Case-, whitespace- and trailing-punctuation-insensitive form of a question
+    """
+    return ' '.join(question.lower().split()).rstrip(' ?!.')
+
+def chat_cache_key(prefix_hash, question, model_key, conversation=''):
+    """
+    Hash of the prompt prefix (paper context), the normalized question, the
+    earlier conversation if any, and the model/prompt version
+    """
+    question_hash = hashlib.sha256(normalize_question(question).encode('utf-8')).hexdigest()
+    key = f"{CHAT_PROMPT_VERSION}:{model_key}:{prefix_hash}:{question_hash}"
+    if conversation:
+        key += ":" + hashlib.sha256(conversation.encode('utf-8')).hexdigest()
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+def thread_sqlite_connection(local, path, schema):
+    """
+    SQLite connection of the current thread (kept on the threading.local),
+    reopened after a fork; creates the file, WAL mode and schema on first use
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is not None and local.pid == os.getpid():
+        return conn
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in schema:
+        conn.execute(statement)
+    local.conn = conn
+    local.pid = os.getpid()
+    return conn
+
+class AnswerCache:
+    """
+    Two-tier cache of generated chat answers.
+
+    The first tier is a per-process LRU with a TTL; the second is a SQLite
+    file shared by every worker on the host, so an answer generated by one
+    worker is served by all of them. Storage errors are logged and treated
+    as misses: the cache never fails a chat request.
+    """
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _connection(self):
+        return thread_sqlite_connection(self.local, self.path, (
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, answer TEXT NOT NULL, model TEXT, created REAL NOT NULL)",
+        ))
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def _remember(self, key, expires, answer):
+        with self.lock:
+            self.entries[key] = (expires, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.counts["memory_hits"] += 1
+                    return entry[1]
+                del self.entries[key]
+
+        if self.path:
+            try:
+                row = self._connection().execute(
+                    "SELECT answer, created FROM answers WHERE key = ? AND created > ?",
+                    (key, now - self.ttl)
+                ).fetchone()
+            except sqlite3.Error as e:
+                log('warning', f"⚠️ Chat cache read failed: {e}", sampled=True)
+                self._count("errors")
+                row = None
+            if row is not None:
+                self._remember(key, row[1] + self.ttl, row[0])
+                self._count("disk_hits")
+                return row[0]
+
+        self._count("misses")
+        return None
+
+    def put(self, key, answer, model=None):
+        now = time.time()
+        self._remember(key, now + self.ttl, answer)
+        self._count("stores")
+        if not self.path:
+            return
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, model, created) VALUES (?, ?, ?, ?)",
+                    (key, answer, model, now)
+                )
+                conn.execute("DELETE FROM answers WHERE created <= ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            log('warning', f"⚠️ Chat cache write failed: {e}", sampled=True)
+            self._count("errors")
+
+    def stats(self):
+        """
+        Hit/miss counters of this worker for /api/health
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            size = len(self.entries)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        counts.update({
+            "memory_entries": size,
+            "persistent": bool(self.path),
+            "hit_rate": round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 4) if lookups else None
+        })
+        return counts
+
+answer_cache = AnswerCache(CHAT_CACHE_PATH, CHAT_CACHE_TTL, CHAT_CACHE_MAX_ENTRIES)
+
+def markdown_to_html(text):
+    """
+    Convert markdown formatting to HTML for better display
+    """
+    if not text:
+        return text
+    renderer = MarkdownStreamRenderer()
+    return renderer.feed(text) + renderer.close()
+
+class MarkdownStreamRenderer:
+    """
+    Single-pass markdown to HTML for chat answers, used on whole answers by
+    markdown_to_html and on streamed chunks by /api/chat/stream.
+
+    feed() takes text as it arrives and returns the HTML of the lines it
+    completed; close() returns the HTML of the last line and closes an open
+    list. Each line is classified once (bullet, numbered item, heading or
+    text) and its **bold** / *italic* markers are paired in one scan over
+    the '*' positions; the open list and the unfinished last line are the
+    only state carried between chunks. Lines are joined with <br>.
+    """
+    NUMBERED_ITEM = re.compile(r'(\d+)\.\s+(.*)')
+    HEADING = re.compile(r'#{1,6}\s+(.*)')
+
+    def __init__(self):
+        self.pending = ''
+        self.list_tag = None
+        self.started = False
+
+    def feed(self, chunk):
+        if '\n' not in chunk:
+            self.pending += chunk
+            return ''
+        complete, self.pending = (self.pending + chunk).rsplit('\n', 1)
+        return ''.join([self._line(line) for line in complete.split('\n')])
+
+    def close(self):
+        if not self.started and not self.pending:
+            return ''
+        html = self._line(self.pending)
+        self.pending = ''
+        return html + self._close_list()
+
+    def _line(self, line):
+        stripped = line.strip()
+        if stripped[:2] in ('- ', '* '):
+            return self._list_item('ul', self.inline(stripped[2:].strip()))
+        if line[:1].isdigit():
+            match = self.NUMBERED_ITEM.match(line)
+            if match:
+                return self._list_item('ol', f'<strong>{match.group(1)}.</strong> {self.inline(match.group(2))}')
+        html = self._close_list()
+        if stripped[:1] == '#':
+            match = self.HEADING.match(stripped)
+            if match:
+                return html + self._output(f'<strong>{self.inline(match.group(1))}</strong>')
+        return html + self._output(self.inline(line))
+
+    def _list_item(self, tag, content):
+        html = ''
+        if self.list_tag != tag:
+            html = self._close_list() + self._output(f'<{tag}>')
+            self.list_tag = tag
+        return html + self._output(f'<li>{content}</li>')
+
+    def _close_list(self):
+        if self.list_tag is None:
+            return ''
+        tag, self.list_tag = self.list_tag, None
+        return self._output(f'</{tag}>')
+
+    def _output(self, line):
+        if self.started:
+            return '<br>' + line
+        self.started = True
+        return line
+
+    @staticmethod
+    def inline(text):
+        """
+        **bold** and *italic* within one line; unpaired markers stay literal
+        """
+        if '*' not in text:
+            return text
+        pieces = []
+        open_bold = open_italic = None
+        position = 0
+        while True:
+            star = text.find('*', position)
+            if star < 0:
+                pieces.append(text[position:])
+                break
+            pieces.append(text[position:star])
+            if text.startswith('**', star):
+                if open_bold is None:
+                    open_bold = len(pieces)
+                    pieces.append('**')
+                else:
+                    pieces[open_bold] = '<strong>'
+                    pieces.append('</strong>')
+                    open_bold = None
+                position = star + 2
+            else:
+                if open_italic is None:
+                    open_italic = len(pieces)
+                    pieces.append('*')
+                else:
+                    pieces[open_italic] = '<em>'
+                    pieces.append('</em>')
+                    open_italic = None
+                position = star + 1
+        return ''.join(pieces)
+
+def format_list(items):
+    """
+    Join a list of strings or author/keyword dicts for the chat prompt
+    """
+    if not items:
+        return 'N/A'
+    if isinstance(items, list):
+        # Handle both strings and dictionaries
+        formatted_items = []
+        for item in items:
+            if isinstance(item, dict):
+                # Extract name or term from dictionary
+                if 'name' in item:
+                    formatted_items.append(item['name'])
+                elif 'term' in item:
+                    formatted_items.append(item['term'])
+                else:
+                    formatted_items.append(str(item))
+            else:
+                formatted_items.append(str(item))
+        return ', '.join(formatted_items)
+    return str(items)
+
+CHAT_PROMPT_INTRO = (
+    "\nYou are a specialized AI assistant for space biology research papers. "
+    "You have access to the following research paper information:\n\n"
+)
+
+CHAT_PROMPT_INSTRUCTIONS = """
+
+Please provide a helpful, accurate response based on the research paper information provided. If the question is not directly related to this specific paper, you can still provide general information about space biology topics, but make it clear when you're doing so.
+
+IMPORTANT FORMATTING INSTRUCTIONS:
+- Use **bold text** for important terms, concepts, and key findings
+- Use *italic text* for emphasis and technical terms
+- Use bullet points (- or *) for lists and key points
+- Use numbered lists (1. 2. 3.) for step-by-step processes
+- Structure your response with clear headings and sections
+- Make the response easy to read and well-formatted
+
+Guidelines:
+1. Be specific and reference the paper when relevant
+2. Use scientific terminology appropriately
+3. Provide clear explanations
+4. If you don't have enough information from the paper, say so
+5. Keep responses concise but informative
+6. Focus on space biology and research methodology when relevant
+7. Use proper markdown formatting for better readability
+
+"""
+
+def build_chat_prompt_prefix(paper_context):
+    """
+    Everything in the chat prompt except the question: instructions and the
+    paper, so all questions about a paper share one stable prefix
+    """
+    return f"""{CHAT_PROMPT_INTRO}Title: {paper_context.get('title', 'N/A')}
+Category: {paper_context.get('category', 'N/A')}
+Authors: {format_list(paper_context.get('authors', []))}
+Keywords: {format_list(paper_context.get('keywords', []))}
+Abstract: {paper_context.get('abstract', 'N/A')}
+Conclusion: {paper_context.get('conclusion', 'N/A')}
+PMCID: {paper_context.get('pmcid', 'N/A')}{CHAT_PROMPT_INSTRUCTIONS}"""
+
+def build_chat_prompt(prompt_prefix, user_message, conversation=''):
+    """
+    Create context-aware prompt with formatting instructions
+    """
+    if conversation:
+        return f"{prompt_prefix}{conversation}\n\nUser Question: {user_message}\n"
+    return f"{prompt_prefix}User Question: {user_message}\n"
+
+@lru_cache(maxsize=CHAT_PREFIX_CACHE_SIZE)
+def paper_prompt_prefix(version, ordinal):
+    """
+    Prompt prefix of a corpus paper and its hash, built on first use and
+    kept per corpus version. `version` is that of current_corpus().
+    """
+    papers = current_corpus()['research_data']
+    context = {name: papers.field(ordinal, name) for name in CHAT_CONTEXT_FIELDS}
+    prefix = build_chat_prompt_prefix(context)
+    return prefix, hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+
+def resolve_chat_context(data):
+    """
+    Prompt prefix, its hash and the context to keep in the chat history for
+    a chat request. A "doc_id" (the id in /api/research/<doc_id>, unique
+    even where PMCIDs repeat) is resolved against the loaded corpus, as is a
+    "pmcid" carried by exactly one paper; None if neither finds a paper.
+    Otherwise the client's "paper_context" is used as sent.
+    """
+    doc_id = data.get('doc_id')
+    pmcid = data.get('pmcid')
+    if doc_id or pmcid:
+        corpus = current_corpus()
+        papers = corpus['research_data']
+        if doc_id:
+            ordinal = papers.ordinals.get(str(doc_id))
+        else:
+            ordinals = papers.pmcid_ordinals.get(str(pmcid), [])
+            ordinal = ordinals[0] if len(ordinals) == 1 else None
+        if ordinal is None:
+            return None
+        prefix, prefix_hash = paper_prompt_prefix(corpus['version'], ordinal)
+        return prefix, prefix_hash, {
+            'doc_id': papers.doc_ids[ordinal],
+            'pmcid': papers.field(ordinal, 'pmcid'),
+            'title': papers.field(ordinal, 'title')
+        }
+    paper_context = data.get('paper_context') or {}
+    prefix = build_chat_prompt_prefix(paper_context)
+    return prefix, hashlib.sha256(prefix.encode('utf-8')).hexdigest(), paper_context
+
+PDF_TAG = re.compile(r'<[^>]+>')
+PDF_ENTITY = re.compile(r'&(?:nbsp|lt|gt|amp);')
+PDF_ENTITIES = {'&nbsp;': ' ', '&lt;': '<', '&gt;': '>', '&amp;': '&'}
+
+def clean_html_for_pdf(html_text):
+    """
+    Clean HTML text for PDF generation by removing HTML tags and converting to plain text
+    """
+    if not html_text:
+        return html_text
+    
+    # Remove HTML tags
+    clean_text = PDF_TAG.sub('', html_text)
+    
+    # Convert HTML entities, all in one substitution (only if there are any)
+    if '&' in clean_text:
+        clean_text = PDF_ENTITY.sub(lambda match: PDF_ENTITIES[match.group()], clean_text)
+    
+    # Collapse whitespace runs into single spaces and trim the ends
+    return ' '.join(clean_text.split())
+
+# Session store: "memory" (per worker) or "sqlite" (shared by the workers on a host)
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory').lower()
+DEFAULT_SESSION_STORE_PATH = os.path.join(os.path.dirname(__file__), 'CACHE', 'sessions.sqlite3')
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', DEFAULT_SESSION_STORE_PATH)
+SESSION_MAX_ENTRIES = int(os.getenv('SESSION_MAX_ENTRIES', 10000))
+# Seconds without activity after which a session and its history are dropped
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', 3600))
+# Messages kept per session
+CHAT_HISTORY_SIZE = int(os.getenv('CHAT_HISTORY_SIZE', 50))
+# Seconds between sweeps for idle sessions
+SESSION_SWEEP_INTERVAL = 60
+
+class SessionStore(ABC):
+    """
+    Per-user chat state: a bounded message history and the rolling
+    conversation summaries. Sessions are evicted least recently used first
+    beyond max_entries, and dropped after idle_ttl seconds without activity.
+    """
+    def __init__(self, max_entries, idle_ttl, history_size):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.history_size = history_size
+        self.last_sweep = 0.0
+
+    @abstractmethod
+    def touch(self, user_id):
+        """
+        Create the session if needed and record activity
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_message(self, user_id, message):
+        raise NotImplementedError
+
+    @abstractmethod
+    def history(self, user_id):
+        """
+        Oldest-first copy of the stored messages
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_history(self, user_id):
+        """
+        Forget the messages and summaries of a session
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def summary(self, user_id, paper_key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_summary(self, user_id, paper_key, summary):
+        raise NotImplementedError
+
+    @abstractmethod
+    def sweep(self, now):
+        """
+        Drop sessions idle for longer than idle_ttl
+        """
+        raise NotImplementedError
+
+    def maybe_sweep(self):
+        now = time.time()
+        if now - self.last_sweep >= SESSION_SWEEP_INTERVAL:
+            self.last_sweep = now
+            self.sweep(now)
+
+    @abstractmethod
+    def stats(self):
+        raise NotImplementedError
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in an OrderedDict kept in least-recently-used order, each with
+    its history in a deque ring buffer. Private to one worker process.
+    """
+    name = 'memory'
+
+    def __init__(self, max_entries, idle_ttl, history_size):
+        super().__init__(max_entries, idle_ttl, history_size)
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+
+    def _session(self, user_id):
+        session_data = self.sessions.get(user_id)
+        now = time.time()
+        if session_data is None:
+            session_data = {
+                'created_at': now,
+                'last_activity': now,
+                'chat_history': deque(maxlen=self.history_size),
+                'summaries': {}
+            }
+            self.sessions[user_id] = session_data
+            while len(self.sessions) > self.max_entries:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            session_data['last_activity'] = now
+            self.sessions.move_to_end(user_id)
+        return session_data
+
+    def touch(self, user_id):
+        self.maybe_sweep()
+        with self.lock:
+            self._session(user_id)
+
+    def append_message(self, user_id, message):
+        with self.lock:
+            self._session(user_id)['chat_history'].append(message)
+
+    def history(self, user_id):
+        with self.lock:
+            session_data = self.sessions.get(user_id)
+            return list(session_data['chat_history']) if session_data else []
+
+    def clear_history(self, user_id):
+        with self.lock:
+            session_data = self.sessions.get(user_id)
+            if session_data:
+                session_data['chat_history'].clear()
+                session_data['summaries'].clear()
+
+    def summary(self, user_id, paper_key):
+        with self.lock:
+            session_data = self.sessions.get(user_id)
+            summary = session_data['summaries'].get(paper_key) if session_data else None
+            return {'through': summary['through'], 'lines': list(summary['lines'])} if summary else None
+
+    def set_summary(self, user_id, paper_key, summary):
+        with self.lock:
+            self._session(user_id)['summaries'][paper_key] = summary
+
+    def sweep(self, now):
+        with self.lock:
+            # Least recently active first: stop at the first live session
+            while self.sessions:
+                user_id, session_data = next(iter(self.sessions.items()))
+                if now - session_data['last_activity'] < self.idle_ttl:
+                    break
+                del self.sessions[user_id]
+                self.expired += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "backend": self.name,
+                "sessions": len(self.sessions),
+                "max_entries": self.max_entries,
+                "idle_ttl_seconds": self.idle_ttl,
+                "evicted": self.evicted,
+                "expired": self.expired
+            }
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by every worker on the host, so a
+    user's history follows them whichever worker serves the request. The
+    history is a ring buffer of the newest history_size rows per user.
+    """
+    name = 'sqlite'
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        "user_id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_activity REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS sessions_activity ON sessions (last_activity)",
+        "CREATE TABLE IF NOT EXISTS messages ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, message TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS messages_user ON messages (user_id, id)",
+        "CREATE TABLE IF NOT EXISTS summaries ("
+        "user_id TEXT NOT NULL, paper_key TEXT NOT NULL, summary TEXT NOT NULL, "
+        "PRIMARY KEY (user_id, paper_key))",
+    )
+
+    def __init__(self, path, max_entries, idle_ttl, history_size):
+        super().__init__(max_entries, idle_ttl, history_size)
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        return thread_sqlite_connection(self.local, self.path, self.SCHEMA)
+
+    def _delete_sessions(self, conn, where, params):
+        """
+        Delete the sessions matching where, with their messages and summaries
+        """
+        for table in ('messages', 'summaries', 'sessions'):
+            conn.execute(f"DELETE FROM {table} WHERE user_id IN (SELECT user_id FROM sessions WHERE {where})", params)
+
+    def touch(self, user_id):
+        self.maybe_sweep()
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO sessions (user_id, created_at, last_activity) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET last_activity = excluded.last_activity",
+                (user_id, now, now)
+            )
+
+    def append_message(self, user_id, message):
+        self.touch(user_id)
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT INTO messages (user_id, message) VALUES (?, ?)", (user_id, json.dumps(message)))
+            conn.execute(
+                "DELETE FROM messages WHERE user_id = ? AND id <= "
+                "(SELECT id FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (user_id, user_id, self.history_size)
+            )
+
+    def history(self, user_id):
+        rows = self._connection().execute(
+            "SELECT message FROM messages WHERE user_id = ? ORDER BY id", (user_id,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear_history(self, user_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM summaries WHERE user_id = ?", (user_id,))
+
+    def summary(self, user_id, paper_key):
+        row = self._connection().execute(
+            "SELECT summary FROM summaries WHERE user_id = ? AND paper_key = ?", (user_id, paper_key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_summary(self, user_id, paper_key, summary):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (user_id, paper_key, summary) VALUES (?, ?, ?)",
+                (user_id, paper_key, json.dumps(summary))
+            )
+
+    def sweep(self, now):
+        conn = self._connection()
+        with conn:
+            self._delete_sessions(conn, "last_activity < ?", (now - self.idle_ttl,))
+            # Least recently active sessions beyond the capacity limit
+            self._delete_sessions(
+                conn,
+                "user_id NOT IN (SELECT user_id FROM sessions ORDER BY last_activity DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        count = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "backend": self.name,
+            "sessions": count,
+            "max_entries": self.max_entries,
+            "idle_ttl_seconds": self.idle_ttl
+        }
+
+if SESSION_STORE == 'sqlite':
+    session_store = SQLiteSessionStore(SESSION_STORE_PATH, SESSION_MAX_ENTRIES, SESSION_IDLE_TTL, CHAT_HISTORY_SIZE)
+else:
+    session_store = MemorySessionStore(SESSION_MAX_ENTRIES, SESSION_IDLE_TTL, CHAT_HISTORY_SIZE)
+print(f"Session store: {session_store.name}")
+
+def get_or_create_user_session():
+    """
+    Get or create a user session to prevent chat mixing between users.
+    Includes a defensive fix to ensure user_id is a string, preventing
+    TypeError with recent Werkzeug versions.
+    """
+    
+    # Check if user_id exists in the session
+    if 'user_id' not in session:
+        # Create new user session
+        user_id = str(uuid.uuid4())
+        session['user_id'] = user_id
+        
+    user_id = session['user_id']
+
+    # --- Defensive Fix for Werkzeug/Flask-Session Incompatibility ---
+    # The session data might be returned as bytes by the session interface,
+    # causing an error later when setting the cookie. We explicitly decode it.
+    if isinstance(user_id, bytes):
+        try:
+            # Decode the user ID to a standard Python string
+            user_id = user_id.decode('utf-8')
+            # Update the session with the decoded string value
+            session['user_id'] = user_id
+        except UnicodeDecodeError:
+            # If decoding fails (shouldn't happen for UUID), log and generate a new session
+            print("🚨 ERROR: Failed to decode user_id from session. Generating new ID.")
+            user_id = str(uuid.uuid4())
+            session['user_id'] = user_id
+    # -----------------------------------------------------------------
+
+    # Create the stored session if needed (new user, eviction or restart) and update last activity
+    session_store.touch(user_id)
+    
+    return user_id
+
+def add_to_chat_history(user_id, message_type, content, paper_context=None):
+    """
+    Add message to user's chat history
+    """
+    message = {
+        'type': message_type,
+        'content': content,
+        'timestamp': datetime.now().isoformat(),
+        'paper_context': paper_context or {}
+    }
+    
+    session_store.append_message(user_id, message)
+
+def get_user_chat_history(user_id):
+    """
+    Get user's chat history
+    """
+    return session_store.history(user_id)
+
+# Approximate tokens of earlier turns sent verbatim with a question
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 1200))
+# Approximate tokens of the rolling summary that stands in for older turns
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_TOKEN_BUDGET', 300))
+
+def estimate_tokens(text):
+    """
+    Rough token count (about four characters per token), enough for budgeting
+    """
+    return (len(text) + 3) // 4
+
+def chat_paper_key(paper_context):
+    """
+    Which paper a history entry belongs to; conversations are per paper
+    """
+    paper_context = paper_context or {}
+    return str(paper_context.get('doc_id') or paper_context.get('pmcid') or paper_context.get('title') or '')
+
+def summarize_history_entry(entry):
+    """
+    One summary line for a history entry: its first sentence, without markdown
+    """
+    text = re.sub(r'[*#`_]+', '', ' '.join(entry['content'].split()))
+    first_sentence = re.split(r'(?<=[.!?])\s', text, 1)[0]
+    if len(first_sentence) > 200:
+        first_sentence = first_sentence[:197] + '...'
+    return f"{'User' if entry['type'] == 'question' else 'Assistant'}: {first_sentence}"
+
+def build_conversation_context(user_id, paper_context):
+    """
+    Earlier turns about the same paper that fit CHAT_HISTORY_TOKEN_BUDGET,
+    newest first, preceded by a rolling summary of the turns that no longer
+    fit. The summary is kept in the session and only extended with the
+    turns that left the window since the last call, so each turn is
+    summarized once however long the conversation runs.
+    """
+    paper_key = chat_paper_key(paper_context)
+    history = [entry for entry in session_store.history(user_id)
+               if chat_paper_key(entry.get('paper_context')) == paper_key]
+
+    recent = []
+    used = 0
+    for entry in reversed(history):
+        line = f"{'User' if entry['type'] == 'question' else 'Assistant'}: {entry['content']}"
+        cost = estimate_tokens(line) + 1
+        if used + cost > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        recent.append(line)
+        used += cost
+    recent.reverse()
+    older = history[:len(history) - len(recent)]
+
+    summary = session_store.summary(user_id, paper_key) or {'through': '', 'lines': []}
+    new_entries = [entry for entry in older if entry['timestamp'] > summary['through']]
+    if new_entries:
+        summary['lines'].extend(summarize_history_entry(entry) for entry in new_entries)
+        summary['through'] = new_entries[-1]['timestamp']
+        # Drop the oldest lines once the summary outgrows its budget
+        while len(summary['lines']) > 1 and sum(estimate_tokens(line) + 1 for line in summary['lines']) > CHAT_SUMMARY_TOKEN_BUDGET:
+            summary['lines'].pop(0)
+        session_store.set_summary(user_id, paper_key, summary)
+
+    parts = []
+    if summary['lines']:
+        parts.append("Summary of the earlier conversation:\n" + "\n".join(summary['lines']))
+    if recent:
+        parts.append("Recent conversation:\n" + "\n".join(recent))
+    return "\n\n".join(parts)
+
+class PromptTokenStats:
+    """
+    Estimated prompt tokens per chat request, for /api/health
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.total = 0
+        self.max = 0
+        self.history_total = 0
+
+    def record(self, prompt_tokens, history_tokens):
+        with self.lock:
+            self.requests += 1
+            self.total += prompt_tokens
+            self.max = max(self.max, prompt_tokens)
+            self.history_total += history_tokens
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "mean_prompt_tokens": round(self.total / self.requests, 1) if self.requests else None,
+                "max_prompt_tokens": self.max,
+                "mean_history_tokens": round(self.history_total / self.requests, 1) if self.requests else None,
+                "history_token_budget": CHAT_HISTORY_TOKEN_BUDGET,
+                "summary_token_budget": CHAT_SUMMARY_TOKEN_BUDGET
+            }
+
+prompt_token_stats = PromptTokenStats()
+
+@lru_cache(maxsize=None)
+def chat_pdf_styles():
+    """
+    Paragraph styles of the chat export, built once per process
+    """
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1,  # Center alignment
+        textColor=colors.darkblue
+    )
+    
+    question_style = ParagraphStyle(
+        'Question',
+        parent=styles['Normal'],
+        fontSize=12,
+        spaceAfter=12,
+        leftIndent=20,
+        textColor=colors.darkgreen,
+        fontName='Helvetica-Bold'
+    )
+    
+    answer_style = ParagraphStyle(
+        'Answer',
+        parent=styles['Normal'],
+        fontSize=11,
+        spaceAfter=20,
+        leftIndent=40,
+        textColor=colors.black
+    )
+    
+    paper_info_style = ParagraphStyle(
+        'PaperInfo',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=20,
+        textColor=colors.grey,
+        fontName='Helvetica-Oblique'
+    )
+    
+    return {
+        'title': title_style,
+        'question': question_style,
+        'answer': answer_style,
+        'paper_info': paper_info_style
+    }
+
+def create_chat_pdf(chat_data, paper_title="Research Paper Discussion", user_id=None):
+    """
+    Create a PDF from chat conversation data with custom filename
+    """
+    # Create in-memory PDF buffer and filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"Bio_Astra_{timestamp}.pdf"
+    pdf_buffer = io.BytesIO()
+    
+    # Create PDF document
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, 
+                          rightMargin=72, leftMargin=72, 
+                          topMargin=72, bottomMargin=18)
+    
+    styles = chat_pdf_styles()
+    title_style = styles['title']
+    question_style = styles['question']
+    answer_style = styles['answer']
+    paper_info_style = styles['paper_info']
+    
+    # Build content
+    story = []
+    
+    # Title
+    story.append(Paragraph("Bio-Astra Dashboard - Chat Export", title_style))
+    story.append(Spacer(1, 20))
+    
+    # User session info
+    if user_id:
+        story.append(Paragraph(f"<b>Session ID:</b> {user_id[:8]}...", paper_info_style))
+        story.append(Spacer(1, 10))
+    
+    # Paper information
+    if paper_title and paper_title != "Research Paper Discussion":
+        story.append(Paragraph(f"<b>Paper:</b> {paper_title}", paper_info_style))
+        story.append(Spacer(1, 10))
+    
+    # Date and time
+    current_time = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+    story.append(Paragraph(f"<b>Exported on:</b> {current_time}", paper_info_style))
+    story.append(Spacer(1, 20))
+    
+    # Chat messages
+    for i, message in enumerate(chat_data):
+        if message.get('type') == 'question':
+            # User question
+            question_text = clean_html_for_pdf(message.get('content', ''))
+            story.append(Paragraph(f"<b>Question {i//2 + 1}:</b> {question_text}", question_style))
+            story.append(Spacer(1, 10))
+            
+        elif message.get('type') == 'answer':
+            # AI response
+            answer_text = clean_html_for_pdf(message.get('content', ''))
+            story.append(Paragraph(f"<b>Answer:</b>", answer_style))
+            story.append(Paragraph(answer_text, answer_style))
+            story.append(Spacer(1, 20))
+    
+    # Build PDF
+    doc.build(story)
+    pdf_buffer.seek(0)
+    
+    return pdf_buffer, filename
+
+DEFAULT_EXPORT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'CACHE', 'exports')
+# Directory of rendered chat PDFs, shared by the workers on a host
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', DEFAULT_EXPORT_CACHE_DIR)
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+# Seconds a rendered PDF is kept for identical re-exports
+EXPORT_CACHE_TTL = float(os.getenv('EXPORT_CACHE_TTL', 24 * 3600))
+# Seconds after which a job that never finished is presumed dead and may be restarted
+EXPORT_JOB_TIMEOUT = 300
+EXPORT_JOB_ID_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+def export_job_id(user_id, paper_title, chat_messages):
+    """
+    Hash of everything that goes into a chat PDF: session, title and messages
+    """
+    payload = json.dumps(
+        [user_id, paper_title, [(message.get('type'), message.get('content')) for message in chat_messages]],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ExportJobs:
+    """
+    Chat PDF exports rendered on a small background pool.
+
+    A job's id is export_job_id() of its inputs, and the finished PDF is
+    written to <directory>/<id>.pdf, so any worker can report its status or
+    serve it, and exporting an unchanged conversation again is answered
+    from the file. A .pending marker (claimed with O_EXCL, holding the
+    renderer's pid) shows a job in progress to the other workers; a .error
+    file records a failure. Markers and temporary files of processes that
+    are no longer running are removed at startup.
+    """
+    def __init__(self, directory, workers, ttl):
+        self.directory = directory
+        self.workers = workers
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pool = None
+        self.pool_pid = None
+        self.last_prune = 0.0
+        self._remove_dead()
+
+    def _remove_dead(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                # <job id>.<pid>.<thread>.tmp
+                pid = name.split('.')[-3]
+            elif name.endswith('.pending'):
+                try:
+                    with open(path, 'r') as f:
+                        pid = f.read().strip()
+                except OSError:
+                    continue
+            else:
+                continue
+            try:
+                stale = now - os.path.getmtime(path) >= EXPORT_JOB_TIMEOUT
+                if not stale and pid.isdigit():
+                    os.kill(int(pid), 0)
+            except ProcessLookupError:
+                stale = True
+            except OSError:
+                pass
+            if stale:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None or self.pool_pid != os.getpid():
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='export')
+                self.pool_pid = os.getpid()
+            return self.pool
+
+    def path(self, job_id, suffix='.pdf'):
+        return os.path.join(self.directory, job_id + suffix)
+
+    def status(self, job_id):
+        """
+        {"status": "done" | "pending" | "failed", ...} or None for an unknown job
+        """
+        if os.path.exists(self.path(job_id)):
+            return {"status": "done"}
+        try:
+            if time.time() - os.path.getmtime(self.path(job_id, '.pending')) < EXPORT_JOB_TIMEOUT:
+                return {"status": "pending"}
+        except OSError:
+            pass
+        try:
+            with open(self.path(job_id, '.error'), 'r') as f:
+                return {"status": "failed", "error": f.read()}
+        except OSError:
+            return None
+
+    def _claim(self, job_id):
+        """
+        Create the .pending marker; False if a live job already holds it
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        marker = self.path(job_id, '.pending')
+        try:
+            fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(marker) < EXPORT_JOB_TIMEOUT:
+                    return False
+            except OSError:
+                pass
+            # Left behind by a dead job: take it over
+            fd = os.open(marker, os.O_CREAT | os.O_TRUNC | os.O_WRONLY)
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def _render(self, job_id, chat_messages, paper_title, user_id):
+        try:
+            with metrics.stage('pdf_build'):
+                pdf_buffer, _ = create_chat_pdf(chat_messages, paper_title, user_id)
+            temp_path = self.path(job_id, f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with open(temp_path, 'wb') as f:
+                f.write(pdf_buffer.getbuffer())
+            os.replace(temp_path, self.path(job_id))
+        except Exception as e:
+            log('error', f"Export error: {str(e)}")
+            with open(self.path(job_id, '.error'), 'w') as f:
+                f.write(str(e))
+        finally:
+            try:
+                os.remove(self.path(job_id, '.pending'))
+            except OSError:
+                pass
+
+    def submit(self, job_id, chat_messages, paper_title, user_id):
+        """
+        Start rendering unless the PDF exists or is being rendered; returns the job status
+        """
+        self.prune()
+        status = self.status(job_id)
+        if status is not None and status["status"] != "failed":
+            return status
+        if not self._claim(job_id):
+            return {"status": "pending"}
+        try:
+            os.remove(self.path(job_id, '.error'))
+        except OSError:
+            pass
+        self._pool().submit(self._render, job_id, list(chat_messages), paper_title, user_id)
+        return {"status": "pending"}
+
+    def render_now(self, job_id, chat_messages, paper_title, user_id):
+        """
+        Path of the PDF, rendered in the calling thread unless already
+        cached. If another thread or worker is rendering the same job, its
+        result is waited for instead of rendering it twice.
+        """
+        give_up = time.monotonic() + EXPORT_JOB_TIMEOUT
+        while not os.path.exists(self.path(job_id)):
+            if self._claim(job_id):
+                try:
+                    os.remove(self.path(job_id, '.error'))
+                except OSError:
+                    pass
+                self._render(job_id, chat_messages, paper_title, user_id)
+                break
+            if time.monotonic() >= give_up:
+                raise RuntimeError("PDF rendering timed out")
+            time.sleep(0.1)
+        status = self.status(job_id)
+        if status is None or status["status"] != "done":
+            raise RuntimeError((status or {}).get("error", "PDF rendering failed"))
+        return self.path(job_id)
+
+    def download_name(self, job_id):
+        rendered_at = datetime.fromtimestamp(os.path.getmtime(self.path(job_id)))
+        return f"Bio_Astra_{rendered_at.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+    def prune(self):
+        """
+        Remove PDFs and error files older than the TTL, at most once a minute
+        """
+        now = time.time()
+        if now - self.last_prune < 60:
+            return
+        self.last_prune = now
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(('.pdf', '.error')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+export_jobs = ExportJobs(EXPORT_CACHE_DIR, EXPORT_WORKERS, EXPORT_CACHE_TTL)
+
+# Source folders of the corpus (overridable, e.g. to serve a synthetic corpus)
+RESEARCH_PAPER_DATA_DIR = os.getenv('RESEARCH_PAPER_DATA_DIR', os.path.join(os.path.dirname(__file__), 'RESEARCH_PAPER_DATA'))
+SEARCHES_DIR = os.getenv('SEARCHES_DIR', os.path.join(os.path.dirname(__file__), 'SEARCHES'))
+
+# Load search data
+def load_search_data():
+    searches_path = SEARCHES_DIR
+    search_data = {}
+    
+    if os.path.exists(searches_path):
+        for filename in os.listdir(searches_path):
+            if filename.endswith('.json'):
+                search_type = filename.replace('.json', '')
+                with open(os.path.join(searches_path, filename), 'r') as f:
+                    search_data[search_type] = json.load(f)
+    
+    return search_data
+
+def research_source_files():
+    """
+    (relative name, path) of every RESEARCH_PAPER_DATA file, sorted
+    """
+    return [(name, path) for name, path in corpus_source_files() if name.startswith('RESEARCH_PAPER_DATA/')]
+
+def normalize_research_file(path):
+    """
+    Normalized (pmcid, paper) pairs of one RESEARCH_PAPER_DATA file, in file
+    order, read incrementally. .ndjson files are corpora written by
+    ingest.py and already normalized.
+    """
+    if path.endswith('.ndjson'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    paper = json.loads(line)
+                    yield paper['pmcid'], paper
+    else:
+        for kind, record in iter_json_records(path):
+            yield normalize_record(kind, record)
+
+def assemble_research_data(file_entries):
+    """
+    Doc id -> normalized paper over the (pmcid, paper) entries of every
+    research file, in order
+    """
+    research_data = {}
+    # Papers seen per PMCID, so repeated ids get -2, -3, ... suffixes
+    pmcid_counts = {}
+    for entries in file_entries:
+        for pmcid, paper in entries:
+            research_data[unique_doc_id(pmcid, pmcid_counts, research_data)] = paper
+    return research_data
+
+# Load research paper data
+def load_research_data():
+    return assemble_research_data(normalize_research_file(path) for _, path in research_source_files())
+
+class TextColumn:
+    """
+    Read-only sequence of strings packed into one UTF-8 blob plus offsets.
+
+    A single bytes object instead of one str per value is far smaller for
+    long texts, and reading it never touches per-value refcounts, so the
+    pages stay shared between forked workers. Values are decoded on access.
+    """
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, values):
+        offsets = array('Q', [0])
+        parts = []
+        position = 0
+        for value in values:
+            encoded = (value or '').encode('utf-8')
+            parts.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(b''.join(parts), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    @property
+    def nbytes(self):
+        return len(self.blob) + self.offsets.itemsize * len(self.offsets)
+
+class PaperStore(Mapping):
+    """
+    Compact, read-only column store for the research corpus.
+
+    Behaves like the research_data dict (doc id -> normalized paper) but
+    holds papers as ordinal-indexed columns: long texts in TextColumns,
+    category and year as small ints into shared tables, keywords and
+    authors as id lists into shared, interned tables. The boilerplate
+    'doi', 'results', 'explore_more' and 'knowledge_graph' values are
+    synthesized on access; the rare paper whose values differ from the
+    synthesized ones keeps them in `overrides`.
+    """
+    TEXT_FIELDS = ('title', 'abstract', 'overview', 'conclusion', 'summary', 'link')
+    # Shared value tables, and the per-paper id arrays pointing into them
+    TABLES = ('categories', 'years', 'keywords', 'authors')
+    ID_ARRAYS = ('category_ids', 'year_ids', 'keyword_offsets', 'keyword_ids', 'author_offsets', 'author_ids')
+    DEFAULT_RESULTS = 'Research results and findings from the study.'
+    DEFAULT_LINK = 'https://www.ncbi.nlm.nih.gov/'
+
+    def __init__(self, papers):
+        """
+        Build the columns from a dict of doc id -> normalized paper, as
+        returned by load_research_data()
+        """
+        self.doc_ids = []
+        self.ordinals = {}
+        self.overrides = {}
+
+        # Shared value tables and the per-paper ids pointing into them
+        self.categories, self.years, self.keywords, self.authors = [], [], [], []
+        table_ids = {'category': {}, 'year': {}, 'keyword': {}, 'author': {}}
+        self.category_ids = array('H')
+        self.year_ids = array('H')
+        self.keyword_offsets, self.keyword_ids = array('I', [0]), array('I')
+        self.author_offsets, self.author_ids = array('I', [0]), array('I')
+
+        def table_id(kind, table, value):
+            ids = table_ids[kind]
+            try:
+                return ids[value]
+            except KeyError:
+                ids[value] = len(table)
+                table.append(sys.intern(value) if isinstance(value, str) else value)
+                return ids[value]
+            except TypeError:
+                # Unhashable value: store it unshared
+                table.append(value)
+                return len(table) - 1
+
+        text_values = {field: [] for field in self.TEXT_FIELDS}
+        for ordinal, (doc_id, paper) in enumerate(papers.items()):
+            doc_id = sys.intern(doc_id)
+            self.doc_ids.append(doc_id)
+            self.ordinals[doc_id] = ordinal
+
+            overrides = {}
+            pmcid = paper.get('pmcid', doc_id)
+            if pmcid != doc_id:
+                overrides['pmcid'] = pmcid
+
+            for field in self.TEXT_FIELDS:
+                if field == 'link':
+                    continue
+                value = paper.get(field, '')
+                if not isinstance(value, str):
+                    overrides[field] = value
+                    value = ''
+                text_values[field].append(value)
+            text_values['link'].append(self._ncbi_link(paper.get('explore_more')))
+
+            self.category_ids.append(table_id('category', self.categories, paper.get('category', '')))
+            self.year_ids.append(table_id('year', self.years, paper.get('year', 2023)))
+            keywords = paper.get('keywords', [])
+            authors = paper.get('authors', [])
+            if not isinstance(keywords, list):
+                overrides['keywords'] = keywords
+                keywords = []
+            if not isinstance(authors, list):
+                overrides['authors'] = authors
+                authors = []
+            self.keyword_ids.extend(table_id('keyword', self.keywords, k) for k in keywords)
+            self.keyword_offsets.append(len(self.keyword_ids))
+            self.author_ids.extend(table_id('author', self.authors, a) for a in authors)
+            self.author_offsets.append(len(self.author_ids))
+
+            if overrides:
+                self.overrides[ordinal] = overrides
+
+        self.text = {field: TextColumn.from_values(values) for field, values in text_values.items()}
+
+        # Keep only what the synthesized boilerplate does not reproduce
+        for ordinal, paper in enumerate(papers.values()):
+            synthesized = self.paper(ordinal)
+            differing = {key: value for key, value in paper.items() if synthesized.get(key) != value}
+            if differing:
+                self.overrides.setdefault(ordinal, {}).update(differing)
+
+    @classmethod
+    def from_columns(cls, doc_ids, text, tables, id_arrays, overrides):
+        """
+        Assemble a store from prebuilt columns, e.g. a memory-mapped snapshot.
+        doc_ids and the text columns may be any sequences of str.
+        """
+        store = cls.__new__(cls)
+        store.doc_ids = doc_ids
+        store.text = text
+        for name in cls.TABLES:
+            setattr(store, name, tables[name])
+        for name in cls.ID_ARRAYS:
+            setattr(store, name, id_arrays[name])
+        store.overrides = overrides
+        return store
+
+    @cached_property
+    def ordinals(self):
+        """
+        Doc id -> ordinal (built eagerly from JSON, lazily for snapshots)
+        """
+        return {doc_id: ordinal for ordinal, doc_id in enumerate(self.doc_ids)}
+
+    @cached_property
+    def pmcid_ordinals(self):
+        """
+        PMCID -> ordinals of every paper carrying it (PMCIDs may repeat)
+        """
+        pmcid_ordinals = {}
+        for ordinal in range(len(self.doc_ids)):
+            pmcid_ordinals.setdefault(self.field(ordinal, 'pmcid'), []).append(ordinal)
+        return pmcid_ordinals
+
+    @staticmethod
+    def _ncbi_link(explore_more):
+        if not isinstance(explore_more, list):
+            return ''
+        return next((x.get('url') for x in explore_more if isinstance(x, dict) and x.get('title', '').lower().startswith('ncbi')), '') or ''
+
+    def __getitem__(self, doc_id):
+        return self.paper(self.ordinals[doc_id])
+
+    def __contains__(self, doc_id):
+        return doc_id in self.ordinals
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def field(self, ordinal, name):
+        """
+        One field of a paper without synthesizing the whole record
+        """
+        overrides = self.overrides.get(ordinal)
+        if overrides and name in overrides:
+            return overrides[name]
+        if name in self.text and name != 'link':
+            return self.text[name][ordinal]
+        if name == 'pmcid':
+            return self.doc_ids[ordinal]
+        if name == 'category':
+            return self.categories[self.category_ids[ordinal]]
+        if name == 'year':
+            return self.years[self.year_ids[ordinal]]
+        if name == 'keywords':
+            return [self.keywords[i] for i in self.keyword_ids[self.keyword_offsets[ordinal]:self.keyword_offsets[ordinal + 1]]]
+        if name == 'authors':
+            return [self.authors[i] for i in self.author_ids[self.author_offsets[ordinal]:self.author_offsets[ordinal + 1]]]
+        return self.paper(ordinal).get(name)
+
+    def link(self, ordinal):
+        """
+        NCBI publication URL of a paper
+        """
+        overrides = self.overrides.get(ordinal)
+        if overrides and 'explore_more' in overrides:
+            return self._ncbi_link(overrides['explore_more'])
+        return self.text['link'][ordinal]
+
+    def paper(self, ordinal):
+        """
+        Full normalized paper dict, in the shape load_research_data() builds
+        """
+        field = self.field
+        pmcid = field(ordinal, 'pmcid')
+        category = field(ordinal, 'category')
+        keywords = field(ordinal, 'keywords')
+        kg_category = category or 'Space Biology'
+        paper = {
+            'pmcid': pmcid,
+            'title': field(ordinal, 'title'),
+            'authors': field(ordinal, 'authors'),
+            'keywords': keywords,
+            'category': category,
+            'year': field(ordinal, 'year'),
+            'doi': f"10.1038/spacebio.{pmcid}",
+            'abstract': field(ordinal, 'abstract'),
+            'overview': field(ordinal, 'overview'),
+            'results': self.DEFAULT_RESULTS,
+            'conclusion': field(ordinal, 'conclusion'),
+            'summary': field(ordinal, 'summary'),
+            'explore_more': [
+                {
+                    'title': 'NCBI Publication',
+                    'url': self.text['link'][ordinal] or self.DEFAULT_LINK
+                },
+                {
+                    'title': 'Related NASA Research',
+                    'url': 'https://www.nasa.gov/space-biology'
+                }
+            ],
+            'knowledge_graph': {
+                'authors': [{'name': 'Authors', 'expertise': [kg_category], 'publications': 1, 'collaborations': 1}],
+                'keywords': [{'term': keyword, 'frequency': 1, 'related_terms': []} for keyword in keywords] if isinstance(keywords, list) else [],
+                'category': {
+                    'name': kg_category,
+                    'subcategories': [kg_category],
+                    'related_categories': ['Space Biology', 'Research']
+                }
+            }
+        }
+        overrides = self.overrides.get(ordinal)
+        if overrides:
+            paper.update(overrides)
+        return paper
+
+    def legacy_record(self, ordinal, fields=None):
+        """
+        Legacy-shaped /api/research-papers record, optionally projected to fields
+        """
+        getters = {
+            "Experiment No.": lambda: ordinal + 1,
+            "Title": lambda: self.field(ordinal, 'title'),
+            "Link": lambda: self.link(ordinal),
+            "PMCId": lambda: self.field(ordinal, 'pmcid'),
+            "Category": lambda: self.field(ordinal, 'category'),
+            "Study Year": lambda: self.field(ordinal, 'year'),
+            "Abstract": lambda: self.field(ordinal, 'abstract'),
+            "Summary": lambda: self.field(ordinal, 'summary'),
+        }
+        return {name: getters[name]() for name in (fields or LEGACY_RECORD_FIELDS)}
+
+    def memory_usage(self):
+        """
+        Approximate bytes held by the columns and tables (excluding overrides)
+        """
+        arrays = (self.category_ids, self.year_ids, self.keyword_offsets,
+                  self.keyword_ids, self.author_offsets, self.author_ids)
+        tables = (self.categories, self.years, self.keywords, self.authors, self.doc_ids)
+        total = sum(column.nbytes for column in self.text.values())
+        total += sum(a.itemsize * len(a) for a in arrays)
+        total += sum(sys.getsizeof(t) + sum(sys.getsizeof(v) for v in t) for t in tables)
+        total += sys.getsizeof(self.ordinals)
+        return total
+
+# Terms are lowercase alphanumeric runs, for both indexing and queries
+SEARCH_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Page size bounds for /api/search
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 200
+
+# Shortest query token matched anywhere inside indexed terms; shorter ones match term starts
+SEARCH_INFIX_MIN_LENGTH = 3
+
+# Keys that carry the PMCID in list-shaped SEARCHES files (e.g. Search_By_Title)
+SEARCH_PMCID_KEYS = ('PMCID', 'PMCId', 'pmcid')
+
+def tokenize(text):
+    """
+    Split text into normalized search terms
+    """
+    if not text:
+        return []
+    return SEARCH_TOKEN_PATTERN.findall(str(text).lower())
+
+class Postings:
+    """
+    Term id -> sorted paper ordinals (and optionally term frequencies), stored
+    as CSR arrays: the entries of term t are ordinals[offsets[t]:offsets[t + 1]].
+    """
+    def __init__(self, offsets, ordinals, frequencies=None):
+        self.offsets = offsets
+        self.ordinals = ordinals
+        self.frequencies = frequencies
+
+    @classmethod
+    def from_terms(cls, term_postings, vocabulary, with_frequencies=False):
+        """
+        Compact {term: {ordinal: tf}} (or {term: set of ordinals}) into CSR
+        arrays following the order of vocabulary
+        """
+        offsets = array('I', [0])
+        ordinals = array('I')
+        frequencies = array('I') if with_frequencies else None
+        for term in vocabulary:
+            entries = term_postings.get(term)
+            if entries:
+                for ordinal in sorted(entries):
+                    ordinals.append(ordinal)
+                    if with_frequencies:
+                        frequencies.append(entries[ordinal])
+            offsets.append(len(ordinals))
+        return cls(offsets, ordinals, frequencies)
+
+    def ordinals_for(self, term_id):
+        return self.ordinals[self.offsets[term_id]:self.offsets[term_id + 1]]
+
+    def frequencies_for(self, term_id):
+        return self.frequencies[self.offsets[term_id]:self.offsets[term_id + 1]]
+
+class TermSuffixes:
+    """
+    Every suffix of every vocabulary term, in sorted order: suffix i is
+    vocabulary[terms[i]][offsets[i]:]. The suffixes starting with a token
+    form one contiguous range found by bisection, and their terms are the
+    terms containing the token anywhere.
+    """
+    def __init__(self, vocabulary, terms, offsets):
+        self.vocabulary = vocabulary
+        self.terms = terms
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, vocabulary):
+        rows = sorted((term[offset:], term_id, offset)
+                      for term_id, term in enumerate(vocabulary) for offset in range(len(term)))
+        return cls(vocabulary,
+                   array('I', [term_id for _, term_id, _ in rows]),
+                   array('I', [offset for _, _, offset in rows]))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __getitem__(self, row):
+        # The sorted sequence bisect searches
+        return self.vocabulary[self.terms[row]][self.offsets[row]:]
+
+    def containing(self, token):
+        """
+        Sorted ids of the terms containing token. Terms only contain
+        [a-z0-9], so every suffix starting with token sorts before token + '{'.
+        """
+        lo = bisect.bisect_left(self, token)
+        hi = bisect.bisect_left(self, token + '{', lo)
+        return sorted(set(self.terms[lo:hi]))
+
+class SearchIndex:
+    """
+    Inverted index from normalized terms to paper ordinals, with BM25F scoring.
+
+    Built once at load time from research_data, with the prebuilt SEARCHES
+    maps (term -> PMCIDs) folded in as additional postings per search type.
+    Document frequencies and field length norms are computed here so a query
+    only touches the postings of its own terms. Terms are ids into the
+    sorted vocabulary and all postings are flat arrays, so the index can be
+    written to and memory-mapped from a corpus snapshot unchanged. A query
+    token matches every term containing it, as in "gravity" for
+    "microgravity", through a suffix array over the vocabulary.
+    """
+    FIELDS = ('title', 'keywords', 'authors', 'abstract')
+    FIELD_WEIGHTS = {'title': 3.0, 'keywords': 2.0, 'authors': 1.5, 'abstract': 1.0}
+    # Weight of a hit in a SEARCHES map (no length normalization)
+    SOURCE_WEIGHT = 1.0
+    BM25_K1 = 1.2
+    BM25_B = 0.75
+
+    def __init__(self, research_data, search_data):
+        self.doc_ids = research_data.doc_ids
+        # Only needed while folding in the SEARCHES maps
+        self.pmcid_ordinals = research_data.pmcid_ordinals
+
+        # field -> term -> {ordinal: term frequency}, and field -> per-ordinal length
+        postings = {field: {} for field in self.FIELDS}
+        field_lengths = {field: [] for field in self.FIELDS}
+        for ordinal in range(len(self.doc_ids)):
+            for field in self.FIELDS:
+                value = research_data.field(ordinal, field)
+                if isinstance(value, list):
+                    value = ' '.join(str(v) for v in value)
+                terms = tokenize(value)
+                field_lengths[field].append(len(terms))
+                field_postings = postings[field]
+                for term in terms:
+                    doc_tfs = field_postings.setdefault(term, {})
+                    doc_tfs[ordinal] = doc_tfs.get(ordinal, 0) + 1
+
+        # BM25 length normalization per field and ordinal: 1 - b + b * len / avg_len
+        self.length_norms = {}
+        for field, lengths in field_lengths.items():
+            avg_length = (sum(lengths) / len(lengths)) if lengths else 0
+            self.length_norms[field] = array('d', (
+                1 - self.BM25_B + self.BM25_B * (length / avg_length if avg_length else 0)
+                for length in lengths
+            ))
+
+        # search type -> term -> set of ordinals
+        source_postings = {}
+        for search_type, entries in search_data.items():
+            source_postings[search_type] = self._build_source_postings(entries)
+
+        # Document frequency counts a paper once no matter how many fields or
+        # sources mention the term
+        doc_count = len(self.doc_ids)
+        term_docs = {}
+        for field_postings in postings.values():
+            for term, doc_tfs in field_postings.items():
+                term_docs.setdefault(term, set()).update(doc_tfs)
+        for source in source_postings.values():
+            for term, ordinals in source.items():
+                term_docs.setdefault(term, set()).update(ordinals)
+
+        self.vocabulary = sorted(term_docs)
+        self.suffixes = TermSuffixes.build(self.vocabulary)
+        self.idf = array('d', (
+            math.log(1 + (doc_count - len(term_docs[term]) + 0.5) / (len(term_docs[term]) + 0.5))
+            for term in self.vocabulary
+        ))
+        self.postings = {
+            field: Postings.from_terms(postings[field], self.vocabulary, with_frequencies=True)
+            for field in self.FIELDS
+        }
+        self.source_postings = {
+            search_type: Postings.from_terms(source, self.vocabulary)
+            for search_type, source in source_postings.items()
+        }
+
+    @classmethod
+    def from_arrays(cls, research_data, vocabulary, suffixes, idf, length_norms, postings, source_postings):
+        """
+        Assemble an index from prebuilt arrays, e.g. a memory-mapped snapshot
+        """
+        index = cls.__new__(cls)
+        index.doc_ids = research_data.doc_ids
+        index.vocabulary = vocabulary
+        index.suffixes = suffixes
+        index.idf = idf
+        index.length_norms = length_norms
+        index.postings = postings
+        index.source_postings = source_postings
+        return index
+
+    def _build_source_postings(self, entries):
+        """
+        Turn one SEARCHES file into term postings. Dict-shaped files map a
+        term (author, keyword, category, year) to PMCIDs; list-shaped files
+        hold records with a PMCID and text fields.
+        """
+        source = {}
+
+        def add(text, pmcid):
+            ordinals = self.pmcid_ordinals.get(pmcid)
+            if not ordinals:
+                return
+            for term in tokenize(text):
+                source.setdefault(term, set()).update(ordinals)
+
+        if isinstance(entries, dict):
+            for text, pmcids in entries.items():
+                if not isinstance(pmcids, list):
+                    pmcids = [pmcids]
+                for pmcid in pmcids:
+                    add(text, pmcid)
+        elif isinstance(entries, list):
+            for entry in entries:
+                if not isinstance(entry, dict):
+                    continue
+                pmcid = next((entry[k] for k in SEARCH_PMCID_KEYS if entry.get(k)), None)
+                for key, value in entry.items():
+                    if key not in SEARCH_PMCID_KEYS and isinstance(value, (str, list)):
+                        add(' '.join(value) if isinstance(value, list) else value, pmcid)
+        return source
+
+    def _sources(self, search_type):
+        if search_type == 'all':
+            return list(self.source_postings.values())
+        if search_type in self.source_postings:
+            return [self.source_postings[search_type]]
+        return []
+
+    def expand(self, token):
+        """
+        Ids of the indexed terms containing token, or for a token shorter
+        than SEARCH_INFIX_MIN_LENGTH (which would match most of the
+        vocabulary) the terms starting with it. Terms only contain [a-z0-9],
+        so every term with a prefix sorts before prefix + '{'.
+        """
+        if len(token) >= SEARCH_INFIX_MIN_LENGTH:
+            return self.suffixes.containing(token)
+        return range(bisect.bisect_left(self.vocabulary, token),
+                     bisect.bisect_left(self.vocabulary, token + '{'))
+
+    def lookup(self, term_ids, search_type='all'):
+        """
+        Union of the postings for term_ids, across the paper fields and the
+        SEARCHES sources allowed by search_type
+        """
+        posting_lists = list(self.postings.values()) + self._sources(search_type)
+
+        matched = set()
+        for term_id in term_ids:
+            for postings in posting_lists:
+                matched.update(postings.ordinals_for(term_id))
+        return matched
+
+    def search(self, query, search_type='all', match='any'):
+        """
+        Resolve a query to {ordinal: BM25F score}. Query terms are combined by
+        union (match='any') or intersection (match='all'). An empty query
+        matches every paper with a score of 0.
+        """
+        with metrics.stage('query_parse'):
+            tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return dict.fromkeys(range(len(self.doc_ids)), 0.0)
+        with metrics.stage('index_lookup'):
+            return self._score(tokens, search_type, match)
+
+    def _score(self, tokens, search_type, match):
+        """
+        BM25F scores of the papers matching the parsed query tokens
+        """
+        expansions = [self.expand(token) for token in tokens]
+        token_matches = [self.lookup(term_ids, search_type) for term_ids in expansions]
+        if match == 'all':
+            token_matches.sort(key=len)
+            matched = set(token_matches[0])
+            for ordinals in token_matches[1:]:
+                matched &= ordinals
+                if not matched:
+                    break
+        else:
+            matched = set().union(*token_matches)
+
+        scores = dict.fromkeys(matched, 0.0)
+        sources = self._sources(search_type)
+        k1 = self.BM25_K1
+        for term_ids in expansions:
+            for term_id in term_ids:
+                # Weighted, length-normalized term frequency summed over fields (BM25F)
+                weighted_tf = {}
+                for field in self.FIELDS:
+                    postings = self.postings[field]
+                    weight = self.FIELD_WEIGHTS[field]
+                    norms = self.length_norms[field]
+                    for ordinal, tf in zip(postings.ordinals_for(term_id), postings.frequencies_for(term_id)):
+                        if ordinal in scores:
+                            weighted_tf[ordinal] = weighted_tf.get(ordinal, 0.0) + weight * tf / norms[ordinal]
+                for source in sources:
+                    for ordinal in source.ordinals_for(term_id):
+                        if ordinal in scores:
+                            weighted_tf[ordinal] = weighted_tf.get(ordinal, 0.0) + self.SOURCE_WEIGHT
+
+                idf = self.idf[term_id]
+                for ordinal, tf in weighted_tf.items():
+                    scores[ordinal] += idf * tf * (k1 + 1) / (tf + k1)
+        return scores
+
+    @staticmethod
+    def top_k(scores, ordinals, k):
+        """
+        Select the k best ordinals by score (ties keep corpus order) with a
+        heap instead of sorting every match
+        """
+        return heapq.nlargest(k, ordinals, key=lambda ordinal: (scores[ordinal], -ordinal))
+
+# SEARCHES maps that are facet value -> PMCIDs postings
+FACET_SOURCES = {
+    'category': 'Search_By_Category',
+    'year': 'Search_By_Year',
+    'keyword': 'Search_By_Keyword',
+    'author': 'Search_By_Author',
+}
+
+# Number of keyword/author values returned by a faceted search
+FACET_DEFAULT_TOP_N = 10
+
+# Year ranges in filters, e.g. "2015-2020", "2015–2020", "2015-" or "-2020"
+YEAR_RANGE_PATTERN = re.compile(r"^\s*(\d{4})?\s*[-\u2013]\s*(\d{4})?\s*$")
+
+# Facet values matching fewer than this fraction of papers keep a set of
+# ordinals instead of a full-width bitmap
+FACET_BITMAP_MIN_FRACTION = 1 / 256
+
+def popcount(bitmap):
+    return bin(bitmap).count('1')
+
+def bitmap_from_ordinals(ordinals):
+    """
+    Pack paper ordinals into an int bitmap (bit i set <=> ordinal i present)
+    """
+    ordinals = list(ordinals)
+    if not ordinals:
+        return 0
+    bits = bytearray(max(ordinals) // 8 + 1)
+    for ordinal in ordinals:
+        bits[ordinal >> 3] |= 1 << (ordinal & 7)
+    return int.from_bytes(bits, 'little')
+
+def ordinals_from_bitmap(bitmap):
+    """
+    Unpack an int bitmap into ascending paper ordinals
+    """
+    ordinals = []
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    for index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            ordinals.append(index * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ordinals
+
+class FacetIndex:
+    """
+    Facet value -> paper ordinals for category, year, keyword and author.
+
+    Built once at load time from research_data and the dict-shaped SEARCHES
+    maps, so /api/categories, /api/years, search filters and faceted counts
+    never rescan the corpus. Dense values are stored as int bitmaps over
+    paper ordinals, so filters combine with a handful of big-int AND/OR
+    operations; sparse values (most keywords and authors) keep a frozenset,
+    which is smaller than a bitmap spanning the whole corpus. Keywords and
+    authors are grouped case-insensitively.
+    """
+    FACETS = ('category', 'year', 'keyword', 'author')
+    # Facets whose counts are truncated to the top N values
+    TOP_N_FACETS = ('keyword', 'author')
+
+    def __init__(self, research_data, search_data):
+        # facet -> key -> bitmap or frozenset of ordinals, and facet -> key -> display label
+        self.postings = {facet: {} for facet in self.FACETS}
+        self.labels = {facet: {} for facet in self.FACETS}
+
+        ordinal_sets = {facet: {} for facet in self.FACETS}
+        def add(facet, value, ordinals):
+            key = self.key(facet, value)
+            if key is None:
+                return
+            self.labels[facet].setdefault(key, value if facet != 'year' else key)
+            ordinal_sets[facet].setdefault(key, set()).update(ordinals)
+
+        for ordinal in range(len(research_data)):
+            add('category', research_data.field(ordinal, 'category'), [ordinal])
+            add('year', research_data.field(ordinal, 'year'), [ordinal])
+            for keyword in research_data.field(ordinal, 'keywords') or []:
+                add('keyword', keyword, [ordinal])
+            for author in research_data.field(ordinal, 'authors') or []:
+                add('author', author, [ordinal])
+
+        for facet, search_type in FACET_SOURCES.items():
+            entries = search_data.get(search_type)
+            if not isinstance(entries, dict):
+                continue
+            for value, pmcids in entries.items():
+                if not isinstance(pmcids, list):
+                    pmcids = [pmcids]
+                ordinals = [o for pmcid in pmcids for o in research_data.pmcid_ordinals.get(pmcid, ())]
+                add(facet, value, ordinals)
+
+        self._set_postings(ordinal_sets, len(research_data))
+
+    @classmethod
+    def from_ordinals(cls, labels, ordinal_lists, doc_count):
+        """
+        Assemble facets from facet -> key -> label and facet -> key -> ordinals,
+        e.g. as read back from a corpus snapshot
+        """
+        facets = cls.__new__(cls)
+        facets.labels = labels
+        facets.postings = {facet: {} for facet in cls.FACETS}
+        facets._set_postings(ordinal_lists, doc_count)
+        return facets
+
+    def _set_postings(self, ordinal_sets, doc_count):
+        min_dense = max(1, int(doc_count * FACET_BITMAP_MIN_FRACTION))
+        for facet, values in ordinal_sets.items():
+            for key, ordinals in values.items():
+                if len(ordinals) >= min_dense:
+                    self.postings[facet][key] = bitmap_from_ordinals(ordinals)
+                else:
+                    self.postings[facet][key] = frozenset(ordinals)
+
+        # Sorted year index for range filters
+        self.sorted_years = sorted(self.postings['year'])
+
+    def ordinals(self, facet, key):
+        """
+        Sorted paper ordinals of one facet value
+        """
+        posting = self.postings[facet][key]
+        return ordinals_from_bitmap(posting) if isinstance(posting, int) else sorted(posting)
+
+    @staticmethod
+    def key(facet, value):
+        """
+        Normalized facet key for a raw value, or None if it has no usable key
+        """
+        if value is None or value == '':
+            return None
+        if facet == 'year':
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+        value = str(value).strip()
+        if facet in ('keyword', 'author'):
+            value = value.lower()
+        return value or None
+
+    def bitmap(self, facet, value):
+        posting = self.postings[facet].get(self.key(facet, value), 0)
+        return posting if isinstance(posting, int) else bitmap_from_ordinals(posting)
+
+    def any_of(self, facet, values):
+        bitmap = 0
+        for value in values:
+            bitmap |= self.bitmap(facet, value)
+        return bitmap
+
+    def all_of(self, facet, values):
+        bitmap = None
+        for value in values:
+            bitmap = self.bitmap(facet, value) if bitmap is None else bitmap & self.bitmap(facet, value)
+            if not bitmap:
+                return 0
+        return bitmap or 0
+
+    def year_range(self, start=None, end=None):
+        """
+        OR of the year bitmaps within [start, end]; either bound may be open
+        """
+        lo = 0 if start is None else bisect.bisect_left(self.sorted_years, int(start))
+        hi = len(self.sorted_years) if end is None else bisect.bisect_right(self.sorted_years, int(end))
+        return self.any_of('year', self.sorted_years[lo:hi])
+
+    def filter_bitmap(self, filters):
+        """
+        Combine search filters into one bitmap, or None if no filter is set.
+
+        - year: exact year, list of years, or a range string like "2015-2020"
+        - year_from / year_to: inclusive range bounds
+        - category, author: a value or a list of values (any match)
+        - keywords: a value or a list, combined by keyword_mode "any" (default) or "all"
+
+        Different filters are ANDed. Raises ValueError if filters is not a
+        dict or a year is malformed.
+        """
+        def as_list(value):
+            return value if isinstance(value, list) else [value]
+
+        if not isinstance(filters, dict):
+            raise ValueError("filters must be an object")
+        for bound in ('year_from', 'year_to'):
+            value = filters.get(bound)
+            if value not in (None, '') and self.key('year', value) is None:
+                raise ValueError(f"Invalid {bound} filter: {value}")
+
+        clauses = []
+        year = filters.get('year')
+        if year:
+            range_match = YEAR_RANGE_PATTERN.match(year) if isinstance(year, str) else None
+            if range_match:
+                clauses.append(self.year_range(range_match.group(1), range_match.group(2)))
+            else:
+                years = as_list(year)
+                if any(self.key('year', y) is None for y in years):
+                    raise ValueError(f"Invalid year filter: {year}")
+                clauses.append(self.any_of('year', years))
+        if filters.get('year_from') or filters.get('year_to'):
+            clauses.append(self.year_range(self.key('year', filters.get('year_from')),
+                                           self.key('year', filters.get('year_to'))))
+        if filters.get('category'):
+            clauses.append(self.any_of('category', as_list(filters['category'])))
+        if filters.get('author'):
+            clauses.append(self.any_of('author', as_list(filters['author'])))
+        if filters.get('keywords'):
+            keywords = as_list(filters['keywords'])
+            if filters.get('keyword_mode') == 'all':
+                clauses.append(self.all_of('keyword', keywords))
+            else:
+                clauses.append(self.any_of('keyword', keywords))
+
+        if not clauses:
+            return None
+        bitmap = clauses[0]
+        for clause in clauses[1:]:
+            bitmap &= clause
+        return bitmap
+
+    def categories(self):
+        return sorted(self.labels['category'].values())
+
+    def years(self):
+        return sorted(self.labels['year'], reverse=True)
+
+    def counts(self, result_bitmap, facets=None, top_n=FACET_DEFAULT_TOP_N):
+        """
+        Per-value counts of the result set for each facet: popcount of a
+        bitmap AND for dense values, set intersection for sparse ones.
+        Category and year list every value with a non-zero count; keyword
+        and author keep the top_n values.
+        """
+        result_set = None
+        counts = {}
+        for facet in facets or self.FACETS:
+            values = []
+            for key, posting in self.postings[facet].items():
+                if isinstance(posting, int):
+                    count = popcount(posting & result_bitmap)
+                else:
+                    if result_set is None:
+                        result_set = set(ordinals_from_bitmap(result_bitmap))
+                    count = len(posting & result_set)
+                if count:
+                    values.append((count, self.labels[facet][key]))
+            if facet in self.TOP_N_FACETS:
+                values = heapq.nlargest(top_n, values, key=lambda v: v[0])
+            else:
+                values.sort(key=lambda v: (-v[0], str(v[1])))
+            counts[facet] = [{"value": label, "count": count} for count, label in values]
+        return counts
+
+# Completions per kind returned by /api/suggest
+SUGGEST_DEFAULT_LIMIT = 5
+SUGGEST_MAX_LIMIT = 20
+# Later words shorter than this are not completion starts ("of", "in", ...)
+SUGGEST_MIN_WORD_LENGTH = 3
+SUGGEST_WORD_START = re.compile(r'\b\w+')
+# Prefix ranges up to this many rows per requested completion are sorted
+# outright; wider ones are searched through the segment tree
+SUGGEST_SORT_WIDTH = 16
+
+def suggest_key(text):
+    """
+    Case- and whitespace-normalized form completions are matched on
+    """
+    return ' '.join(str(text).lower().split())
+
+class SuggestTable:
+    """
+    Prefix completions of one kind (titles, authors, ...) over sorted arrays.
+
+    Each entry has a normalized key, a display label, a document count and,
+    for titles, the ordinal of its paper. A row is an (entry, byte offset)
+    pair for every word start in the key, so "smith" completes "John
+    Smith"; rows are sorted by the UTF-8 suffix key[offset:], so the rows
+    matching a prefix form one contiguous range found by bisection.
+    `ranked` lists the rows best first (higher count, match at the start of
+    the key, then alphabetical). `tree` is a min segment tree over each
+    row's position in `ranked` (the leaves, at tree[len(rows) + row]), so
+    the best row of any range is found in O(log rows).
+    """
+    def __init__(self, keys, labels, counts, row_entries, row_offsets, ranked, tree, ordinals=None):
+        self.keys = keys
+        self.labels = labels
+        self.counts = counts
+        self.row_entries = row_entries
+        self.row_offsets = row_offsets
+        self.ranked = ranked
+        self.tree = tree
+        self.ordinals = ordinals
+
+    @classmethod
+    def build(cls, entries, with_ordinals=False):
+        """
+        Build from (key, label, count, ordinal) tuples with distinct keys
+        """
+        entries = sorted(entries)
+        keys = TextColumn.from_values([key for key, _, _, _ in entries])
+        rows = []
+        for entry, (key, _, _, _) in enumerate(entries):
+            encoded = key.encode('utf-8')
+            ascii_key = len(encoded) == len(key)
+            for match in SUGGEST_WORD_START.finditer(key):
+                start = match.start()
+                if start and match.end() - start < SUGGEST_MIN_WORD_LENGTH:
+                    continue
+                offset = start if ascii_key else len(key[:start].encode('utf-8'))
+                rows.append((encoded[offset:], entry, offset))
+        rows.sort()
+        # Rank key (more papers, match at the start, entry order) packed in one int
+        most = max((count for _, _, count, _ in entries), default=0)
+        order = [((most - entries[entry][2]) * 2 + (offset > 0)) * len(entries) + entry for _, entry, offset in rows]
+        ranked = sorted(range(len(rows)), key=order.__getitem__)
+        tree = array('I', [0]) * (2 * len(rows))
+        for position, row in enumerate(ranked):
+            tree[len(rows) + row] = position
+        for node in range(len(rows) - 1, 0, -1):
+            tree[node] = min(tree[2 * node], tree[2 * node + 1])
+        return cls(
+            keys=keys,
+            labels=TextColumn.from_values([str(label) for _, label, _, _ in entries]),
+            counts=array('I', [count for _, _, count, _ in entries]),
+            row_entries=array('I', [entry for _, entry, _ in rows]),
+            row_offsets=array('I', [offset for _, _, offset in rows]),
+            ranked=array('I', ranked),
+            tree=tree,
+            ordinals=array('I', [ordinal for _, _, _, ordinal in entries]) if with_ordinals else None
+        )
+
+    def __len__(self):
+        return len(self.row_entries)
+
+    def __getitem__(self, row):
+        # The sorted sequence bisect searches: the UTF-8 suffix of each row
+        entry = self.row_entries[row]
+        start = self.keys.offsets[entry] + self.row_offsets[row]
+        return bytes(self.keys.blob[start:self.keys.offsets[entry + 1]])
+
+    def best_rank(self, lo, hi):
+        """
+        Smallest position in `ranked` among rows lo..hi-1
+        """
+        tree = self.tree
+        best = size = len(self.row_entries)
+        lo += size
+        hi += size
+        while lo < hi:
+            if lo & 1:
+                if tree[lo] < best:
+                    best = tree[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if tree[hi] < best:
+                    best = tree[hi]
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def complete(self, prefix, limit):
+        """
+        Best `limit` entries with a word starting with the normalized prefix
+        """
+        prefix = prefix.encode('utf-8')
+        lo = bisect.bisect_left(self, prefix)
+        # 0xff never occurs in UTF-8, so this bounds every suffix starting with prefix
+        hi = bisect.bisect_left(self, prefix + b'\xff', lo)
+        entries = []
+        if hi - lo <= SUGGEST_SORT_WIDTH * limit:
+            # Narrow range: sort its rows' positions in `ranked` outright
+            size = len(self.row_entries)
+            for position in sorted(self.tree[size + lo:size + hi]):
+                entry = self.row_entries[self.ranked[position]]
+                if entry not in entries:
+                    entries.append(entry)
+                    if len(entries) == limit:
+                        break
+            return entries
+        # Wide range: repeatedly take the best row of a range and split the
+        # range around it, so only about `limit` rows are visited
+        ranges = [(self.best_rank(lo, hi), lo, hi)]
+        while ranges and len(entries) < limit:
+            position, lo, hi = heapq.heappop(ranges)
+            row = self.ranked[position]
+            entry = self.row_entries[row]
+            if entry not in entries:
+                entries.append(entry)
+            if lo < row:
+                heapq.heappush(ranges, (self.best_rank(lo, row), lo, row))
+            if row + 1 < hi:
+                heapq.heappush(ranges, (self.best_rank(row + 1, hi), row + 1, hi))
+        return entries
+
+class SuggestIndex:
+    """
+    Typeahead over titles, authors, keywords and categories for /api/suggest,
+    ranked by the number of papers each completion would find. Built with
+    the facet index at load time, or read back from the corpus snapshot.
+    """
+    KINDS = ('title', 'author', 'keyword', 'category')
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    @classmethod
+    def build(cls, research_data, facet_index):
+        titles = {}
+        for ordinal in range(len(research_data)):
+            title = research_data.field(ordinal, 'title')
+            key = suggest_key(title or '')
+            if not key:
+                continue
+            if key in titles:
+                titles[key][2] += 1
+            else:
+                titles[key] = [key, title, 1, ordinal]
+        tables = {'title': SuggestTable.build([tuple(entry) for entry in titles.values()], with_ordinals=True)}
+
+        for kind in ('author', 'keyword', 'category'):
+            entries = {}
+            for key, posting in facet_index.postings[kind].items():
+                count = popcount(posting) if isinstance(posting, int) else len(posting)
+                normalized = suggest_key(key)
+                # Facet keys that normalize alike (e.g. differently spaced) merge;
+                # their papers may overlap, so keep the larger count
+                if normalized in entries:
+                    entries[normalized][2] = max(entries[normalized][2], count)
+                elif normalized:
+                    entries[normalized] = [normalized, facet_index.labels[kind][key], count, 0]
+            tables[kind] = SuggestTable.build([tuple(entry) for entry in entries.values()])
+        return cls(tables)
+
+    def suggest(self, query, kinds, limit, research_data):
+        """
+        {kind: [{"value", "count"(, "pmcid")}, ...]} for the raw query text
+        """
+        prefix = suggest_key(query)
+        if prefix and query[-1:].isspace():
+            # "john " completes "john smith" but not "johnson"
+            prefix += ' '
+        suggestions = {}
+        for kind in kinds:
+            table = self.tables[kind]
+            matches = []
+            for entry in table.complete(prefix, limit) if prefix else []:
+                match = {"value": table.labels[entry], "count": table.counts[entry]}
+                if table.ordinals is not None:
+                    match["pmcid"] = research_data.doc_ids[table.ordinals[entry]]
+                matches.append(match)
+            suggestions[kind] = matches
+        return suggestions
+
+# Keys of the legacy /api/research-papers records, in response order
+LEGACY_RECORD_FIELDS = ("Experiment No.", "Title", "Link", "PMCId", "Category", "Study Year", "Abstract", "Summary")
+
+# Page size bounds for /api/research-papers
+RESEARCH_PAPERS_DEFAULT_PAGE_SIZE = 50
+RESEARCH_PAPERS_MAX_PAGE_SIZE = 500
+
+def corpus_source_files():
+    """
+    (relative name, path) of every RESEARCH_PAPER_DATA and SEARCHES file, sorted
+    """
+    files = []
+    for folder, folder_path, extensions in (('RESEARCH_PAPER_DATA', RESEARCH_PAPER_DATA_DIR, ('.json', '.ndjson')),
+                                            ('SEARCHES', SEARCHES_DIR, ('.json',))):
+        if not os.path.exists(folder_path):
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            if filename.endswith(extensions):
+                files.append((f"{folder}/{filename}", os.path.join(folder_path, filename)))
+    return files
+
+def compute_corpus_version():
+    """
+    Content hash of every RESEARCH_PAPER_DATA and SEARCHES file. Cached
+    responses and their ETags are only valid for the version they were
+    built from.
+    """
+    digest = hashlib.sha256()
+    for name, path in corpus_source_files():
+        digest.update(f"{name}\0".encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def source_fingerprint():
+    """
+    Cheap staleness check for snapshots: name, size and mtime of every source file
+    """
+    fingerprint = []
+    for name, path in corpus_source_files():
+        stat = os.stat(path)
+        fingerprint.append([name, stat.st_size, stat.st_mtime_ns])
+    return fingerprint
+
+# Binary corpus snapshot (see build_snapshot.py). Set CORPUS_SNAPSHOT_PATH to
+# an empty string to always load from the JSON sources.
+SNAPSHOT_MAGIC = b'BIOASTRA'
+SNAPSHOT_FORMAT_VERSION = 3
+DEFAULT_CORPUS_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), 'SNAPSHOT', 'corpus.snapshot')
+CORPUS_SNAPSHOT_PATH = os.getenv('CORPUS_SNAPSHOT_PATH', DEFAULT_CORPUS_SNAPSHOT_PATH)
+
+def _aligned(position, alignment=8):
+    return (position + alignment - 1) // alignment * alignment
+
+def write_snapshot(path, corpus):
+    """
+    Write a corpus (as returned by build_corpus_from_sources) to a versioned
+    snapshot file.
+
+    Layout: magic, format version and header length, a JSON header (source
+    fingerprint, corpus version, small tables, section directory), then raw
+    8-byte aligned sections: UTF-8 string blobs with offset arrays for
+    every string column, and native arrays for ids, postings and norms.
+    The file is written next to its destination and renamed into place.
+    """
+    sections = []
+
+    def add(name, values):
+        if isinstance(values, (bytes, bytearray, memoryview)) and getattr(values, 'format', 'B') == 'B':
+            sections.append((name, 'B', bytes(values)))
+        else:
+            sections.append((name, getattr(values, 'typecode', None) or values.format, values.tobytes()))
+
+    def add_text(name, values):
+        column = values if isinstance(values, TextColumn) else TextColumn.from_values(values)
+        add(f"{name}.blob", column.blob)
+        add(f"{name}.offsets", column.offsets)
+
+    store = corpus['research_data']
+    add_text('store.doc_ids', store.doc_ids)
+    for field, column in store.text.items():
+        add_text(f"store.text.{field}", column)
+    tables = {}
+    for name in PaperStore.TABLES:
+        values = list(getattr(store, name))
+        if name in ('keywords', 'authors') and all(isinstance(v, str) for v in values):
+            add_text(f"store.{name}", values)
+        else:
+            tables[name] = values
+    for name in PaperStore.ID_ARRAYS:
+        add(f"store.{name}", getattr(store, name))
+
+    index = corpus['search_index']
+    add_text('index.vocabulary', index.vocabulary)
+    add('index.suffixes.terms', index.suffixes.terms)
+    add('index.suffixes.offsets', index.suffixes.offsets)
+    add('index.idf', index.idf)
+    for field in SearchIndex.FIELDS:
+        postings = index.postings[field]
+        add(f"index.postings.{field}.offsets", postings.offsets)
+        add(f"index.postings.{field}.ordinals", postings.ordinals)
+        add(f"index.postings.{field}.frequencies", postings.frequencies)
+        add(f"index.length_norms.{field}", index.length_norms[field])
+    for search_type, postings in index.source_postings.items():
+        add(f"index.sources.{search_type}.offsets", postings.offsets)
+        add(f"index.sources.{search_type}.ordinals", postings.ordinals)
+
+    facets = corpus['facet_index']
+    for facet in FacetIndex.FACETS:
+        keys = list(facets.postings[facet])
+        offsets, ordinals = array('I', [0]), array('I')
+        for key in keys:
+            ordinals.extend(facets.ordinals(facet, key))
+            offsets.append(len(ordinals))
+        add(f"facets.{facet}.offsets", offsets)
+        add(f"facets.{facet}.ordinals", ordinals)
+        if facet == 'year':
+            add('facets.year.keys', array('q', keys))
+        else:
+            add_text(f"facets.{facet}.keys", keys)
+            add_text(f"facets.{facet}.labels", [str(facets.labels[facet][key]) for key in keys])
+
+    for kind, table in corpus['suggest_index'].tables.items():
+        add_text(f"suggest.{kind}.keys", table.keys)
+        add_text(f"suggest.{kind}.labels", table.labels)
+        for name in ('counts', 'row_entries', 'row_offsets', 'ranked', 'tree', 'ordinals'):
+            if getattr(table, name) is not None:
+                add(f"suggest.{kind}.{name}", getattr(table, name))
+
+    directory = {}
+    position = 0
+    for name, typecode, data in sections:
+        directory[name] = [position, len(data), typecode]
+        position = _aligned(position + len(data))
+    header = json.dumps({
+        'format': SNAPSHOT_FORMAT_VERSION,
+        'byteorder': sys.byteorder,
+        'version': corpus['version'],
+        'fingerprint': corpus['fingerprint'],
+        'search_types': corpus['search_types'],
+        'source_types': list(index.source_postings),
+        'tables': tables,
+        'overrides': {str(ordinal): values for ordinal, values in store.overrides.items()},
+        'sections': directory
+    }).encode('utf-8')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack('<II', SNAPSHOT_FORMAT_VERSION, len(header)) + header)
+        data_start = _aligned(f.tell())
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, typecode, data in sections:
+            f.write(data)
+            f.write(b'\0' * (_aligned(len(data)) - len(data)))
+    os.replace(temp_path, path)
+    return data_start + position
+
+def load_snapshot(path):
+    """
+    Memory-map a corpus snapshot and assemble the store and indexes over it
+    without copying. Returns None, so the caller falls back to the JSON
+    sources, when the file is missing, unreadable, from another format or
+    byte order, or stale relative to the source files.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError("not a corpus snapshot")
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        file_format, header_length = struct.unpack('<II', mapped[len(SNAPSHOT_MAGIC):header_start])
+        if file_format != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"format {file_format}, expected {SNAPSHOT_FORMAT_VERSION}")
+        header = json.loads(mapped[header_start:header_start + header_length])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"byte order {header['byteorder']}")
+        if header['fingerprint'] != source_fingerprint():
+            print("⚠️ Corpus snapshot is stale, loading JSON sources")
+            return None
+
+        view = memoryview(mapped)
+        data_start = _aligned(header_start + header_length)
+
+        def section(name):
+            offset, length, typecode = header['sections'][name]
+            chunk = view[data_start + offset:data_start + offset + length]
+            return chunk if typecode == 'B' else chunk.cast(typecode)
+
+        def text(name):
+            return TextColumn(section(f"{name}.blob"), section(f"{name}.offsets"))
+
+        tables = dict(header['tables'])
+        for name in ('keywords', 'authors'):
+            if name not in tables:
+                tables[name] = text(f"store.{name}")
+        research_data = PaperStore.from_columns(
+            doc_ids=text('store.doc_ids'),
+            text={field: text(f"store.text.{field}") for field in PaperStore.TEXT_FIELDS},
+            tables=tables,
+            id_arrays={name: section(f"store.{name}") for name in PaperStore.ID_ARRAYS},
+            overrides={int(ordinal): values for ordinal, values in header['overrides'].items()}
+        )
+
+        vocabulary = text('index.vocabulary')
+        search_index = SearchIndex.from_arrays(
+            research_data,
+            vocabulary=vocabulary,
+            suffixes=TermSuffixes(vocabulary, section('index.suffixes.terms'), section('index.suffixes.offsets')),
+            idf=section('index.idf'),
+            length_norms={field: section(f"index.length_norms.{field}") for field in SearchIndex.FIELDS},
+            postings={
+                field: Postings(section(f"index.postings.{field}.offsets"),
+                                section(f"index.postings.{field}.ordinals"),
+                                section(f"index.postings.{field}.frequencies"))
+                for field in SearchIndex.FIELDS
+            },
+            source_postings={
+                search_type: Postings(section(f"index.sources.{search_type}.offsets"),
+                                      section(f"index.sources.{search_type}.ordinals"))
+                for search_type in header['source_types']
+            }
+        )
 
-# In-memory storage for user sessions (in production, use Redis or database)
-user_sessions = {}
+        labels, ordinal_lists = {}, {}
+        for facet in FacetIndex.FACETS:
+            offsets = section(f"facets.{facet}.offsets")
+            ordinals = section(f"facets.{facet}.ordinals")
+            if facet == 'year':
+                keys = section('facets.year.keys').tolist()
+                labels[facet] = {key: key for key in keys}
+            else:
+                keys = list(text(f"facets.{facet}.keys"))
+                labels[facet] = dict(zip(keys, text(f"facets.{facet}.labels")))
+            ordinal_lists[facet] = {
+                key: ordinals[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)
+            }
+        facet_index = FacetIndex.from_ordinals(labels, ordinal_lists, len(research_data))
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-print(f"🔍 GEMINI_API_KEY found: {'Yes' if GEMINI_API_KEY else 'No'}")
-if GEMINI_API_KEY:
-    print(f"🔑 API Key: {GEMINI_API_KEY[:10]}...")
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Try different model names (using latest available models)
-    try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        # Test the model
-        test_response = model.generate_content("Hello")
-        print("✅ Gemini API configured successfully with gemini-2.5-flash")
-    except Exception as e:
-        print(f"❌ Error with gemini-2.5-flash: {e}")
-        try:
-            model = genai.GenerativeModel('gemini-2.0-flash')
-            test_response = model.generate_content("Hello")
-            print("✅ Gemini API configured successfully with gemini-2.0-flash")
-        except Exception as e2:
-            print(f"❌ Error with gemini-2.0-flash: {e2}")
-            try:
-                model = genai.GenerativeModel('gemini-pro-latest')
-                test_response = model.generate_content("Hello")
-                print("✅ Gemini API configured successfully with gemini-pro-latest")
-            except Exception as e3:
-                print(f"❌ All model attempts failed: {e3}")
-                model = None
-else:
-    print("❌ No GEMINI_API_KEY found in environment variables")
-    model = None
+        suggest_tables = {}
+        for kind in SuggestIndex.KINDS:
+            prefix = f"suggest.{kind}"
+            suggest_tables[kind] = SuggestTable(
+                keys=text(f"{prefix}.keys"),
+                labels=text(f"{prefix}.labels"),
+                counts=section(f"{prefix}.counts"),
+                row_entries=section(f"{prefix}.row_entries"),
+                row_offsets=section(f"{prefix}.row_offsets"),
+                ranked=section(f"{prefix}.ranked"),
+                tree=section(f"{prefix}.tree"),
+                ordinals=section(f"{prefix}.ordinals") if f"{prefix}.ordinals" in header['sections'] else None
+            )
+        suggest_index = SuggestIndex(suggest_tables)
+    except (KeyError, TypeError, ValueError, struct.error) as e:
+        print(f"⚠️ Ignoring unreadable corpus snapshot {path}: {e}")
+        return None
 
-def markdown_to_html(text):
+    return {
+        'search_types': header['search_types'],
+        'research_data': research_data,
+        'search_index': search_index,
+        'facet_index': facet_index,
+        'suggest_index': suggest_index,
+        'version': header['version'],
+        'fingerprint': header['fingerprint'],
+        'source': 'snapshot'
+    }
+
+def build_corpus_from_sources():
     """
-    Convert markdown formatting to HTML for better display
+    Parse RESEARCH_PAPER_DATA and SEARCHES and build the store and indexes
     """
-    if not text:
-        return text
-    
-    # Convert **bold** to <strong>bold</strong>
-    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
-    
-    # Convert *italic* to <em>italic</em>
-    text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
-    
-    # Convert bullet points (- or * at start of line) to HTML list
-    lines = text.split('\n')
-    html_lines = []
-    in_list = False
-    
-    for line in lines:
-        stripped = line.strip()
-        
-        # Check if line starts with bullet point
-        if stripped.startswith('- ') or stripped.startswith('* '):
-            if not in_list:
-                html_lines.append('<ul>')
-                in_list = True
-            # Remove bullet and add list item
-            content = stripped[2:].strip()
-            html_lines.append(f'<li>{content}</li>')
-        else:
-            if in_list:
-                html_lines.append('</ul>')
-                in_list = False
-            html_lines.append(line)
-    
-    # Close list if still open
-    if in_list:
-        html_lines.append('</ul>')
-    
-    # Convert numbered lists (1. 2. etc.)
-    text = '\n'.join(html_lines)
-    text = re.sub(r'^(\d+)\.\s+(.*)$', r'<li><strong>\1.</strong> \2</li>', text, flags=re.MULTILINE)
-    
-    # Wrap numbered list items in <ol> tags
-    lines = text.split('\n')
-    html_lines = []
-    in_ordered_list = False
-    
-    for line in lines:
-        if '<li><strong>' in line and '.</strong>' in line:
-            if not in_ordered_list:
-                html_lines.append('<ol>')
-                in_ordered_list = True
-            html_lines.append(line)
-        else:
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            html_lines.append(line)
-    
-    if in_ordered_list:
-        html_lines.append('</ol>')
-    
-    # Convert line breaks to <br> tags
-    text = '\n'.join(html_lines)
-    text = text.replace('\n', '<br>')
-    
-    return text
+    fingerprint = source_fingerprint()
+    search_data = load_search_data()
+    research_data = PaperStore(load_research_data())
+    search_index = SearchIndex(research_data, search_data)
+    facet_index = FacetIndex(research_data, search_data)
+    return {
+        'search_types': list(search_data.keys()),
+        'research_data': research_data,
+        'search_index': search_index,
+        'facet_index': facet_index,
+        'suggest_index': SuggestIndex.build(research_data, facet_index),
+        'version': compute_corpus_version(),
+        'fingerprint': fingerprint,
+        'source': 'json'
+    }
 
-def clean_html_for_pdf(html_text):
+def load_corpus():
     """
-    Clean HTML text for PDF generation by removing HTML tags and converting to plain text
+    Load the corpus from the snapshot when it is present and current,
+    otherwise from the JSON sources
     """
-    if not html_text:
-        return html_text
-    
-    # Remove HTML tags
-    clean_text = re.sub(r'<[^>]+>', '', html_text)
-    
-    # Convert HTML entities
-    clean_text = clean_text.replace('&nbsp;', ' ')
-    clean_text = clean_text.replace('&lt;', '<')
-    clean_text = clean_text.replace('&gt;', '>')
-    clean_text = clean_text.replace('&amp;', '&')
-    
-    # Clean up extra whitespace
-    clean_text = re.sub(r'\s+', ' ', clean_text)
-    clean_text = clean_text.replace('<br>', '\n')
-    
-    return clean_text.strip()
+    if CORPUS_SNAPSHOT_PATH:
+        corpus = load_snapshot(CORPUS_SNAPSHOT_PATH)
+        if corpus:
+            return corpus
+    return build_corpus_from_sources()
 
-def get_or_create_user_session():
+class ResponseCache:
     """
-    Get or create a user session to prevent chat mixing between users.
-    Includes a defensive fix to ensure user_id is a string, preventing
-    TypeError with recent Werkzeug versions.
+    LRU of pre-encoded JSON response bodies for read-only endpoints.
+
+    Entries are keyed by (corpus version, cache key); the strong ETag is a
+    hash of the same pair, so a conditional request can be answered with a
+    304 without building or looking up the body.
     """
-    
-    # Check if user_id exists in the session
-    if 'user_id' not in session:
-        # Create new user session
-        user_id = str(uuid.uuid4())
-        session['user_id'] = user_id
-        
-    user_id = session['user_id']
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
 
-    # --- Defensive Fix for Werkzeug/Flask-Session Incompatibility ---
-    # The session data might be returned as bytes by the session interface,
-    # causing an error later when setting the cookie. We explicitly decode it.
-    if isinstance(user_id, bytes):
-        try:
-            # Decode the user ID to a standard Python string
-            user_id = user_id.decode('utf-8')
-            # Update the session with the decoded string value
-            session['user_id'] = user_id
-        except UnicodeDecodeError:
-            # If decoding fails (shouldn't happen for UUID), log and generate a new session
-            print("🚨 ERROR: Failed to decode user_id from session. Generating new ID.")
-            user_id = str(uuid.uuid4())
-            session['user_id'] = user_id
-    # -----------------------------------------------------------------
+    def etag(self, version, key):
+        return hashlib.sha256(f"{version}:{key}".encode('utf-8')).hexdigest()[:32]
 
-    # Initialize in-memory session if not exists (handling for server restart)
-    if user_id not in user_sessions:
-        user_sessions[user_id] = {
-            'created_at': datetime.now(),
-            'chat_history': [],
-            'last_activity': datetime.now()
-        }
-    
-    # Update last activity
-    user_sessions[user_id]['last_activity'] = datetime.now()
-    
-    return user_id
+    def get(self, version, key):
+        with self.lock:
+            body = self.entries.get((version, key))
+            if body is not None:
+                self.entries.move_to_end((version, key))
+            return body
 
-def add_to_chat_history(user_id, message_type, content, paper_context=None):
+    def put(self, version, key, body):
+        with self.lock:
+            self.entries[(version, key)] = body
+            self.entries.move_to_end((version, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def retain(self, version):
+        """
+        Drop the bodies of every other corpus version
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] != version]:
+                del self.entries[key]
+
+response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048)))
+
+def cached_json_response(cache_key, build_body):
     """
-    Add message to user's chat history
+    Serve a JSON body that depends only on the loaded corpus. The body is
+    serialized once per corpus version and kept as bytes; requests whose
+    If-None-Match carries the current ETag get a 304 without touching the data.
     """
-    if user_id not in user_sessions:
-        return
-    
-    message = {
-        'type': message_type,
-        'content': content,
-        'timestamp': datetime.now().isoformat(),
-        'paper_context': paper_context or {}
-    }
-    
-    user_sessions[user_id]['chat_history'].append(message)
-    
-    # Keep only last 50 messages to prevent memory issues
-    if len(user_sessions[user_id]['chat_history']) > 50:
-        user_sessions[user_id]['chat_history'] = user_sessions[user_id]['chat_history'][-50:]
+    version = current_corpus()['version']
+    etag = response_cache.etag(version, cache_key)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get(version, cache_key)
+        if body is None:
+            with metrics.stage('serialize'):
+                body = app.json.dumps(build_body()).encode('utf-8') + b"\n"
+            response_cache.put(version, cache_key, body)
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let browsers keep the body but revalidate it on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-def get_user_chat_history(user_id):
+def enrich_research_paper(paper):
     """
-    Get user's chat history
+    Copy of a paper with the legacy capitalized keys also present for compatibility
     """
-    if user_id not in user_sessions:
-        return []
-    
-    return user_sessions[user_id]['chat_history']
+    enriched = dict(paper)
+    if 'Overview' not in enriched and enriched.get('overview'):
+        enriched['Overview'] = enriched['overview']
+    if 'Summary' not in enriched and enriched.get('summary'):
+        enriched['Summary'] = enriched['summary']
+    if 'Abstract' not in enriched and enriched.get('abstract'):
+        enriched['Abstract'] = enriched['abstract']
+    if 'Conclusion' not in enriched and enriched.get('conclusion'):
+        enriched['Conclusion'] = enriched['conclusion']
+    if 'Keywords' not in enriched and enriched.get('keywords'):
+        enriched['Keywords'] = enriched['keywords']
+    if 'Category' not in enriched and enriched.get('category'):
+        enriched['Category'] = enriched['category']
+    if 'Study Year' not in enriched and enriched.get('year'):
+        enriched['Study Year'] = enriched['year']
+    if 'Title' not in enriched and enriched.get('title'):
+        enriched['Title'] = enriched['title']
+    return enriched
 
-def create_chat_pdf(chat_data, paper_title="Research Paper Discussion", user_id=None):
+# The loaded corpus: store, indexes and version, never modified once built.
+# A reload builds a new one off to the side and replaces this reference.
+active_corpus = load_corpus()
+
+def current_corpus():
     """
-    Create a PDF from chat conversation data with custom filename
+    The corpus this request reads from. Pinned on first use, so a reload
+    that lands mid-request cannot mix two versions; outside a request it is
+    the active corpus.
     """
-    # Create in-memory PDF buffer and filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"Bio_Astra_{timestamp}.pdf"
-    pdf_buffer = io.BytesIO()
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4, 
-                          rightMargin=72, leftMargin=72, 
-                          topMargin=72, bottomMargin=18)
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1,  # Center alignment
-        textColor=colors.darkblue
-    )
-    
-    question_style = ParagraphStyle(
-        'Question',
-        parent=styles['Normal'],
-        fontSize=12,
-        spaceAfter=12,
-        leftIndent=20,
-        textColor=colors.darkgreen,
-        fontName='Helvetica-Bold'
-    )
-    
-    answer_style = ParagraphStyle(
-        'Answer',
-        parent=styles['Normal'],
-        fontSize=11,
-        spaceAfter=20,
-        leftIndent=40,
-        textColor=colors.black
-    )
-    
-    paper_info_style = ParagraphStyle(
-        'PaperInfo',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=20,
-        textColor=colors.grey,
-        fontName='Helvetica-Oblique'
-    )
-    
-    # Build content
-    story = []
-    
-    # Title
-    story.append(Paragraph("Bio-Astra Dashboard - Chat Export", title_style))
-    story.append(Spacer(1, 20))
-    
-    # User session info
-    if user_id:
-        story.append(Paragraph(f"<b>Session ID:</b> {user_id[:8]}...", paper_info_style))
-        story.append(Spacer(1, 10))
-    
-    # Paper information
-    if paper_title and paper_title != "Research Paper Discussion":
-        story.append(Paragraph(f"<b>Paper:</b> {paper_title}", paper_info_style))
-        story.append(Spacer(1, 10))
-    
-    # Date and time
-    current_time = datetime.now().strftime("%B %d, %Y at %I:%M %p")
-    story.append(Paragraph(f"<b>Exported on:</b> {current_time}", paper_info_style))
-    story.append(Spacer(1, 20))
-    
-    # Chat messages
-    for i, message in enumerate(chat_data):
-        if message.get('type') == 'question':
-            # User question
-            question_text = clean_html_for_pdf(message.get('content', ''))
-            story.append(Paragraph(f"<b>Question {i//2 + 1}:</b> {question_text}", question_style))
-            story.append(Spacer(1, 10))
-            
-        elif message.get('type') == 'answer':
-            # AI response
-            answer_text = clean_html_for_pdf(message.get('content', ''))
-            story.append(Paragraph(f"<b>Answer:</b>", answer_style))
-            story.append(Paragraph(answer_text, answer_style))
-            story.append(Spacer(1, 20))
-    
-    # Build PDF
-    doc.build(story)
-    pdf_buffer.seek(0)
-    
-    return pdf_buffer, filename
+    if not has_request_context():
+        return active_corpus
+    if 'corpus' not in g:
+        g.corpus = active_corpus
+    return g.corpus
 
-# Load search data
-def load_search_data():
-    searches_path = os.path.join(os.path.dirname(__file__), 'SEARCHES')
-    search_data = {}
-    
-    if os.path.exists(searches_path):
-        for filename in os.listdir(searches_path):
-            if filename.endswith('.json'):
-                search_type = filename.replace('.json', '')
-                with open(os.path.join(searches_path, filename), 'r') as f:
-                    search_data[search_type] = json.load(f)
-    
-    return search_data
+print(f"Loaded {len(active_corpus['search_types'])} search types")
+print(f"Loaded {len(active_corpus['research_data'])} research papers from {active_corpus['source']}")
+print(f"Indexed {len(active_corpus['search_index'].vocabulary)} search terms")
+print(f"Corpus version: {active_corpus['version'][:12]}")
+print(f"Search types: {active_corpus['search_types']}")
 
-# Load research paper data
-def load_research_data():
-    research_path = os.path.join(os.path.dirname(__file__), 'RESEARCH_PAPER_DATA')
-    research_data = {}
-    seen_ids = set()
-    derived_id_count = 0
-    duplicate_id_count = 0
-    
-    if os.path.exists(research_path):
-        for filename in os.listdir(research_path):
-            if filename.endswith('.json'):
-                with open(os.path.join(research_path, filename), 'r') as f:
-                    data = json.load(f)
-                    
-                    # Handle both single objects and arrays of objects
-                    if isinstance(data, list):
-                        # If it's an array, process each item
-                        for item in data:
-                            # Resolve a stable identifier for the entry
-                            pmcid = item.get('PMCId') or item.get('pmcid')
-                            if not pmcid:
-                                link = item.get('Link', '') or ''
-                                match = re.search(r'(PMC\d+)', link)
-                                if match:
-                                    pmcid = match.group(1)
-                                    derived_id_count += 1
-                            if not pmcid:
-                                # Fallback synthetic id to keep the record
-                                derived_id_count += 1
-                                base_id = 'NO_PMC'
-                                pmcid = base_id
-                            
-                            # Avoid accidental overwrites when IDs repeat
-                            unique_id = pmcid
-                            suffix = 1
-                            while unique_id in research_data:
-                                duplicate_id_count += 1
-                                suffix += 1
-                                unique_id = f"{pmcid}-{suffix}"
-                            
-                            # Convert the data to our expected format
-                            research_data[unique_id] = {
-                                    'pmcid': pmcid,
-                                    'title': item.get('Title', ''),
-                                    'authors': item.get('Authors', []),
-                                    'keywords': item.get('Keywords', []),
-                                    'category': item.get('Category', ''),
-                                    'year': item.get('Study Year', item.get('year', 2023)),
-                                    'doi': f"10.1038/spacebio.{pmcid}",
-                                    'abstract': item.get('Abstract', ''),
-                                    'overview': item.get('Overview', item.get('overview', '')),
-                                    'results': 'Research results and findings from the study.',
-                                    'conclusion': item.get('Conclusion', 'Research conclusions and implications.'),
-                                    'summary': item.get('Summary', item.get('summary', '')),
-                                    'explore_more': [
-                                        {
-                                            'title': 'NCBI Publication',
-                                            'url': item.get('Link', 'https://www.ncbi.nlm.nih.gov/')
-                                        },
-                                        {
-                                            'title': 'Related NASA Research',
-                                            'url': 'https://www.nasa.gov/space-biology'
-                                        }
-                                    ],
-                                    'knowledge_graph': {
-                                        'authors': [{'name': 'Authors', 'expertise': [item.get('Category', 'Space Biology')], 'publications': 1, 'collaborations': 1}],
-                                        'keywords': [{'term': keyword, 'frequency': 1, 'related_terms': []} for keyword in item.get('Keywords', [])],
-                                        'category': {
-                                            'name': item.get('Category', 'Space Biology'),
-                                            'subcategories': [item.get('Category', 'Space Biology')],
-                                            'related_categories': ['Space Biology', 'Research']
-                                        }
-                                    }
-                                }
-                    else:
-                        # If it's a single object, process it directly
-                        pmcid = data.get('PMCId') or data.get('pmcid')
-                        if not pmcid:
-                            link = data.get('Link', '') or ''
-                            match = re.search(r'(PMC\d+)', link)
-                            if match:
-                                pmcid = match.group(1)
-                                derived_id_count += 1
-                        if not pmcid:
-                            derived_id_count += 1
-                            pmcid = 'NO_PMC'
-                        unique_id = pmcid
-                        suffix = 1
-                        while unique_id in research_data:
-                            duplicate_id_count += 1
-                            suffix += 1
-                            unique_id = f"{pmcid}-{suffix}"
-                        # Normalize single-object entries to expected format
-                        normalized = {
-                            'pmcid': pmcid,
-                            'title': data.get('Title', data.get('title', '')),
-                            'authors': data.get('Authors', data.get('authors', [])),
-                            'keywords': data.get('Keywords', data.get('keywords', [])),
-                            'category': data.get('Category', data.get('category', '')),
-                            'year': data.get('Study Year', data.get('year', 2023)),
-                            'doi': data.get('doi', f"10.1038/spacebio.{pmcid}"),
-                            'abstract': data.get('Abstract', data.get('abstract', '')),
-                            'overview': data.get('Overview', data.get('overview', '')),
-                            'results': data.get('Results', data.get('results', '')),
-                            'conclusion': data.get('Conclusion', data.get('conclusion', '')),
-                            'summary': data.get('Summary', data.get('summary', '')),
-                            'explore_more': data.get('explore_more', [
-                                {
-                                    'title': 'NCBI Publication',
-                                    'url': data.get('Link', 'https://www.ncbi.nlm.nih.gov/')
-                                },
-                                {
-                                    'title': 'Related NASA Research',
-                                    'url': 'https://www.nasa.gov/space-biology'
-                                }
-                            ]),
-                            'knowledge_graph': data.get('knowledge_graph', {
-                                'authors': [{'name': 'Authors', 'expertise': [data.get('Category', 'Space Biology')], 'publications': 1, 'collaborations': 1}],
-                                'keywords': [{'term': keyword, 'frequency': 1, 'related_terms': []} for keyword in data.get('Keywords', [])],
-                                'category': {
-                                    'name': data.get('Category', 'Space Biology'),
-                                    'subcategories': [data.get('Category', 'Space Biology')],
-                                    'related_categories': ['Space Biology', 'Research']
-                                }
-                            })
-                        }
-                        research_data[unique_id] = normalized
-    
-    return research_data
+# Everything loaded so far lives for the whole process. Moving it out of the
+# collector's generations keeps gc passes from writing to those pages, so
+# workers forked from a preloaded master keep sharing them copy-on-write.
+gc.freeze()
+
+# Seconds between checks of the source files for changes (0 disables the poller)
+CORPUS_RELOAD_INTERVAL = float(os.getenv('CORPUS_RELOAD_INTERVAL', 30))
+# Token for /api/admin/* endpoints; they are disabled when it is unset
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+class CorpusReloader:
+    """
+    Rebuilds the corpus when its source files change and swaps it in.
+
+    A change is a difference in the name, size or mtime of any source file
+    from those the active corpus was built from. maybe_check() looks at most
+    every CORPUS_RELOAD_INTERVAL seconds, from whatever request comes in,
+    and reloads in a background thread so no request waits for the rebuild.
+    Every worker process checks and reloads its own copy.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last_check = time.monotonic()
+        # Sources a build already failed on, not retried until they change
+        self.seen_fingerprint = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload = None
+        self.last_error = None
+
+    def maybe_check(self):
+        if self.interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self.last_check < self.interval or self.lock.locked():
+            return
+        self.last_check = now
+        try:
+            fingerprint = source_fingerprint()
+        except OSError as e:
+            print(f"⚠️ Corpus check failed: {str(e)}")
+            return
+        if fingerprint not in (active_corpus['fingerprint'], self.seen_fingerprint):
+            threading.Thread(target=self.reload, name='corpus-reload', daemon=True).start()
+
+    def reload(self, force=False):
+        """
+        Build a corpus from the current source files and swap it in. Returns
+        a summary, or None if another reload is already running. Unless
+        forced, nothing is rebuilt while the files' content is unchanged.
+        """
+        global active_corpus
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            previous = active_corpus
+            fingerprint = source_fingerprint()
+            if not force and fingerprint == previous['fingerprint']:
+                return {"reloaded": False, "version": previous['version'][:12]}
+
+            started = time.perf_counter()
+            try:
+                if not force and compute_corpus_version() == previous['version']:
+                    # Touched but not changed: keep the indexes, note the new mtimes
+                    active_corpus = dict(previous, fingerprint=fingerprint)
+                    return {"reloaded": False, "version": previous['version'][:12]}
+                corpus = build_corpus_from_sources()
+            except Exception as e:
+                # Typically a file caught mid-write; retried once it changes again
+                self.failures += 1
+                self.seen_fingerprint = fingerprint
+                self.last_error = str(e)
+                print(f"❌ Corpus reload failed, keeping version {previous['version'][:12]}: {str(e)}")
+                raise
+
+            # Requests already running keep the corpus they pinned
+            active_corpus = corpus
+            if corpus['version'] != previous['version']:
+                response_cache.retain(corpus['version'])
+                paper_prompt_prefix.cache_clear()
+            self.seen_fingerprint = None
+            self.reloads += 1
+            self.last_error = None
+            self.last_reload = {
+                "reloaded": True,
+                "version": corpus['version'][:12],
+                "previous_version": previous['version'][:12],
+                "research_papers": len(corpus['research_data']),
+                "seconds": round(time.perf_counter() - started, 3),
+                "at": datetime.now().isoformat()
+            }
+            print(f"🔄 Reloaded corpus {previous['version'][:12]} -> {corpus['version'][:12]}: "
+                  f"{len(corpus['research_data'])} papers in {self.last_reload['seconds']}s")
+            return self.last_reload
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "reloading": self.lock.locked(),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error
+        }
+
+corpus_reloader = CorpusReloader(CORPUS_RELOAD_INTERVAL)
 
-# Global data storage
-search_data = load_search_data()
-research_data = load_research_data()
-
-print(f"Loaded {len(search_data)} search types")
-print(f"Loaded {len(research_data)} research papers")
-if research_data:
-    # print(f"Sample PMCIDs: {list(research_data.keys())[:5]}")
-    # Show available categories
-    categories = set()
-    for paper_data in research_data.values():
-        if paper_data.get('category'):
-            categories.add(paper_data['category'])
-    # print(f"Available categories: {sorted(list(categories))}")
-if search_data:
-    print(f"Search types: {list(search_data.keys())}")
-    for key, value in search_data.items():
-        print(f"  {key}: {type(value)} with {len(value) if isinstance(value, list) else 'N/A'} items")
+@app.before_request
+def check_corpus_sources():
+    corpus_reloader.maybe_check()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Count the request and its latency under its route pattern (so
+    /api/research/<pmcid> is one series). Streamed bodies are timed to
+    their headers.
+    """
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        labels = {'route': route, 'method': request.method}
+        metrics.observe('bioastra_http_request_duration_seconds', labels, time.perf_counter() - started)
+        metrics.count('bioastra_http_requests_total', dict(labels, status=str(response.status_code)))
+        if response.status_code >= 500:
+            metrics.count('bioastra_http_request_errors_total', labels)
+        metrics.maybe_flush()
+    return response
 
 @app.route('/')
 def home():
@@ -571,22 +3917,81 @@ def home():
         "version": "1.0.0",
         "endpoints": {
             "search": "/api/search",
+            "search_export": "/api/search/export",
             "research": "/api/research/<pmcid>",
+            "suggest": "/api/suggest",
             "health": "/api/health",
+            "metrics": "/metrics",
             "chat": "/api/chat"
         }
     })
 
 @app.route('/api/health')
 def health():
+    corpus = current_corpus()
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "search_types": list(search_data.keys()),
-        "research_papers": len(research_data),
-        "gemini_configured": model is not None
+        "search_types": corpus['search_types'],
+        "research_papers": len(corpus['research_data']),
+        "corpus_version": corpus['version'][:12],
+        "corpus_source": corpus['source'],
+        "corpus_reload": corpus_reloader.stats(),
+        "gemini_configured": llm_client.configured,
+        "llm": llm_client.describe(),
+        "chat_cache": answer_cache.stats(),
+        "llm_executor": llm_executor.stats(),
+        "llm_guard": llm_guard.stats(),
+        "chat_prompts": prompt_token_stats.stats(),
+        "sessions": session_store.stats()
     })
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """
+    Request and stage metrics of every worker on this host, in the
+    Prometheus text format. Other workers' numbers are up to
+    METRICS_FLUSH_INTERVAL seconds old.
+    """
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_corpus():
+    """
+    Reload RESEARCH_PAPER_DATA and SEARCHES in this worker process now.
+    Requires the X-Admin-Token header to match ADMIN_TOKEN. Other workers
+    pick up the change through their own poller.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({
+            "success": False,
+            "error": "Admin endpoints are disabled; set ADMIN_TOKEN"
+        }), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({
+            "success": False,
+            "error": "Invalid admin token"
+        }), 401
+
+    try:
+        data = request.get_json(silent=True) or {}
+        result = corpus_reloader.reload(force=bool(data.get('force')))
+        if result is None:
+            return jsonify({
+                "success": False,
+                "error": "A reload is already running"
+            }), 409
+        return jsonify({
+            "success": True,
+            "pid": os.getpid(),
+            **result
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Reload failed: {str(e)}"
+        }), 500
+
 @app.route('/api/gemini-models')
 def list_gemini_models():
     try:
@@ -614,6 +4019,7 @@ def list_gemini_models():
 @app.route('/api/test')
 def test_data():
     # Return sample data for testing
+    research_data = current_corpus()['research_data']
     sample_papers = []
     for i, (pmcid, paper_data) in enumerate(research_data.items()):
         if i < 5:  # First 5 papers
@@ -637,34 +4043,87 @@ def list_research_papers():
     Return a list of research papers in a shape compatible with the frontend's
     previous JSON import. Each item includes keys such as:
     "Experiment No.", "Title", "Link", "PMCId", "Category", "Study Year", "Abstract".
+    Supports optional pagination (`page`, 1-based, and `page_size`) and a
+    `fields` projection (comma-separated legacy keys). Without `page` or
+    `page_size` the whole corpus is returned, as before.
     """
     try:
-        papers = []
-        for idx, (pmcid, paper) in enumerate(research_data.items()):
-            # Construct legacy-compatible structure
-            item = {
-                "Experiment No.": idx + 1,
-                "Title": paper.get('title', ''),
-                "Link": next((x.get('url') for x in paper.get('explore_more', []) if isinstance(x, dict) and x.get('title', '').lower().startswith('ncbi')), ''),
-                "PMCId": paper.get('pmcid', pmcid),
-                "Category": paper.get('category', ''),
-                "Study Year": paper.get('year', 2020),
-                "Abstract": paper.get('abstract', ''),
-                "Summary": paper.get('summary', ''),
+        fields = None
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+            unknown = [f for f in fields if f not in LEGACY_RECORD_FIELDS]
+            if unknown:
+                return jsonify({
+                    "success": False,
+                    "error": f"Unknown fields: {', '.join(unknown)}",
+                    "available_fields": list(LEGACY_RECORD_FIELDS)
+                }), 400
+
+        paginate = 'page' in request.args or 'page_size' in request.args
+        try:
+            page = int(request.args.get('page', 1))
+            page_size = int(request.args.get('page_size', RESEARCH_PAPERS_DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "page and page_size must be integers"
+            }), 400
+        page = max(1, page)
+        page_size = max(1, min(page_size, RESEARCH_PAPERS_MAX_PAGE_SIZE))
+
+        research_data = current_corpus()['research_data']
+
+        def build_body():
+            ordinals = range(len(research_data))
+            if paginate:
+                start = (page - 1) * page_size
+                ordinals = ordinals[start:start + page_size]
+
+            body = {
+                "success": True,
+                "total": len(research_data),
+                "data": [research_data.legacy_record(ordinal, fields) for ordinal in ordinals]
             }
-            papers.append(item)
+            if paginate:
+                body.update({
+                    "page": page,
+                    "page_size": page_size,
+                    "has_more": page * page_size < len(research_data)
+                })
+            return body
 
-        return jsonify({
-            "success": True,
-            "total": len(papers),
-            "data": papers
-        })
+        cache_key = f"research-papers:{page if paginate else ''}:{page_size if paginate else ''}:{','.join(fields or [])}"
+        return cached_json_response(cache_key, build_body)
     except Exception as e:
         return jsonify({
             "success": False,
             "error": str(e)
         }), 500
 
+def match_papers(query, search_type='all', match='any', filters=None):
+    """
+    Score a query and apply the filters, as /api/search does. Returns the
+    scores, the bitmap of matching ordinals and the matching ordinals in
+    corpus order; raises ValueError for malformed filters.
+    """
+    corpus = current_corpus()
+    search_index = corpus['search_index']
+    facet_index = corpus['facet_index']
+
+    # Resolve and score the query through the inverted index. Postings
+    # from research_data and the SEARCHES maps point at the same paper
+    # ordinals, so each paper appears at most once.
+    scores = search_index.search(query, search_type, match)
+
+    # Apply additional filters as bitmap operations over paper ordinals
+    with metrics.stage('filter'):
+        allowed = facet_index.filter_bitmap(filters or {})
+        result_bitmap = bitmap_from_ordinals(scores)
+        if allowed is not None:
+            result_bitmap &= allowed
+        candidates = ordinals_from_bitmap(result_bitmap)
+    return scores, result_bitmap, candidates
+
 @app.route('/api/search', methods=['POST'])
 def search():
     try:
@@ -677,134 +4136,105 @@ def search():
             
         search_type = data.get('type', 'all')
         query = data.get('query', '')
-        filters = data.get('filters', {})
+        filters = data.get('filters') or {}
+        match = data.get('match', 'any')
         
-        print(f"Search request: type={search_type}, query='{query}', filters={filters}")
-        print(f"Total research papers available: {len(research_data)}")
+        corpus = current_corpus()
+        research_data = corpus['research_data']
         
-        results = []
+        try:
+            limit = int(data.get('limit', SEARCH_DEFAULT_LIMIT))
+            offset = int(data.get('offset', 0))
+        except (TypeError, ValueError):
+            return jsonify({
+                "success": False,
+                "error": "limit and offset must be integers"
+            }), 400
+        limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+        offset = max(0, offset)
         
-        # Prepare query tokens for substring matching
-        tokens = []
-        if query and query.strip():
-            tokens = [t for t in re.split(r"\s+", query.strip()) if t]
-
-        # Helper: case-insensitive includes
-        def contains_any_token(text, tokens_list):
-            if not text or not tokens_list:
-                return False
-            lower_text = str(text).lower()
-            return any(tok.lower() in lower_text for tok in tokens_list)
-
-        # Search through research data
-        for pmcid, paper_data in research_data.items():
-            # Check if this paper matches our criteria
-            matches = False
-            
-            # If we have a query, check if it matches title, abstract, or keywords
-            if tokens:
-                keywords = paper_data.get('keywords', [])
-                if not isinstance(keywords, list):
-                    keywords = [keywords]
-                keywords_text = ' '.join(str(k) for k in keywords)
-                authors = paper_data.get('authors', [])
-                authors_text = ' '.join(str(a) for a in authors)
-                matches = (
-                    contains_any_token(paper_data.get('title', ''), tokens) or
-                    contains_any_token(keywords_text, tokens) or
-                    contains_any_token(authors_text, tokens) or
-                    contains_any_token(paper_data.get('abstract', ''), tokens)
-                )
-            else:
-                # If no query, include all papers (will be filtered by other criteria)
-                matches = True
-            
-            if matches:
-                # Apply additional filters
-                if filters.get('year') and str(paper_data.get('year', '')) != str(filters['year']):
-                    continue
-                if filters.get('category') and paper_data.get('category') != filters['category']:
-                    continue
-                
-                # Get author name from knowledge graph or use default
-                author_name = 'Research Team'
-                if paper_data.get('knowledge_graph', {}).get('authors'):
-                    author_name = paper_data['knowledge_graph']['authors'][0].get('name', 'Research Team')
-                
-                results.append({
-                    'pmcid': pmcid,
-                    'title': paper_data.get('title', ''),
-                    'author': author_name,
-                    'year': paper_data.get('year', ''),
-                    'category': paper_data.get('category', ''),
-                    'abstract': paper_data.get('abstract', '')[:200] + '...' if len(paper_data.get('abstract', '')) > 200 else paper_data.get('abstract', ''),
-                    'keywords': paper_data.get('keywords', [])
-                })
+        try:
+            scores, result_bitmap, candidates = match_papers(query, search_type, match, filters)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
-        # Also search through search data if available
-        for search_type_key, search_results in search_data.items():
-            if search_type != 'all' and search_type_key != search_type:
-                continue
-                
-            # Ensure search_results is a list
-            if not isinstance(search_results, list):
-                continue
-                
-            for result in search_results:
-                # Ensure result is a dictionary
-                if not isinstance(result, dict):
-                    continue
-                    
-                # Check if this result matches our criteria
-                matches = False
-                
-                # If we have a query, check if it matches title, abstract, or keywords
-                if tokens:
-                    keywords = result.get('keywords', '')
-                    if isinstance(keywords, list):
-                        keywords_str = ' '.join(str(k) for k in keywords)
-                    else:
-                        keywords_str = str(keywords)
-                    author_text = str(result.get('author', ''))
-                    matches = (
-                        contains_any_token(result.get('title', ''), tokens) or
-                        contains_any_token(keywords_str, tokens) or
-                        contains_any_token(author_text, tokens) or
-                        contains_any_token(result.get('abstract', ''), tokens)
-                    )
-                else:
-                    # If no query, include all results (will be filtered by other criteria)
-                    matches = True
-                
-                if matches:
-                    
-                    # Apply additional filters
-                    if filters.get('year') and result.get('year') != filters['year']:
-                        continue
-                    if filters.get('category') and result.get('category') != filters['category']:
-                        continue
-                    
-                    results.append({
-                        'pmcid': result.get('pmcid'),
-                        'title': result.get('title'),
-                        'author': result.get('author'),
-                        'year': result.get('year'),
-                        'category': result.get('category'),
-                        'abstract': result.get('abstract', '')[:200] + '...' if len(result.get('abstract', '')) > 200 else result.get('abstract', ''),
-                        'keywords': result.get('keywords', [])
-                    })
+        log('info', f"Search request: type={search_type}, query='{query}', filters={filters}, "
+                    f"{len(candidates)} of {len(research_data)} papers", sampled=True)
         
-        print(f"Found {len(results)} results")
-        return jsonify({
+        # Only the requested page is ranked and serialized
+        with metrics.stage('rank'):
+            page = SearchIndex.top_k(scores, candidates, offset + limit)[offset:]
+        
+        serialize_started = time.perf_counter()
+        results = []
+        for ordinal in page:
+            # Get author name from knowledge graph or use default
+            author_name = 'Research Team'
+            knowledge_graph = research_data.field(ordinal, 'knowledge_graph') or {}
+            if knowledge_graph.get('authors'):
+                author_name = knowledge_graph['authors'][0].get('name', 'Research Team')
+            
+            abstract = research_data.field(ordinal, 'abstract') or ''
+            results.append({
+                'pmcid': research_data.doc_ids[ordinal],
+                'title': research_data.field(ordinal, 'title'),
+                'author': author_name,
+                'year': research_data.field(ordinal, 'year'),
+                'category': research_data.field(ordinal, 'category'),
+                'abstract': abstract[:200] + '...' if len(abstract) > 200 else abstract,
+                'keywords': research_data.field(ordinal, 'keywords'),
+                'score': round(scores[ordinal], 4)
+            })
+        
+        serialize_seconds = time.perf_counter() - serialize_started
+        next_offset = offset + len(results)
+        response = {
             "success": True,
             "results": results,
-            "total": len(results),
+            "total": len(candidates),
+            "limit": limit,
+            "offset": offset,
+            "next_offset": next_offset if next_offset < len(candidates) else None,
             "query": query,
             "filters": filters
-        })
+        }
+        
+        # Faceted mode: counts over the whole filtered result set, not just this page
+        requested_facets = data.get('facets')
+        if requested_facets:
+            if requested_facets is True:
+                requested_facets = FacetIndex.FACETS
+            elif isinstance(requested_facets, str):
+                requested_facets = [requested_facets]
+            elif not isinstance(requested_facets, list) or not all(isinstance(f, str) for f in requested_facets):
+                return jsonify({
+                    "success": False,
+                    "error": "facets must be true, a facet name or a list of facet names"
+                }), 400
+            unknown = [f for f in requested_facets if f not in FacetIndex.FACETS]
+            if unknown:
+                return jsonify({
+                    "success": False,
+                    "error": f"Unknown facets: {', '.join(map(str, unknown))}"
+                }), 400
+            try:
+                top_n = max(1, int(data.get('facet_limit', FACET_DEFAULT_TOP_N)))
+            except (TypeError, ValueError):
+                top_n = FACET_DEFAULT_TOP_N
+            with metrics.stage('facets'):
+                response["facets"] = corpus['facet_index'].counts(result_bitmap, requested_facets, top_n)
+        
+        serialize_started = time.perf_counter()
+        response = jsonify(response)
+        serialize_seconds += time.perf_counter() - serialize_started
+        metrics.observe('bioastra_stage_duration_seconds', {'stage': 'serialize'}, serialize_seconds)
+        return response
         
     except Exception as e:
-        print(f"Search error: {str(e)}")
+        log('error', f"Search error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({
@@ -812,33 +4242,133 @@ def search():
             "error": str(e)
         }), 500
 
+# Columns /api/search/export can write, as getters over (papers, ordinal, scores)
+SEARCH_EXPORT_FIELDS = {
+    'pmcid': lambda papers, ordinal, scores: papers.doc_ids[ordinal],
+    'title': lambda papers, ordinal, scores: papers.field(ordinal, 'title'),
+    'authors': lambda papers, ordinal, scores: papers.field(ordinal, 'authors'),
+    'year': lambda papers, ordinal, scores: papers.field(ordinal, 'year'),
+    'category': lambda papers, ordinal, scores: papers.field(ordinal, 'category'),
+    'keywords': lambda papers, ordinal, scores: papers.field(ordinal, 'keywords'),
+    'abstract': lambda papers, ordinal, scores: papers.field(ordinal, 'abstract'),
+    'overview': lambda papers, ordinal, scores: papers.field(ordinal, 'overview'),
+    'conclusion': lambda papers, ordinal, scores: papers.field(ordinal, 'conclusion'),
+    'summary': lambda papers, ordinal, scores: papers.field(ordinal, 'summary'),
+    'link': lambda papers, ordinal, scores: papers.link(ordinal),
+    'score': lambda papers, ordinal, scores: round(scores[ordinal], 4),
+}
+SEARCH_EXPORT_DEFAULT_FIELDS = ('pmcid', 'title', 'authors', 'year', 'category', 'keywords', 'score')
+SEARCH_EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Rows are written out in chunks of about this many bytes
+SEARCH_EXPORT_CHUNK_BYTES = 64 * 1024
+
+def export_rows(papers, ordinals, scores, fields, export_format):
+    """
+    Encode the papers at `ordinals` one row at a time as NDJSON lines or CSV
+    rows (list values joined with "; "), yielding chunks of about
+    SEARCH_EXPORT_CHUNK_BYTES
+    """
+    getters = [SEARCH_EXPORT_FIELDS[field] for field in fields]
+    buffer = io.StringIO()
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+    for ordinal in ordinals:
+        values = [getter(papers, ordinal, scores) for getter in getters]
+        if export_format == 'csv':
+            writer.writerow(['; '.join(map(str, value)) if isinstance(value, list) else value for value in values])
+        else:
+            buffer.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False))
+            buffer.write('\n')
+        if buffer.tell() >= SEARCH_EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@app.route('/api/search/export', methods=['POST'])
+def export_search():
+    """
+    Stream every paper matching a search as NDJSON or CSV.
+
+    Takes the same type, query, match and filters as /api/search plus
+    `format` ("ndjson" or "csv") and `fields` (a list of column names). Rows
+    come in relevance order, or corpus order for an empty query, and are
+    encoded as the response is written, so memory and time to first byte do
+    not grow with the number of matches. The match count is sent up front
+    in X-Total-Count.
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({
+                "success": False,
+                "error": "No JSON data provided"
+            }), 400
+
+        export_format = str(data.get('format', 'ndjson')).lower()
+        if export_format not in SEARCH_EXPORT_FORMATS:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown format: {export_format}",
+                "available_formats": list(SEARCH_EXPORT_FORMATS)
+            }), 400
+
+        fields = data.get('fields') or list(SEARCH_EXPORT_DEFAULT_FIELDS)
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(',') if f.strip()]
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            return jsonify({
+                "success": False,
+                "error": "fields must be a list of field names",
+                "available_fields": list(SEARCH_EXPORT_FIELDS)
+            }), 400
+        unknown = [f for f in fields if f not in SEARCH_EXPORT_FIELDS]
+        if unknown:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown fields: {', '.join(map(str, unknown))}",
+                "available_fields": list(SEARCH_EXPORT_FIELDS)
+            }), 400
+
+        query = data.get('query', '')
+        try:
+            scores, _, candidates = match_papers(query, data.get('type', 'all'),
+                                                 data.get('match', 'any'), data.get('filters') or {})
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+
+        # Ranking only reorders ordinals; the rows themselves are built lazily
+        if tokenize(query):
+            candidates = SearchIndex.top_k(scores, candidates, len(candidates))
+        log('info', f"Search export: query='{query}', {len(candidates)} papers as {export_format}", sampled=True)
+
+        rows = export_rows(current_corpus()['research_data'], candidates, scores, fields, export_format)
+        response = Response(rows, mimetype=SEARCH_EXPORT_FORMATS[export_format])
+        response.headers['Content-Disposition'] = f'attachment; filename="bio-astra-papers.{export_format}"'
+        response.headers['X-Total-Count'] = str(len(candidates))
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        log('error', f"Search export error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/research/<pmcid>')
 def get_research_paper(pmcid):
     try:
+        research_data = current_corpus()['research_data']
         if pmcid in research_data:
-            paper = research_data[pmcid]
-            # Ensure legacy keys also present for compatibility
-            enriched = dict(paper)
-            if 'Overview' not in enriched and enriched.get('overview'):
-                enriched['Overview'] = enriched['overview']
-            if 'Summary' not in enriched and enriched.get('summary'):
-                enriched['Summary'] = enriched['summary']
-            if 'Abstract' not in enriched and enriched.get('abstract'):
-                enriched['Abstract'] = enriched['abstract']
-            if 'Conclusion' not in enriched and enriched.get('conclusion'):
-                enriched['Conclusion'] = enriched['conclusion']
-            if 'Keywords' not in enriched and enriched.get('keywords'):
-                enriched['Keywords'] = enriched['keywords']
-            if 'Category' not in enriched and enriched.get('category'):
-                enriched['Category'] = enriched['category']
-            if 'Study Year' not in enriched and enriched.get('year'):
-                enriched['Study Year'] = enriched['year']
-            if 'Title' not in enriched and enriched.get('title'):
-                enriched['Title'] = enriched['title']
-
-            return jsonify({
+            return cached_json_response(f"research:{pmcid}", lambda: {
                 "success": True,
-                "data": enriched
+                "data": enrich_research_paper(research_data[pmcid])
             })
         else:
             return jsonify({
@@ -852,44 +4382,130 @@ def get_research_paper(pmcid):
             "error": str(e)
         }), 500
 
+# Fields a /api/research/batch projection may name (keys of a normalized paper)
+RESEARCH_BATCH_FIELDS = ('pmcid', 'title', 'authors', 'keywords', 'category', 'year', 'doi', 'abstract',
+                         'overview', 'results', 'conclusion', 'summary', 'explore_more', 'knowledge_graph')
+RESEARCH_BATCH_MAX_SIZE = 100
+
+@app.route('/api/research/batch', methods=['POST'])
+def get_research_papers_batch():
+    """
+    Several papers in one response. Body: {"pmcids": [...], "fields": [...]}.
+    Without `fields` each paper is returned as /api/research/<pmcid> would
+    return it; with `fields` only those keys (plus pmcid) are read from the
+    column store. PMCIDs that are not in the corpus are listed in `missing`.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        pmcids = data.get('pmcids')
+        if not isinstance(pmcids, list) or not all(isinstance(pmcid, str) for pmcid in pmcids):
+            return jsonify({
+                "success": False,
+                "error": "pmcids must be a list of PMCIDs"
+            }), 400
+        pmcids = list(dict.fromkeys(pmcids))
+        if len(pmcids) > RESEARCH_BATCH_MAX_SIZE:
+            return jsonify({
+                "success": False,
+                "error": f"At most {RESEARCH_BATCH_MAX_SIZE} PMCIDs per request",
+                "max_batch_size": RESEARCH_BATCH_MAX_SIZE
+            }), 400
+
+        fields = data.get('fields')
+        if fields:
+            if isinstance(fields, str):
+                fields = [f.strip() for f in fields.split(',') if f.strip()]
+            if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+                return jsonify({
+                    "success": False,
+                    "error": "fields must be a list of field names",
+                    "available_fields": list(RESEARCH_BATCH_FIELDS)
+                }), 400
+            unknown = [f for f in fields if f not in RESEARCH_BATCH_FIELDS]
+            if unknown:
+                return jsonify({
+                    "success": False,
+                    "error": f"Unknown fields: {', '.join(map(str, unknown))}",
+                    "available_fields": list(RESEARCH_BATCH_FIELDS)
+                }), 400
+            fields = ['pmcid'] + [f for f in fields if f != 'pmcid']
+
+        research_data = current_corpus()['research_data']
+        papers = {}
+        missing = []
+        for pmcid in pmcids:
+            ordinal = research_data.ordinals.get(pmcid)
+            if ordinal is None:
+                missing.append(pmcid)
+            elif fields:
+                papers[pmcid] = {field: research_data.field(ordinal, field) for field in fields}
+            else:
+                papers[pmcid] = enrich_research_paper(research_data.paper(ordinal))
+
+        return jsonify({
+            "success": True,
+            "data": papers,
+            "missing": missing,
+            "total": len(papers)
+        })
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
 @app.route('/api/categories')
 def get_categories():
-    categories = set()
-    
-    # Get categories from research data
-    for paper_data in research_data.values():
-        if paper_data.get('category'):
-            categories.add(paper_data['category'])
-    
-    # Get categories from search data
-    for search_results in search_data.values():
-        for result in search_results:
-            if result.get('category'):
-                categories.add(result['category'])
-    
-    return jsonify({
+    return cached_json_response("categories", build_categories_body)
+
+def build_categories_body():
+    return {
         "success": True,
-        "categories": sorted(list(categories))
-    })
+        "categories": current_corpus()['facet_index'].categories()
+    }
 
 @app.route('/api/years')
 def get_years():
-    years = set()
-    
-    # Get years from research data
-    for paper_data in research_data.values():
-        if paper_data.get('year'):
-            years.add(paper_data['year'])
-    
-    # Get years from search data
-    for search_results in search_data.values():
-        for result in search_results:
-            if result.get('year'):
-                years.add(result['year'])
-    
+    return cached_json_response("years", build_years_body)
+
+def build_years_body():
+    return {
+        "success": True,
+        "years": current_corpus()['facet_index'].years()
+    }
+
+@app.route('/api/suggest')
+def suggest():
+    """
+    Typeahead completions for the search box: titles, authors, keywords and
+    categories with a word starting with `q`, most papers first. `types`
+    (comma-separated) narrows the kinds and `limit` sets the completions
+    per kind. Not kept in the response cache, which every keystroke's
+    distinct prefix would churn.
+    """
+    query = request.args.get('q', '')
+    kinds = [k.strip() for k in request.args.get('types', ','.join(SuggestIndex.KINDS)).split(',') if k.strip()]
+    unknown = [k for k in kinds if k not in SuggestIndex.KINDS]
+    if unknown:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown types: {', '.join(unknown)}",
+            "available_types": list(SuggestIndex.KINDS)
+        }), 400
+    try:
+        limit = int(request.args.get('limit', SUGGEST_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({
+            "success": False,
+            "error": "limit must be an integer"
+        }), 400
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+
+    corpus = current_corpus()
     return jsonify({
         "success": True,
-        "years": sorted(list(years), reverse=True)
+        "query": query,
+        "suggestions": corpus['suggest_index'].suggest(query, kinds, limit, corpus['research_data'])
     })
 
 @app.route('/api/chat', methods=['POST'])
@@ -900,7 +4516,6 @@ def chat():
         
         data = request.get_json()
         user_message = data.get('message', '')
-        paper_context = data.get('paper_context', {})
         
         if not user_message:
             return jsonify({
@@ -908,93 +4523,190 @@ def chat():
                 "error": "Message is required"
             }), 400
         
-        if not model:
+        # Paper context from the corpus by "doc_id", or as sent in "paper_context"
+        context = resolve_chat_context(data)
+        if context is None:
+            return jsonify({
+                "success": False,
+                "error": "Research paper not found"
+            }), 404
+        prompt_prefix, prefix_hash, paper_context = context
+        
+        if not llm_client.configured:
             return jsonify({
                 "success": False,
                 "error": "Gemini API not configured. Please set GEMINI_API_KEY environment variable."
             }), 500
         
-        # Add user question to chat history
-        add_to_chat_history(user_id, 'question', user_message, paper_context)
+        # Earlier turns about this paper, within the history token budget
+        conversation = build_conversation_context(user_id, paper_context)
+        context_prompt = build_chat_prompt(prompt_prefix, user_message, conversation)
+        prompt_tokens = estimate_tokens(context_prompt)
         
-        # Helper function to safely format lists
-        def format_list(items):
-            if not items:
-                return 'N/A'
-            if isinstance(items, list):
-                # Handle both strings and dictionaries
-                formatted_items = []
-                for item in items:
-                    if isinstance(item, dict):
-                        # Extract name or term from dictionary
-                        if 'name' in item:
-                            formatted_items.append(item['name'])
-                        elif 'term' in item:
-                            formatted_items.append(item['term'])
-                        else:
-                            formatted_items.append(str(item))
-                    else:
-                        formatted_items.append(str(item))
-                return ', '.join(formatted_items)
-            return str(items)
-
-        # Create context-aware prompt with formatting instructions
-        context_prompt = f"""
-You are a specialized AI assistant for space biology research papers. You have access to the following research paper information:
-
-Title: {paper_context.get('title', 'N/A')}
-Category: {paper_context.get('category', 'N/A')}
-Authors: {format_list(paper_context.get('authors', []))}
-Keywords: {format_list(paper_context.get('keywords', []))}
-Abstract: {paper_context.get('abstract', 'N/A')}
-Conclusion: {paper_context.get('conclusion', 'N/A')}
-PMCID: {paper_context.get('pmcid', 'N/A')}
-
-User Question: {user_message}
-
-Please provide a helpful, accurate response based on the research paper information provided. If the question is not directly related to this specific paper, you can still provide general information about space biology topics, but make it clear when you're doing so.
-
-IMPORTANT FORMATTING INSTRUCTIONS:
-- Use **bold text** for important terms, concepts, and key findings
-- Use *italic text* for emphasis and technical terms
-- Use bullet points (- or *) for lists and key points
-- Use numbered lists (1. 2. 3.) for step-by-step processes
-- Structure your response with clear headings and sections
-- Make the response easy to read and well-formatted
-
-Guidelines:
-1. Be specific and reference the paper when relevant
-2. Use scientific terminology appropriately
-3. Provide clear explanations
-4. If you don't have enough information from the paper, say so
-5. Keep responses concise but informative
-6. Focus on space biology and research methodology when relevant
-7. Use proper markdown formatting for better readability
-"""
+        # Reuse an earlier answer to the same question about the same paper
+        cache_key = chat_cache_key(prefix_hash, user_message, llm_client.model_key(), conversation)
+        response_text = answer_cache.get(cache_key)
+        cached = response_text is not None
+        # Claim an LLM slot before recording the question, so a turned-away chat leaves no trace
+        wait_for_answer = None if cached else llm_guard.submit(context_prompt)
+        
+        # Add user question to chat history
+        try:
+            add_to_chat_history(user_id, 'question', user_message, paper_context)
+        except Exception:
+            if wait_for_answer is not None:
+                wait_for_answer.abandon()
+            raise
         
-        # Generate response using Gemini
-        response = model.generate_content(context_prompt)
+        if wait_for_answer is not None:
+            # Generate response using Gemini
+            response_text = wait_for_answer()
+            prompt_token_stats.record(prompt_tokens, estimate_tokens(conversation))
+            answer_cache.put(cache_key, response_text, llm_client.describe()["model"])
         
         # Convert markdown to HTML for better display
-        formatted_response = markdown_to_html(response.text)
+        formatted_response = markdown_to_html(response_text)
         
         # Add AI response to chat history
-        add_to_chat_history(user_id, 'answer', response.text, paper_context)
+        add_to_chat_history(user_id, 'answer', response_text, paper_context)
         
         return jsonify({
             "success": True,
             "response": formatted_response,
-            "raw_response": response.text,  # Keep original for debugging
+            "raw_response": response_text,  # Keep original for debugging
+            "cached": cached,
+            "prompt_tokens": prompt_tokens,
             "user_id": user_id[:8] + "..."  # Return partial user ID for debugging
         })
         
+    except LLMOverloadedError as e:
+        log('warning', f"Chat rejected: {str(e)}", sampled=True)
+        return overloaded_response(e)
+    except LLMTimeoutError as e:
+        log('error', f"Chat error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 504
+    except LLMUnavailableError as e:
+        log('error', f"Chat error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 503
+    except Exception as e:
+        log('error', f"Chat error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Failed to generate response: {str(e)}"
+        }), 500
+
+def sse_event(event, payload):
+    """
+    Encode one Server-Sent Events message with a JSON payload
+    """
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat over Server-Sent Events.
+
+    Emits a "chunk" event per piece of generated text with the raw text and
+    the HTML of the lines it completed, then a "done" event with the HTML of
+    the last line and the full answer, or an "error" event. The answer is
+    added to the chat history once the stream has finished.
+    """
+    try:
+        # Get or create user session
+        user_id = get_or_create_user_session()
+        
+        data = request.get_json()
+        user_message = data.get('message', '')
+        
+        if not user_message:
+            return jsonify({
+                "success": False,
+                "error": "Message is required"
+            }), 400
+        
+        # Paper context from the corpus by "doc_id", or as sent in "paper_context"
+        context = resolve_chat_context(data)
+        if context is None:
+            return jsonify({
+                "success": False,
+                "error": "Research paper not found"
+            }), 404
+        prompt_prefix, prefix_hash, paper_context = context
+        
+        if not llm_client.configured:
+            return jsonify({
+                "success": False,
+                "error": "Gemini API not configured. Please set GEMINI_API_KEY environment variable."
+            }), 500
+        
+        conversation = build_conversation_context(user_id, paper_context)
+        context_prompt = build_chat_prompt(prompt_prefix, user_message, conversation)
+        prompt_tokens = estimate_tokens(context_prompt)
+        cache_key = chat_cache_key(prefix_hash, user_message, llm_client.model_key(), conversation)
+        cached_text = answer_cache.get(cache_key)
+        # Admission happens here, while a 503 can still be returned
+        chunks = [cached_text] if cached_text is not None else llm_guard.stream(context_prompt)
+        try:
+            add_to_chat_history(user_id, 'question', user_message, paper_context)
+        except Exception:
+            if cached_text is None:
+                chunks.close()
+            raise
+    except LLMOverloadedError as e:
+        log('warning', f"Chat rejected: {str(e)}", sampled=True)
+        return overloaded_response(e)
     except Exception as e:
-        print(f"Chat error: {str(e)}")
+        log('error', f"Chat error: {str(e)}")
         return jsonify({
             "success": False,
             "error": f"Failed to generate response: {str(e)}"
         }), 500
 
+    def generate_events():
+        renderer = MarkdownStreamRenderer()
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event('chunk', {"text": chunk, "html": renderer.feed(chunk)})
+            tail = renderer.close()
+        except Exception as e:
+            log('error', f"Chat stream error: {str(e)}")
+            yield sse_event('error', {
+                "success": False,
+                "error": f"Failed to generate response: {str(e)}"
+            })
+            return
+
+        response_text = ''.join(parts)
+        if cached_text is None:
+            answer_cache.put(cache_key, response_text, llm_client.describe()["model"])
+            prompt_token_stats.record(prompt_tokens, estimate_tokens(conversation))
+        add_to_chat_history(user_id, 'answer', response_text, paper_context)
+        yield sse_event('done', {
+            "success": True,
+            "html": tail,
+            "raw_response": response_text,
+            "cached": cached_text is not None,
+            "prompt_tokens": prompt_tokens,
+            "user_id": user_id[:8] + "..."
+        })
+
+    response = Response(stream_with_context(generate_events()), mimetype='text/event-stream')
+    if cached_text is None:
+        # Runs even if the client leaves before the first chunk is read
+        response.call_on_close(chunks.close)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/export-chat', methods=['POST'])
 def export_chat():
     """
@@ -1016,23 +4728,99 @@ def export_chat():
                 "error": "No chat messages found for this session"
             }), 400
         
-        # Create PDF in-memory and stream to client
-        pdf_buffer, filename = create_chat_pdf(chat_messages, paper_title, user_id)
+        # Render the PDF (or reuse the one rendered for this exact conversation) and send it
+        job_id = export_job_id(user_id, paper_title, chat_messages)
+        pdf_path = export_jobs.render_now(job_id, chat_messages, paper_title, user_id)
         
         return send_file(
-            pdf_buffer,
+            pdf_path,
             as_attachment=True,
-            download_name=filename,
+            download_name=export_jobs.download_name(job_id),
             mimetype='application/pdf'
         )
         
     except Exception as e:
-        print(f"Export error: {str(e)}")
+        log('error', f"Export error: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Failed to export chat: {str(e)}"
+        }), 500
+
+def export_job_body(job_id, status):
+    body = {
+        "success": status["status"] != "failed",
+        "job_id": job_id,
+        "status_url": f"/api/export-chat/jobs/{job_id}",
+        "download_url": f"/api/export-chat/jobs/{job_id}/download"
+    }
+    body.update(status)
+    return body
+
+@app.route('/api/export-chat/jobs', methods=['POST'])
+def start_export_job():
+    """
+    Start rendering the chat PDF in the background. Answers 202 while the
+    job runs and 200 when an identical export is already rendered; poll
+    the status_url, then fetch the download_url.
+    """
+    try:
+        user_id = get_or_create_user_session()
+        
+        data = request.get_json(silent=True) or {}
+        paper_title = data.get('paper_title', 'Research Paper Discussion')
+        
+        chat_messages = get_user_chat_history(user_id)
+        
+        if not chat_messages:
+            return jsonify({
+                "success": False,
+                "error": "No chat messages found for this session"
+            }), 400
+        
+        job_id = export_job_id(user_id, paper_title, chat_messages)
+        status = export_jobs.submit(job_id, chat_messages, paper_title, user_id)
+        return jsonify(export_job_body(job_id, status)), 200 if status["status"] == "done" else 202
+        
+    except Exception as e:
+        log('error', f"Export error: {str(e)}")
         return jsonify({
             "success": False,
             "error": f"Failed to export chat: {str(e)}"
         }), 500
 
+@app.route('/api/export-chat/jobs/<job_id>')
+def get_export_job(job_id):
+    """
+    Status of an export job: pending, done or failed
+    """
+    status = export_jobs.status(job_id) if EXPORT_JOB_ID_PATTERN.fullmatch(job_id) else None
+    if status is None:
+        return jsonify({
+            "success": False,
+            "error": "Export job not found"
+        }), 404
+    return jsonify(export_job_body(job_id, status))
+
+@app.route('/api/export-chat/jobs/<job_id>/download')
+def download_export_job(job_id):
+    """
+    The rendered PDF of a finished export job
+    """
+    status = export_jobs.status(job_id) if EXPORT_JOB_ID_PATTERN.fullmatch(job_id) else None
+    if status is None:
+        return jsonify({
+            "success": False,
+            "error": "Export job not found"
+        }), 404
+    if status["status"] != "done":
+        return jsonify(export_job_body(job_id, status)), 409
+    return send_file(
+        export_jobs.path(job_id),
+        as_attachment=True,
+        download_name=export_jobs.download_name(job_id),
+        mimetype='application/pdf'
+    )
+
 @app.route('/api/chat-history', methods=['GET'])
 def get_chat_history():
     """
@@ -1062,8 +4850,7 @@ def clear_chat():
     try:
         user_id = get_or_create_user_session()
         
-        if user_id in user_sessions:
-            user_sessions[user_id]['chat_history'] = []
+        session_store.clear_history(user_id)
         
         return jsonify({
             "success": True,
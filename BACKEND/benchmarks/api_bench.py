@@ -0,0 +1,676 @@
+"""
+Load benchmark for the HTTP API on synthetic corpora.
+
+Generates corpora shaped like RESEARCH_PAPER_DATA/Research_Paper_Data.json
+and the SEARCHES maps at multiples of the real corpus, then drives
+/api/search, /api/research/<pmcid>, /api/research-papers, /api/chat and
+/api/export-chat against each one: in-process through Flask's test client,
+and over HTTP through a local gunicorn started as in the procfile. Chat
+answers come from the stub LLM backend, so no network or API key is needed.
+
+    python benchmarks/api_bench.py                      # 1x, 10x and 100x, both modes
+    python benchmarks/api_bench.py --scales 1 10 --modes inprocess --json base.json
+    python benchmarks/api_bench.py --scales 1 --json new.json --compare base.json
+
+Per endpoint it reports throughput, p50/p95/p99 latency, errors and the
+peak resident memory of the serving processes while that endpoint ran
+(gunicorn's master and workers summed; PSS too, since --preload workers
+share most of their pages). Corpora are generated from a fixed seed and
+cached under CACHE/bench_corpus, and the report records the settings and
+commit it was produced with, so runs on the same machine are comparable.
+
+Notes:
+- The client runs on the same machine as the server, so on small hosts it
+  competes with the workers for CPU; compare runs from the same host.
+- Chat throughput is bounded by LLM_MAX_CONCURRENCY calls of
+  --llm-latency seconds per worker; rejected calls show up as 503 errors.
+- Each export runs against its own session, prepared with one untimed
+  chat turn, so every timed export renders a PDF.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_CORPUS = os.path.join(BACKEND_DIR, 'RESEARCH_PAPER_DATA', 'Research_Paper_Data.json')
+DEFAULT_CORPUS_DIR = os.path.join(BACKEND_DIR, 'CACHE', 'bench_corpus')
+ENDPOINTS = ('search', 'research', 'research_papers', 'chat', 'export_chat')
+MODES = ('inprocess', 'gunicorn')
+TEXT_FIELDS = ('Title', 'Abstract', 'Conclusion', 'Overview', 'Summary')
+# Bump when the generated corpus changes shape, so cached corpora are rebuilt
+GENERATOR_VERSION = 1
+PMCID_BASE = 20000000
+
+
+def load_base():
+    with open(BASE_CORPUS) as f:
+        return json.load(f)
+
+
+def word_pools(base):
+    """
+    Words of each text field across the real corpus, sampled with their
+    real frequencies so term statistics resemble the original
+    """
+    pools = {field: [] for field in TEXT_FIELDS}
+    for record in base:
+        for field in TEXT_FIELDS:
+            pools[field].extend(str(record.get(field) or '').split())
+    return pools
+
+
+def query_terms(base):
+    """
+    Title words long enough to be meaningful search terms
+    """
+    terms = set()
+    for record in base:
+        for word in str(record.get('Title') or '').split():
+            word = word.strip('.,:;()[]"\'').lower()
+            if len(word) > 4 and word.isalpha():
+                terms.add(word)
+    return sorted(terms)
+
+
+def author_pool(base, scale, rng):
+    """
+    The real authors plus synthetic ones recombined from real first and
+    last names, so the author map grows with the corpus
+    """
+    real = sorted({author for record in base for author in record.get('Authors') or []})
+    names = [author.split() for author in real if len(author.split()) >= 2]
+    authors = list(real)
+    seen = set(real)
+    while len(authors) < len(real) * scale:
+        author = f"{rng.choice(names)[0]} {rng.choice(names)[-1]}"
+        if author in seen:
+            author = f"{author} {len(authors)}"
+        seen.add(author)
+        authors.append(author)
+    return authors
+
+
+def generate_corpus(directory, scale, seed):
+    """
+    Write a corpus of `scale` times the real paper count into `directory`:
+    RESEARCH_PAPER_DATA/Research_Paper_Data.json and the five SEARCHES
+    maps. Record i takes its category, year and field lengths from real
+    record i % n and samples its text from the real vocabulary.
+    """
+    base = load_base()
+    rng = random.Random(seed)
+    pools = word_pools(base)
+    authors = author_pool(base, scale, rng)
+    keywords = sorted({keyword for record in base for keyword in record.get('Keywords') or []})
+
+    research_dir = os.path.join(directory, 'RESEARCH_PAPER_DATA')
+    searches_dir = os.path.join(directory, 'SEARCHES')
+    os.makedirs(research_dir, exist_ok=True)
+    os.makedirs(searches_dir, exist_ok=True)
+
+    by_author, by_category, by_keyword, by_year, titles = {}, {}, {}, {}, []
+    papers = len(base) * scale
+    with open(os.path.join(research_dir, 'Research_Paper_Data.json'), 'w') as f:
+        f.write('[\n')
+        for i in range(papers):
+            template = base[i % len(base)]
+            pmcid = f"PMC{PMCID_BASE + i}"
+            record = {
+                'Experiment No.': i + 1,
+                'Title': None,
+                'Link': f"https://www.ncbi.nlm.nih.gov/pmc/articles/{pmcid}/",
+                'PMCId': pmcid,
+                'Category': template.get('Category', ''),
+                'Study Year': template.get('Study Year'),
+            }
+            for field in TEXT_FIELDS:
+                length = len(str(template.get(field) or '').split())
+                record[field] = ' '.join(rng.choices(pools[field], k=length))
+            record['Keywords'] = list(dict.fromkeys(
+                rng.choices(keywords, k=len(template.get('Keywords') or [])) if keywords else []))
+            record['Authors'] = list(dict.fromkeys(
+                rng.choices(authors, k=len(template.get('Authors') or []))))
+            f.write(('' if i == 0 else ',\n') + json.dumps(record))
+
+            titles.append({'PMCID': pmcid, 'Title': record['Title']})
+            by_category.setdefault(record['Category'], []).append(pmcid)
+            by_year.setdefault(str(record['Study Year']), []).append(pmcid)
+            for author in record['Authors']:
+                by_author.setdefault(author, []).append(pmcid)
+            for keyword in record['Keywords']:
+                by_keyword.setdefault(keyword, []).append(pmcid)
+        f.write('\n]\n')
+
+    for name, data in (('Search_By_Author.json', by_author), ('Search_By_Category.json', by_category),
+                       ('Search_By_Keyword.json', by_keyword), ('Search_By_Title.json', titles),
+                       ('Search_By_Year.json', by_year)):
+        with open(os.path.join(searches_dir, name), 'w') as f:
+            json.dump(data, f)
+
+    manifest = {'scale': scale, 'seed': seed, 'papers': papers, 'generator_version': GENERATOR_VERSION}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def ensure_corpus(root, scale, seed):
+    """
+    Corpus directory for this scale and seed, generated on first use
+    """
+    directory = os.path.join(root, f"scale-{scale}-seed-{seed}")
+    manifest_path = os.path.join(directory, 'manifest.json')
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('generator_version') == GENERATOR_VERSION:
+            return directory, manifest
+    except (OSError, ValueError):
+        pass
+    started = time.perf_counter()
+    print(f"Generating {scale}x corpus in {directory}...", file=sys.stderr)
+    manifest = generate_corpus(directory, scale, seed)
+    print(f"Generated {manifest['papers']} papers in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return directory, manifest
+
+
+def app_environment(corpus_dir, scratch, llm_latency, session_store='memory'):
+    """
+    Environment pointing the app at the synthetic corpus, the stub model
+    and throwaway caches and session store
+    """
+    env = dict(os.environ)
+    env.update({
+        'RESEARCH_PAPER_DATA_DIR': os.path.join(corpus_dir, 'RESEARCH_PAPER_DATA'),
+        'SEARCHES_DIR': os.path.join(corpus_dir, 'SEARCHES'),
+        'CORPUS_SNAPSHOT_PATH': '',
+        'CORPUS_RELOAD_INTERVAL': '0',
+        'LLM_BACKEND': 'stub',
+        'STUB_LLM_LATENCY': str(llm_latency),
+        'CHAT_CACHE_PATH': os.path.join(scratch, 'chat_answers.sqlite3'),
+        'EXPORT_CACHE_DIR': os.path.join(scratch, 'exports'),
+        'SESSION_STORE': session_store,
+        'SESSION_STORE_PATH': os.path.join(scratch, 'sessions.sqlite3'),
+    })
+    return env
+
+
+def build_workload(endpoint, count, papers, terms, seed):
+    """
+    `count` request specs (method, path, body) for one endpoint, drawn from
+    a fixed seed so every run sends the same requests
+    """
+    rng = random.Random(f"{seed}-{endpoint}")
+    pmcid = lambda: f"PMC{PMCID_BASE + rng.randrange(papers)}"
+    specs = []
+    for i in range(count):
+        if endpoint == 'search':
+            body = {'query': ' '.join(rng.sample(terms, rng.randint(1, 2))), 'limit': 20}
+            roll = rng.random()
+            if roll < 0.25:
+                body['filters'] = {'year': '2015-2020'}
+            elif roll < 0.4:
+                body['facets'] = True
+            specs.append(('POST', '/api/search', body))
+        elif endpoint == 'research':
+            specs.append(('GET', f"/api/research/{pmcid()}", None))
+        elif endpoint == 'research_papers':
+            page = rng.randint(1, max(1, papers // 50))
+            specs.append(('GET', f"/api/research-papers?page={page}&page_size=50", None))
+        elif endpoint == 'chat':
+            # Unique messages, so every turn misses the answer cache
+            message = f"What does this study find about {rng.choice(terms)}? (#{i})"
+            specs.append(('POST', '/api/chat', {'message': message, 'pmcid': pmcid()}))
+        elif endpoint == 'export_chat':
+            specs.append(('POST', '/api/export-chat', {'paper_title': f"Benchmark export {i}"}))
+    return specs
+
+
+class InProcessClient:
+    """
+    Flask test client with cookies handled by hand, like HTTPClient
+    """
+    def __init__(self, app):
+        self.client = app.test_client(use_cookies=False)
+        self.cookie = None
+
+    def request(self, method, path, body=None, cookie=None):
+        headers = {}
+        if cookie or self.cookie:
+            headers['Cookie'] = cookie or self.cookie
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        remember_cookie(self, response.headers.getlist('Set-Cookie'))
+        status = response.status_code
+        response.close()
+        return status
+
+
+class HTTPClient:
+    """
+    One keep-alive connection to the local gunicorn
+    """
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+        self.cookie = None
+
+    def request(self, method, path, body=None, cookie=None):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if cookie or self.cookie:
+            headers['Cookie'] = cookie or self.cookie
+        for attempt in (0, 1):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=300)
+            try:
+                self.connection.request(method, path, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection; reconnect once
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        remember_cookie(self, response.msg.get_all('Set-Cookie') or [])
+        return response.status
+
+
+def remember_cookie(client, set_cookies):
+    cookies = dict(part.split(';', 1)[0].strip().split('=', 1) for part in set_cookies if '=' in part)
+    if cookies:
+        client.cookie = '; '.join(f"{name}={value}" for name, value in cookies.items())
+
+
+def process_memory(pid):
+    """
+    (rss, pss) of one process in bytes; pss is None where the kernel does
+    not provide smaps_rollup
+    """
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        return None, None
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    pss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    return rss, pss
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields resume after ')'
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent:
+            children.append(int(entry))
+    return children
+
+
+class MemorySampler(threading.Thread):
+    """
+    Samples the summed RSS and PSS of the serving processes and keeps the
+    peak since the last reset
+    """
+    def __init__(self, pids, interval=0.02):
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.peak_rss = self.peak_pss = None
+
+    def sample(self):
+        rss_total, pss_total = 0, 0
+        for pid in self.pids:
+            rss, pss = process_memory(pid)
+            rss_total += rss or 0
+            pss_total = None if pss is None or pss_total is None else pss_total + pss
+        with self.lock:
+            self.peak_rss = max(self.peak_rss or 0, rss_total)
+            if pss_total is not None:
+                self.peak_pss = max(self.peak_pss or 0, pss_total)
+
+    def reset(self):
+        with self.lock:
+            self.peak_rss = self.peak_pss = None
+        self.sample()
+
+    def peaks(self):
+        self.sample()
+        with self.lock:
+            return self.peak_rss, self.peak_pss
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def percentile(ordered, fraction):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_endpoint(make_client, specs, concurrency, sampler, cookies=None):
+    """
+    Send `specs` from `concurrency` threads, each with its own client, and
+    summarize latencies, status codes and peak memory
+    """
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker(indexes):
+        client = make_client()
+        local = []
+        for index in indexes:
+            method, path, body = specs[index]
+            cookie = cookies[index] if cookies else None
+            started = time.perf_counter()
+            try:
+                status = client.request(method, path, body, cookie)
+            except (OSError, http.client.HTTPException):
+                status = 'connection error'
+            local.append((time.perf_counter() - started, status))
+        with lock:
+            for elapsed, status in local:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    shards = [range(i, len(specs), concurrency) for i in range(concurrency)]
+    sampler.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, shards))
+    wall = time.perf_counter() - started
+    peak_rss, peak_pss = sampler.peaks()
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        'requests': len(specs),
+        'concurrency': concurrency,
+        'errors': errors,
+        'statuses': statuses,
+        'seconds': round(wall, 4),
+        'throughput_rps': round(len(specs) / wall, 2) if wall else None,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'peak_rss_mb': None if peak_rss is None else round(peak_rss / 2**20, 1),
+        'peak_pss_mb': None if peak_pss is None else round(peak_pss / 2**20, 1),
+    }
+
+
+def prepare_export_sessions(make_client, count, papers):
+    """
+    One session per export, each holding a single chat turn
+    """
+    cookies = []
+    for i in range(count):
+        client = make_client()
+        client.request('POST', '/api/chat', {
+            'message': f"Summarize the findings (export #{i})",
+            'pmcid': f"PMC{PMCID_BASE + i % papers}",
+        })
+        cookies.append(client.cookie)
+    return cookies
+
+
+def run_workloads(make_client, args, manifest, sampler):
+    terms = query_terms(load_base())
+    results = {}
+    for endpoint in args.endpoints:
+        specs = build_workload(endpoint, args.requests, manifest['papers'], terms, args.seed)
+        cookies = None
+        if endpoint == 'export_chat':
+            cookies = prepare_export_sessions(make_client, len(specs), manifest['papers'])
+        warmup = build_workload(endpoint, min(args.warmup, len(specs)), manifest['papers'], terms, args.seed + 1)
+        if endpoint != 'export_chat':
+            run_endpoint(make_client, warmup, 1, sampler)
+        results[endpoint] = run_endpoint(make_client, specs, args.concurrency, sampler, cookies)
+    return results
+
+
+def run_inprocess(args, corpus_dir, manifest):
+    """
+    Child process: import the app against the synthetic corpus and drive it
+    through the test client
+    """
+    with tempfile.TemporaryDirectory(prefix='api-bench-') as scratch:
+        os.environ.update(app_environment(corpus_dir, scratch, args.llm_latency))
+        sys.path.insert(0, BACKEND_DIR)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app
+        startup = time.perf_counter() - started
+
+        sampler = MemorySampler([os.getpid()])
+        sampler.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                endpoints = run_workloads(lambda: InProcessClient(app.app), args, manifest, sampler)
+        finally:
+            sampler.stop()
+        return {'startup_seconds': round(startup, 3), 'endpoints': endpoints}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_health(port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/api/health')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def run_gunicorn(args, corpus_dir, manifest):
+    """
+    Start gunicorn as the procfile does (preloaded gthread workers) on a
+    free local port and drive it over HTTP. Sessions use the SQLite store,
+    as any multi-worker deployment must for chat history to follow the user.
+    """
+    with tempfile.TemporaryDirectory(prefix='api-bench-') as scratch:
+        port = free_port()
+        command = [
+            sys.executable, '-m', 'gunicorn', 'app:app', '--preload',
+            '--worker-class', 'gthread', '--workers', str(args.workers), '--threads', str(args.threads),
+            '--bind', f"127.0.0.1:{port}", '--timeout', '300',
+        ]
+        log_path = os.path.join(scratch, 'gunicorn.log')
+        with open(log_path, 'w') as log:
+            started = time.perf_counter()
+            process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT,
+                                       env=dict(app_environment(corpus_dir, scratch, args.llm_latency, 'sqlite'),
+                                                WEB_THREADS=str(args.threads)))
+            try:
+                if not wait_for_health(port, process, args.startup_timeout):
+                    with open(log_path) as f:
+                        tail = f.read()[-2000:]
+                    raise RuntimeError(f"gunicorn did not become healthy:\n{tail}")
+                startup = time.perf_counter() - started
+
+                sampler = MemorySampler([process.pid] + child_pids(process.pid))
+                sampler.start()
+                try:
+                    endpoints = run_workloads(lambda: HTTPClient(port), args, manifest, sampler)
+                finally:
+                    sampler.stop()
+            finally:
+                process.terminate()
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        return {'startup_seconds': round(startup, 3), 'workers': args.workers, 'threads': args.threads,
+                'endpoints': endpoints}
+
+
+def run_child(args, mode, scale, corpus_dir):
+    """
+    Run one (mode, scale) combination in a fresh interpreter so imports,
+    caches and memory do not carry over between runs
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode, corpus_dir,
+               '--endpoints', *args.endpoints, '--requests', str(args.requests),
+               '--concurrency', str(args.concurrency), '--warmup', str(args.warmup),
+               '--workers', str(args.workers), '--threads', str(args.threads),
+               '--llm-latency', str(args.llm_latency), '--seed', str(args.seed),
+               '--startup-timeout', str(args.startup_timeout)]
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_value(value, suffix=''):
+    return 'n/a' if value is None else f"{value}{suffix}"
+
+
+def compare(report, baseline_path):
+    """
+    Print throughput and p95 changes against an earlier report
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(run['scale'], run['mode'], endpoint): stats
+                for run in baseline['runs'] for endpoint, stats in run['endpoints'].items()}
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    print(f"{'scale':>6} {'mode':<10} {'endpoint':<16} {'rps':>9} {'p95':>9}")
+    for run in report['runs']:
+        for endpoint, stats in run['endpoints'].items():
+            old = previous.get((run['scale'], run['mode'], endpoint))
+            if not old:
+                continue
+            change = lambda new, before: (f"{(new - before) / before * 100:+.1f}%"
+                                          if new is not None and before else 'n/a')
+            print(f"{run['scale']:>5}x {run['mode']:<10} {endpoint:<16} "
+                  f"{change(stats['throughput_rps'], old['throughput_rps']):>9} "
+                  f"{change(stats['p95_ms'], old['p95_ms']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests per endpoint first')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=12, help='threads per gunicorn worker')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='seconds per stub model call')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir', default=DEFAULT_CORPUS_DIR, help='where generated corpora are cached')
+    parser.add_argument('--startup-timeout', type=float, default=600)
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--compare', help='earlier --json report to compare against')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'CORPUS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, corpus_dir = args.child
+        with open(os.path.join(corpus_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+        result = (run_inprocess if mode == 'inprocess' else run_gunicorn)(args, corpus_dir, manifest)
+        print(json.dumps(result))
+        return
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'cpus': os.cpu_count(),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'settings': {key: getattr(args, key) for key in (
+                'requests', 'warmup', 'concurrency', 'workers', 'threads', 'llm_latency', 'seed')},
+        },
+        'runs': [],
+    }
+    print(f"{'scale':>6} {'papers':>8} {'mode':<10} {'endpoint':<16} {'rps':>9} {'p50':>10} "
+          f"{'p95':>10} {'p99':>10} {'errors':>6} {'rss':>10} {'pss':>10}")
+    for scale in args.scales:
+        corpus_dir, manifest = ensure_corpus(args.corpus_dir, scale, args.seed)
+        for mode in args.modes:
+            result = run_child(args, mode, scale, corpus_dir)
+            run = dict(result, scale=scale, papers=manifest['papers'], mode=mode)
+            report['runs'].append(run)
+            print(f"{scale:>5}x {manifest['papers']:>8} {mode:<10} {'(startup)':<16} "
+                  f"{'':>9} {run['startup_seconds']:>8.2f} s")
+            for endpoint, stats in run['endpoints'].items():
+                print(f"{'':>6} {'':>8} {'':<10} {endpoint:<16} {format_value(stats['throughput_rps']):>9} "
+                      f"{format_value(stats['p50_ms'], ' ms'):>10} {format_value(stats['p95_ms'], ' ms'):>10} "
+                      f"{format_value(stats['p99_ms'], ' ms'):>10} {stats['errors']:>6} "
+                      f"{format_value(stats['peak_rss_mb'], ' MB'):>10} {format_value(stats['peak_pss_mb'], ' MB'):>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
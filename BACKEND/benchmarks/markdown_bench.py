@@ -0,0 +1,205 @@
+"""
+Benchmark for the chat answer renderers.
+
+Times the single-pass MarkdownStreamRenderer (through markdown_to_html and
+fed in streamed chunks) against the previous multi-pass markdown_to_html,
+and the three-pass clean_html_for_pdf against the previous six-pass one,
+on synthetic answers of increasing length. The "legacy, re-render
+per chunk" row is what streaming costs without an incremental renderer:
+the whole accumulated answer converted again for every chunk (skipped
+above 16000 characters, where it takes seconds per answer).
+
+    python benchmarks/markdown_bench.py
+    python benchmarks/markdown_bench.py --sizes 2000 20000 --json markdown.json
+
+Outputs are compared on every size; the legacy renderer mangles "* "
+bullets containing italics, so the generated answers use "- " bullets.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = (
+    'microgravity', 'bone', 'loss', 'astronauts', 'cells', 'expression', 'radiation',
+    'the', 'of', 'in', 'and', 'spaceflight', 'muscle', 'ISS', 'mice', 'study', 'results'
+)
+
+
+def legacy_markdown_to_html(text):
+    """
+    markdown_to_html as it was before the single-pass renderer
+    """
+    if not text:
+        return text
+    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
+    text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', text)
+    lines = text.split('\n')
+    html_lines = []
+    in_list = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('- ') or stripped.startswith('* '):
+            if not in_list:
+                html_lines.append('<ul>')
+                in_list = True
+            content = stripped[2:].strip()
+            html_lines.append(f'<li>{content}</li>')
+        else:
+            if in_list:
+                html_lines.append('</ul>')
+                in_list = False
+            html_lines.append(line)
+    if in_list:
+        html_lines.append('</ul>')
+    text = '\n'.join(html_lines)
+    text = re.sub(r'^(\d+)\.\s+(.*)$', r'<li><strong>\1.</strong> \2</li>', text, flags=re.MULTILINE)
+    lines = text.split('\n')
+    html_lines = []
+    in_ordered_list = False
+    for line in lines:
+        if '<li><strong>' in line and '.</strong>' in line:
+            if not in_ordered_list:
+                html_lines.append('<ol>')
+                in_ordered_list = True
+            html_lines.append(line)
+        else:
+            if in_ordered_list:
+                html_lines.append('</ol>')
+                in_ordered_list = False
+            html_lines.append(line)
+    if in_ordered_list:
+        html_lines.append('</ol>')
+    text = '\n'.join(html_lines)
+    return text.replace('\n', '<br>')
+
+
+def legacy_clean_html_for_pdf(html_text):
+    """
+    clean_html_for_pdf as it was before the three-pass version
+    """
+    if not html_text:
+        return html_text
+    clean_text = re.sub(r'<[^>]+>', '', html_text)
+    clean_text = clean_text.replace('&nbsp;', ' ')
+    clean_text = clean_text.replace('&lt;', '<')
+    clean_text = clean_text.replace('&gt;', '>')
+    clean_text = clean_text.replace('&amp;', '&')
+    clean_text = re.sub(r'\s+', ' ', clean_text)
+    clean_text = clean_text.replace('<br>', '\n')
+    return clean_text.strip()
+
+
+def sentence(rng):
+    words = []
+    for _ in range(rng.randint(6, 16)):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.08:
+            word = f'**{word}**'
+        elif roll < 0.14:
+            word = f'*{word}*'
+        words.append(word)
+    return ' '.join(words).capitalize() + '.'
+
+
+def synthetic_answer(size, seed=0):
+    """
+    Markdown answer of about `size` characters in the shape the model is
+    asked for: paragraphs, bullet lists and numbered steps
+    """
+    rng = random.Random(seed)
+    blocks = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.4:
+            block = ' '.join(sentence(rng) for _ in range(rng.randint(1, 3)))
+        elif kind < 0.7:
+            block = '\n'.join(f'- {sentence(rng)}' for _ in range(rng.randint(2, 5)))
+        else:
+            block = '\n'.join(f'{n}. {sentence(rng)}' for n in range(1, rng.randint(3, 6)))
+        blocks.append(block)
+        length += len(block) + 2
+    return '\n\n'.join(blocks)
+
+
+def chunks_of(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def best_seconds(function, repeat):
+    number = 1
+    while timeit.timeit(function, number=number) < 0.05:
+        number *= 2
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 16000, 64000],
+                        help='answer lengths in characters')
+    parser.add_argument('--chunk', type=int, default=24, help='characters per streamed chunk')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+
+    def streamed(chunks):
+        renderer = app.MarkdownStreamRenderer()
+        return ''.join([renderer.feed(chunk) for chunk in chunks]) + renderer.close()
+
+    def rerender(chunks):
+        text = ''
+        for chunk in chunks:
+            text += chunk
+            html = legacy_markdown_to_html(text)
+        return html
+
+    report = []
+    print(f"{'chars':>7} {'case':<34} {'time':>12} {'speedup':>8}")
+    for size in args.sizes:
+        answer = synthetic_answer(size)
+        chunks = chunks_of(answer, args.chunk)
+        html = app.markdown_to_html(answer)
+        assert html == legacy_markdown_to_html(answer), 'renderers disagree'
+        assert streamed(chunks) == html, 'streamed output differs'
+        assert app.clean_html_for_pdf(html) == legacy_clean_html_for_pdf(html), 'PDF cleaners disagree'
+
+        cases = [
+            ('markdown_to_html, legacy', lambda: legacy_markdown_to_html(answer), None),
+            ('markdown_to_html, single pass', lambda: app.markdown_to_html(answer), 0),
+            # Quadratic: only run where it finishes in reasonable time
+            ('streamed, legacy re-render per chunk', (lambda: rerender(chunks)) if size <= 16000 else None, None),
+            ('streamed, incremental renderer', lambda: streamed(chunks), 2 if size <= 16000 else None),
+            ('clean_html_for_pdf, legacy', lambda: legacy_clean_html_for_pdf(html), None),
+            ('clean_html_for_pdf, current', lambda: app.clean_html_for_pdf(html), 4),
+        ]
+        timings = []
+        for name, function, baseline in cases:
+            if function is None:
+                timings.append(None)
+                print(f"{len(answer):>7} {name:<34} {'skipped':>12}")
+                continue
+            seconds = best_seconds(function, args.repeat)
+            timings.append(seconds)
+            speedup = f"{timings[baseline] / seconds:7.1f}x" if baseline is not None else ''
+            print(f"{len(answer):>7} {name:<34} {seconds * 1e6:>9.1f} us {speedup:>8}")
+            report.append({'chars': len(answer), 'case': name, 'seconds': seconds})
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
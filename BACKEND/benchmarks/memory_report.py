@@ -0,0 +1,123 @@
+"""
+Memory report for the in-memory research corpus.
+
+Compares what one worker holds for the original dict-per-paper
+research_data against the compact PaperStore, at multiples of the current
+corpus size. Every measurement runs in a fresh interpreter so the numbers
+do not bleed into each other.
+
+    python benchmarks/memory_report.py                  # 1x, 10x and 100x
+    python benchmarks/memory_report.py --scales 1 10 --json memory.json
+
+Two figures are reported per layout:
+- retained: bytes still allocated after loading (tracemalloc), i.e. the
+  steady-state cost of the representation
+- rss: growth of the process resident set, which also includes allocator
+  arenas freed during loading but not returned to the OS
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYOUTS = ('dict', 'store')
+
+
+def rss_bytes():
+    with open('/proc/self/statm') as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def scaled_papers(base, scale):
+    """
+    Replicate the normalized corpus `scale` times under fresh ids. Each copy
+    is round-tripped through JSON so no strings are shared between replicas,
+    as would be the case for genuinely distinct papers.
+    """
+    papers = {}
+    for replica in range(scale):
+        for doc_id, paper in base.items():
+            copy = json.loads(json.dumps(paper))
+            if replica:
+                doc_id = f"{doc_id}-x{replica}"
+                copy['pmcid'] = f"{copy['pmcid']}-x{replica}"
+                copy['doi'] = f"10.1038/spacebio.{copy['pmcid']}"
+            papers[doc_id] = copy
+    return papers
+
+
+def measure(layout, scale, trace):
+    sys.path.insert(0, BACKEND_DIR)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    base = app.load_research_data()
+
+    gc.collect()
+    if trace:
+        tracemalloc.start()
+    rss_before = rss_bytes()
+
+    data = scaled_papers(base, scale)
+    if layout == 'store':
+        data = app.PaperStore(data)
+
+    gc.collect()
+    result = {'papers': len(data), 'rss': rss_bytes() - rss_before}
+    if trace:
+        result['retained'], result['peak'] = tracemalloc.get_traced_memory()
+    return result
+
+
+def run_child(layout, scale, trace):
+    command = [sys.executable, os.path.abspath(__file__), '--child', layout, str(scale)]
+    if trace:
+        command.append('--trace')
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=BACKEND_DIR).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def format_mb(value):
+    return f"{value / (1024 * 1024):8.1f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--child', nargs=2, metavar=('LAYOUT', 'SCALE'), help=argparse.SUPPRESS)
+    parser.add_argument('--trace', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], int(args.child[1]), args.trace)))
+        return
+
+    report = []
+    print(f"{'scale':>6} {'papers':>8} {'layout':>6} {'retained':>12} {'rss':>12}")
+    for scale in args.scales:
+        row = {'scale': scale}
+        for layout in LAYOUTS:
+            traced = run_child(layout, scale, trace=True)
+            untraced = run_child(layout, scale, trace=False)
+            row[layout] = {'retained': traced['retained'], 'peak': traced['peak'], 'rss': untraced['rss']}
+            row['papers'] = traced['papers']
+            print(f"{scale:>5}x {traced['papers']:>8} {layout:>6} {format_mb(traced['retained']):>12} {format_mb(untraced['rss']):>12}")
+        saved = row['dict']['retained'] - row['store']['retained']
+        row['saved_per_worker'] = saved
+        print(f"{'':>6} {'':>8} {'saved':>6} {format_mb(saved):>12}")
+        report.append(row)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
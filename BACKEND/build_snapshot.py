@@ -0,0 +1,34 @@
+"""
+Compile RESEARCH_PAPER_DATA and SEARCHES into the binary corpus snapshot
+that app.py memory-maps at startup.
+
+    python build_snapshot.py [--output PATH]
+
+Run it after changing any source file. The snapshot records the size and
+mtime of every source file; when they no longer match, the app ignores
+the snapshot and parses the JSON files as before.
+"""
+import argparse
+import os
+import time
+
+# Always build from the JSON sources, never from an existing snapshot
+os.environ['CORPUS_SNAPSHOT_PATH'] = ''
+
+import app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Bio-Astra corpus snapshot")
+    parser.add_argument('--output', default=app.DEFAULT_CORPUS_SNAPSHOT_PATH,
+                        help=f"snapshot path (default: {app.DEFAULT_CORPUS_SNAPSHOT_PATH})")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    size = app.write_snapshot(args.output, app.active_corpus)
+    print(f"✅ Wrote {args.output} ({size / 1024:.0f} KB, {len(app.active_corpus['research_data'])} papers, "
+          f"version {app.active_corpus['version'][:12]}) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,419 @@
+"""
+Ingest research paper records into a normalized NDJSON corpus file.
+
+    python ingest.py INPUT [INPUT ...] [--output RESEARCH_PAPER_DATA/ingested.ndjson]
+    python ingest.py shards/ --workers 8 --stats ingest_stats.json
+
+Inputs are files or directories of .json files (a single paper object, or
+an array of records shaped like RESEARCH_PAPER_DATA/Research_Paper_Data.json)
+and .ndjson/.jsonl shards with one record per line. Arrays and shards are
+read incrementally, so memory stays around one chunk of input plus the
+batches in flight however large the input is. Records are normalized in a
+process pool and written, in input order, as one normalized paper per line.
+app.py loads .ndjson files in RESEARCH_PAPER_DATA without normalizing them
+again. The output replaces the target file in one rename, so a running app
+never reloads a half-written corpus. Inputs may not live in the output
+directory: the app loads every file there, so their papers would be
+loaded twice.
+
+This module is also where app.py gets its record normalization from; it
+does not import app, so ingesting never loads the existing corpus.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_OUTPUT = os.path.join(
+    os.getenv('RESEARCH_PAPER_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RESEARCH_PAPER_DATA')),
+    'ingested.ndjson'
+)
+INPUT_EXTENSIONS = ('.json', '.ndjson', '.jsonl')
+PMCID_IN_LINK = re.compile(r'(PMC\d+)')
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_DELIMITERS = ' \t\n\r,]'
+
+# Characters read from an input file at a time
+READ_CHUNK_SIZE = 1 << 20
+# A record still undecodable after this many characters is corrupt, not incomplete
+MAX_RECORD_SIZE = 64 << 20
+
+def research_item_pmcid(item):
+    """
+    Stable identifier of a research record: its PMCId, else one found in
+    its Link, else the synthetic 'NO_PMC'
+    """
+    pmcid = item.get('PMCId') or item.get('pmcid')
+    if not pmcid:
+        link = item.get('Link', '') or ''
+        match = PMCID_IN_LINK.search(link)
+        if match:
+            pmcid = match.group(1)
+    return pmcid or 'NO_PMC'
+
+def normalize_research_item(item):
+    """
+    (pmcid, normalized paper) for one record of a research array
+    """
+    pmcid = research_item_pmcid(item)
+    paper = {
+        'pmcid': pmcid,
+        'title': item.get('Title', ''),
+        'authors': item.get('Authors', []),
+        'keywords': item.get('Keywords', []),
+        'category': item.get('Category', ''),
+        'year': item.get('Study Year', item.get('year', 2023)),
+        'doi': f"10.1038/spacebio.{pmcid}",
+        'abstract': item.get('Abstract', ''),
+        'overview': item.get('Overview', item.get('overview', '')),
+        'results': 'Research results and findings from the study.',
+        'conclusion': item.get('Conclusion', 'Research conclusions and implications.'),
+        'summary': item.get('Summary', item.get('summary', '')),
+        'explore_more': [
+            {
+                'title': 'NCBI Publication',
+                'url': item.get('Link', 'https://www.ncbi.nlm.nih.gov/')
+            },
+            {
+                'title': 'Related NASA Research',
+                'url': 'https://www.nasa.gov/space-biology'
+            }
+        ],
+        'knowledge_graph': {
+            'authors': [{'name': 'Authors', 'expertise': [item.get('Category', 'Space Biology')], 'publications': 1, 'collaborations': 1}],
+            'keywords': [{'term': keyword, 'frequency': 1, 'related_terms': []} for keyword in item.get('Keywords', [])],
+            'category': {
+                'name': item.get('Category', 'Space Biology'),
+                'subcategories': [item.get('Category', 'Space Biology')],
+                'related_categories': ['Space Biology', 'Research']
+            }
+        }
+    }
+    return pmcid, paper
+
+def normalize_research_object(data):
+    """
+    (pmcid, normalized paper) for a file holding a single paper object,
+    which may already use the normalized lowercase keys
+    """
+    pmcid = research_item_pmcid(data)
+    paper = {
+        'pmcid': pmcid,
+        'title': data.get('Title', data.get('title', '')),
+        'authors': data.get('Authors', data.get('authors', [])),
+        'keywords': data.get('Keywords', data.get('keywords', [])),
+        'category': data.get('Category', data.get('category', '')),
+        'year': data.get('Study Year', data.get('year', 2023)),
+        'doi': data.get('doi', f"10.1038/spacebio.{pmcid}"),
+        'abstract': data.get('Abstract', data.get('abstract', '')),
+        'overview': data.get('Overview', data.get('overview', '')),
+        'results': data.get('Results', data.get('results', '')),
+        'conclusion': data.get('Conclusion', data.get('conclusion', '')),
+        'summary': data.get('Summary', data.get('summary', '')),
+        'explore_more': data.get('explore_more', [
+            {
+                'title': 'NCBI Publication',
+                'url': data.get('Link', 'https://www.ncbi.nlm.nih.gov/')
+            },
+            {
+                'title': 'Related NASA Research',
+                'url': 'https://www.nasa.gov/space-biology'
+            }
+        ]),
+        'knowledge_graph': data.get('knowledge_graph', {
+            'authors': [{'name': 'Authors', 'expertise': [data.get('Category', 'Space Biology')], 'publications': 1, 'collaborations': 1}],
+            'keywords': [{'term': keyword, 'frequency': 1, 'related_terms': []} for keyword in data.get('Keywords', [])],
+            'category': {
+                'name': data.get('Category', 'Space Biology'),
+                'subcategories': [data.get('Category', 'Space Biology')],
+                'related_categories': ['Space Biology', 'Research']
+            }
+        })
+    }
+    return pmcid, paper
+
+def normalize_record(kind, record):
+    """
+    Normalize a record as yielded by iter_json_records
+    """
+    if kind == 'object':
+        return normalize_research_object(record)
+    return normalize_research_item(record)
+
+def unique_doc_id(pmcid, counts, taken):
+    """
+    Doc id for the next paper carrying pmcid: the PMCID itself the first
+    time, then pmcid-2, pmcid-3, ... `counts` maps each PMCID to the papers
+    seen with it so far, so a repeated id costs one lookup rather than a
+    probe per earlier duplicate; `taken` (the ids assigned so far) is only
+    probed again when a suffixed id collides with a literal one.
+    """
+    count = counts.get(pmcid, 0)
+    doc_id = f"{pmcid}-{count + 1}" if count else pmcid
+    while doc_id in taken:
+        count += 1
+        doc_id = f"{pmcid}-{count + 1}"
+    counts[pmcid] = count + 1
+    return doc_id
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Values of the top-level JSON array in text file f, decoded one at a time
+    from a buffer of about chunk_size characters
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    started = False
+    expect_value = True
+    # A closing bracket is fine straight after '[' or a value, not after ','
+    may_close = True
+
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            buffer = f.read(chunk_size)
+            position = 0
+            if not buffer:
+                raise ValueError("unterminated JSON array" if started else "expected a JSON array")
+            continue
+
+        char = buffer[position]
+        if not started:
+            if char != '[':
+                raise ValueError("expected a JSON array")
+            started = True
+            position += 1
+            continue
+        if char == ']' and may_close:
+            return
+        if not expect_value:
+            if char != ',':
+                raise ValueError(f"expected ',' or ']' at {char!r}")
+            position += 1
+            expect_value = True
+            may_close = False
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # A number cut by the chunk boundary decodes too, so a value only
+            # counts once the delimiter after it has been read
+            complete = eof or (end < len(buffer) and buffer[end] in JSON_DELIMITERS)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - position > MAX_RECORD_SIZE:
+                raise
+            complete = False
+        if not complete:
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+
+        yield value
+        position = end
+        expect_value = False
+        may_close = True
+        if position > chunk_size:
+            buffer = buffer[position:]
+            position = 0
+
+def iter_json_records(path):
+    """
+    (kind, record) for every record of a .json research file: 'item' for
+    each element of a top-level array, read incrementally, or 'object' for
+    a file holding one paper
+    """
+    with open(path, 'r') as f:
+        head = f.read(4096)
+        first = head.lstrip()[:1]
+        f.seek(0)
+        if first == '[':
+            for item in iter_json_array(f):
+                yield 'item', item
+        else:
+            yield 'object', json.load(f)
+
+def iter_input_records(path):
+    """
+    (kind, record) for one input file; NDJSON lines are yielded undecoded
+    so the worker processes parse them
+    """
+    if path.endswith(('.ndjson', '.jsonl')):
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield 'line', line
+    else:
+        yield from iter_json_records(path)
+
+def normalize_batch(batch):
+    """
+    Worker: normalize a batch of (kind, record) and encode each paper as an
+    NDJSON line. Returns [(pmcid, line)] and the number of invalid records.
+    """
+    normalized = []
+    invalid = 0
+    for kind, record in batch:
+        if kind == 'line':
+            try:
+                record = json.loads(record)
+            except ValueError:
+                invalid += 1
+                continue
+            kind = 'item'
+        if not isinstance(record, dict):
+            invalid += 1
+            continue
+        pmcid, paper = normalize_record(kind, record)
+        normalized.append((pmcid, json.dumps(paper, ensure_ascii=False) + '\n'))
+    return normalized, invalid
+
+def input_files(inputs):
+    """
+    Every ingestible file named by inputs, with directories expanded (sorted)
+    """
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(INPUT_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+class InputInOutputDirError(ValueError):
+    """Raised when an input file sits where the app loads the output from."""
+
+def check_inputs_outside(files, output):
+    """
+    Raise InputInOutputDirError if an input file is in the directory output is written
+    to, where the app would load it beside its own normalized copy
+    """
+    output_dir = os.path.dirname(os.path.realpath(output))
+    inside = [path for path in files if os.path.dirname(os.path.realpath(path)) == output_dir]
+    if inside:
+        raise InputInOutputDirError(
+            f"{len(inside)} input file(s) are in the output directory {output_dir}, e.g. {inside[0]}; "
+            "the app loads every file there, so these papers would be loaded twice. "
+            "Move the inputs out of it or choose another --output."
+        )
+
+def batches(files, batch_size):
+    batch = []
+    for path in files:
+        for record in iter_input_records(path):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def normalized_batches(files, batch_size, workers):
+    """
+    Results of normalize_batch over every batch of the inputs, in order. At
+    most two batches per worker are in flight, so the reader never runs
+    ahead of the pool by more than that.
+    """
+    if workers <= 1:
+        yield from map(normalize_batch, batches(files, batch_size))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for batch in batches(files, batch_size):
+            in_flight.append(pool.submit(normalize_batch, batch))
+            if len(in_flight) >= 2 * workers:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def ingest(inputs, output, workers=None, batch_size=500):
+    """
+    Normalize every record of inputs into the NDJSON file output and return
+    the ingestion stats
+    """
+    started = time.perf_counter()
+    files = input_files(inputs)
+    check_inputs_outside(files, output)
+    workers = workers or os.cpu_count() or 1
+    pmcid_counts = {}
+    papers = 0
+    invalid = 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    # Written beside the target under a name the app does not load, then renamed
+    temp_path = os.path.join(os.path.dirname(os.path.abspath(output)), f".{os.path.basename(output)}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as out:
+            for normalized, batch_invalid in normalized_batches(files, batch_size, workers):
+                invalid += batch_invalid
+                for pmcid, line in normalized:
+                    pmcid_counts[pmcid] = pmcid_counts.get(pmcid, 0) + 1
+                    out.write(line)
+                papers += len(normalized)
+        os.replace(temp_path, output)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    seconds = time.perf_counter() - started
+    return {
+        "output": output,
+        "input_files": len(files),
+        "papers": papers,
+        "invalid_records": invalid,
+        "missing_pmcid": pmcid_counts.get('NO_PMC', 0),
+        # Papers that will get a -2, -3, ... doc id, and the PMCIDs they share
+        "duplicate_papers": sum(count - 1 for count in pmcid_counts.values()),
+        "duplicate_pmcids": sum(1 for count in pmcid_counts.values() if count > 1),
+        "workers": workers,
+        "seconds": round(seconds, 3),
+        "papers_per_second": round(papers / seconds) if seconds else None,
+        "output_bytes": os.path.getsize(output),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', help='input files or directories')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help=f"NDJSON corpus to write (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--workers', type=int, default=None, help='normalizer processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=500, help='records per task sent to a worker')
+    parser.add_argument('--stats', help='also write the ingestion stats to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        stats = ingest(args.inputs, args.output, args.workers, args.batch_size)
+    except InputInOutputDirError as e:
+        parser.error(str(e))
+    print(f"✅ Ingested {stats['papers']} papers from {stats['input_files']} files into {stats['output']} "
+          f"in {stats['seconds']}s ({stats['papers_per_second']} papers/s, {stats['workers']} workers)")
+    if stats['invalid_records']:
+        print(f"⚠️ Skipped {stats['invalid_records']} invalid records")
+    if stats['duplicate_papers']:
+        print(f"⚠️ {stats['duplicate_papers']} papers repeat {stats['duplicate_pmcids']} PMCIDs and get suffixed doc ids")
+    print(json.dumps(stats, indent=2))
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(stats, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Offline settings, applied before app is imported
+os.environ.setdefault('LLM_BACKEND', 'stub')
+os.environ.setdefault('CHAT_CACHE_PATH', '')
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='bioastra-metrics-'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+# Hand-written corpus for tests that need known rankings or a corpus to edit
+SMALL_CORPUS = [
+    {"Title": "Bone loss in microgravity", "PMCId": "PMC1000001", "Category": "Human Research",
+     "Study Year": 2014, "Keywords": ["bone", "microgravity"], "Abstract": "Astronauts were followed after flight."},
+    {"Title": "Muscle atrophy during spaceflight", "PMCId": "PMC1000002", "Category": "Human Research",
+     "Study Year": 2016, "Keywords": ["muscle"], "Abstract": "Bone density and muscle mass fall in orbit."},
+    {"Title": "Root growth of Arabidopsis in space", "PMCId": "PMC1000003", "Category": "Plant Biology",
+     "Study Year": 2018, "Keywords": ["arabidopsis", "roots"], "Abstract": "Seedlings grew on the station."},
+]
+
+
+def write_papers(path, papers):
+    with open(path, 'w') as f:
+        json.dump(papers, f)
+
+
+@pytest.fixture
+def small_corpus(tmp_path, monkeypatch):
+    """
+    Serve SMALL_CORPUS from temporary source directories instead of the
+    shipped corpus. Returns the research file, which tests may rewrite.
+    """
+    research = tmp_path / 'RESEARCH_PAPER_DATA'
+    searches = tmp_path / 'SEARCHES'
+    research.mkdir()
+    searches.mkdir()
+    research_file = research / 'Research_Paper_Data.json'
+    write_papers(research_file, SMALL_CORPUS)
+    monkeypatch.setattr(app, 'RESEARCH_PAPER_DATA_DIR', str(research))
+    monkeypatch.setattr(app, 'SEARCHES_DIR', str(searches))
+    # The shipped corpus is put back when the test ends
+    monkeypatch.setattr(app, 'active_corpus', app.build_corpus_from_sources())
+    return research_file
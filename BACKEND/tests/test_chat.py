@@ -0,0 +1,40 @@
+import uuid
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def duplicated():
+    """
+    Doc ids of papers sharing one PMCID in the shipped corpus
+    """
+    papers = app.current_corpus()['research_data']
+    ordinals = next(o for o in papers.pmcid_ordinals.values() if len(o) > 1)
+    return [papers.doc_ids[o] for o in ordinals]
+
+
+def test_doc_id_picks_the_paper_on_screen(duplicated):
+    papers = app.current_corpus()['research_data']
+    contexts = [app.resolve_chat_context({"doc_id": doc_id}) for doc_id in duplicated]
+    for doc_id, (prefix, _, paper_context) in zip(duplicated, contexts):
+        title = papers.field(papers.ordinals[doc_id], 'title')
+        assert f"Title: {title}\n" in prefix
+        assert paper_context["doc_id"] == doc_id
+    # Each paper keeps its own conversation
+    keys = {app.chat_paper_key(paper_context) for _, _, paper_context in contexts}
+    assert len(keys) == len(duplicated)
+
+
+def test_shared_pmcid_alone_is_not_resolved(duplicated):
+    pmcid = duplicated[0]
+    assert app.resolve_chat_context({"pmcid": pmcid}) is None
+
+
+def test_chat_about_a_duplicated_paper(duplicated):
+    client = app.app.test_client()
+    for doc_id in duplicated:
+        response = client.post('/api/chat', json={"message": f"question {uuid.uuid4()}", "doc_id": doc_id})
+        assert response.status_code == 200
+    assert client.post('/api/chat', json={"message": "question", "doc_id": "PMC0000000"}).status_code == 404
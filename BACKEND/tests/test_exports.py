@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import app
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_render_now_waits_for_the_job_in_flight(tmp_path, monkeypatch):
+    jobs = app.ExportJobs(str(tmp_path), 1, 3600)
+    renders = []
+    monkeypatch.setattr(app, 'create_chat_pdf', lambda *args: renders.append(args))
+    # Another worker has claimed the job and is rendering it
+    assert jobs._claim('job')
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(jobs.render_now('job', [], 'Title', 'user')))
+    waiter.start()
+    time.sleep(0.3)
+    assert waiter.is_alive()
+
+    with open(jobs.path('job'), 'wb') as f:
+        f.write(b'%PDF')
+    os.remove(jobs.path('job', '.pending'))
+    waiter.join(5)
+    assert result == [jobs.path('job')]
+    assert renders == []
+
+
+def test_stale_markers_and_temp_files_are_swept(tmp_path):
+    pid = dead_pid()
+    (tmp_path / 'dead.pending').write_text(str(pid))
+    (tmp_path / f'dead.{pid}.1.tmp').write_bytes(b'')
+    (tmp_path / 'live.pending').write_text(str(os.getpid()))
+    (tmp_path / f'live.{os.getpid()}.1.tmp').write_bytes(b'')
+    (tmp_path / 'done.pdf').write_bytes(b'%PDF')
+
+    app.ExportJobs(str(tmp_path), 1, 3600)
+    assert sorted(os.listdir(tmp_path)) == sorted([f'live.{os.getpid()}.1.tmp', 'live.pending', 'done.pdf'])
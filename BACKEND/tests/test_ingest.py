@@ -0,0 +1,29 @@
+import json
+import os
+
+import pytest
+
+import ingest
+
+
+def write_papers(path, count):
+    with open(path, 'w') as f:
+        json.dump([{"PMCId": f"PMC{i}", "Title": f"Paper {i}"} for i in range(count)], f)
+
+
+def test_ingest_writes_one_paper_per_line(tmp_path):
+    write_papers(tmp_path / "dump.json", 3)
+    output = tmp_path / "corpus" / "ingested.ndjson"
+    stats = ingest.ingest([str(tmp_path / "dump.json")], str(output), workers=1)
+    assert stats["papers"] == 3
+    assert [json.loads(line)["pmcid"] for line in open(output)] == ["PMC0", "PMC1", "PMC2"]
+
+
+def test_ingest_refuses_inputs_in_the_output_directory(tmp_path):
+    data_dir = tmp_path / "RESEARCH_PAPER_DATA"
+    data_dir.mkdir()
+    write_papers(data_dir / "Research_Paper_Data.json", 2)
+    output = data_dir / "ingested.ndjson"
+    with pytest.raises(ingest.InputInOutputDirError):
+        ingest.ingest([str(data_dir)], str(output), workers=1)
+    assert not os.path.exists(output)
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+import app
+
+
+class SlowStreamClient:
+    """
+    Client whose stream yields one chunk, then waits until released
+    """
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate(self, prompt, timeout=None):
+        return "answer"
+
+    def stream(self, prompt, timeout=None):
+        yield "first "
+        self.release.wait(5)
+        yield "second"
+
+
+def half_open_guard(client, trial_timeout=60):
+    """
+    Guard whose breaker is open with no reset delay, so the next call is the trial
+    """
+    breaker = app.CircuitBreaker(1, 0, trial_timeout)
+    breaker.record_failure()
+    executor = app.LLMExecutor(2, 2, 0.05)
+    return app.LLMGuard(client, executor, 10, False, 1.0, breaker)
+
+
+def test_abandoned_stream_hands_back_the_trial():
+    client = SlowStreamClient()
+    guard = half_open_guard(client)
+    chunks = guard.stream("prompt")
+    assert next(chunks) == "first "
+    # Another call while the trial is out is turned away
+    with pytest.raises(app.LLMCircuitOpenError):
+        guard.breaker.check()
+
+    # The client disconnects mid-stream
+    chunks.close()
+    client.release.set()
+    assert guard.breaker.check() is True
+    assert guard.breaker.state == 'half_open'
+
+
+def test_unread_stream_hands_back_the_trial():
+    client = SlowStreamClient()
+    client.release.set()
+    guard = half_open_guard(client)
+    chunks = guard.stream("prompt")
+    chunks.close()
+    assert guard.breaker.check() is True
+
+
+def test_finished_stream_closes_the_circuit():
+    client = SlowStreamClient()
+    client.release.set()
+    guard = half_open_guard(client)
+    chunks = guard.stream("prompt")
+    assert ''.join(chunks) == "first second"
+    chunks.close()
+    assert guard.breaker.state == 'closed'
+
+
+def test_stale_trial_is_replaced():
+    breaker = app.CircuitBreaker(1, 0, 0.05)
+    breaker.record_failure()
+    assert breaker.check() is True
+    with pytest.raises(app.LLMCircuitOpenError):
+        breaker.check()
+    time.sleep(0.06)
+    assert breaker.check() is True
+
+
+def test_abandoned_answer_still_settles_the_trial():
+    guard = half_open_guard(SlowStreamClient())
+    pending = guard.submit("prompt")
+    pending.abandon()
+    pending.first.result(5)
+    assert guard.breaker.state == 'closed'
+
+
+def test_chat_stream_disconnect_before_reading(monkeypatch):
+    client = SlowStreamClient()
+    client.release.set()
+    guard = half_open_guard(client)
+    monkeypatch.setattr(app, 'llm_guard', guard)
+
+    response = app.app.test_client().post('/api/chat/stream', json={
+        "message": f"question {uuid.uuid4()}",
+        "paper_context": {"title": "A paper"}
+    }, buffered=False)
+    assert response.status_code == 200
+    response.close()
+    assert guard.breaker.check() is True
+
+
+def test_hedge_is_not_queued_behind_chats():
+    release = threading.Event()
+    executor = app.LLMExecutor(1, 1, 0.05)
+    running = executor.submit(release.wait, 5)
+    # A chat may still queue for the running slot; a hedged attempt may not
+    with pytest.raises(app.LLMOverloadedError):
+        executor.submit(release.wait, 5, queue=False)
+    queued = executor.submit(release.wait, 5)
+    release.set()
+    assert running.result(5) and queued.result(5)
+    assert executor.submit(release.wait, 5, queue=False).result(5)
+
+
+def test_backend_without_generate_fails_at_construction():
+    class SilentBackend(app.LLMBackend):
+        name = 'silent'
+
+    with pytest.raises(TypeError):
+        SilentBackend()
+    assert list(app.StubBackend().stream("User Question: why?"))
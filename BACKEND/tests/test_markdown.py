@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+import app
+
+ANSWER = (
+    "# Findings\n"
+    "Bone loss is **significant** in *long* missions.\n"
+    "- Density falls by **1-2%** per month\n"
+    "* Muscle *atrophy* follows\n"
+    "1. Exercise\n"
+    "2. Diet with **calcium**\n"
+    "\n"
+    "A stray * marker and an **open bold stay literal.\n"
+    "- last item"
+)
+
+
+def streamed(text, cuts):
+    renderer = app.MarkdownStreamRenderer()
+    chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+    return ''.join(renderer.feed(chunk) for chunk in chunks) + renderer.close()
+
+
+def test_every_split_point_renders_like_the_whole_answer():
+    whole = app.markdown_to_html(ANSWER)
+    for cut in range(len(ANSWER) + 1):
+        assert streamed(ANSWER, [cut]) == whole
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunks_render_like_the_whole_answer(seed):
+    rng = random.Random(seed)
+    text = ANSWER + "\n" * rng.randint(0, 2)
+    cuts = sorted(rng.sample(range(len(text) + 1), rng.randint(1, 30)))
+    assert streamed(text, cuts) == app.markdown_to_html(text)
+
+
+def test_markdown_to_html_output():
+    assert app.markdown_to_html(ANSWER).split('<br>') == [
+        "<strong>Findings</strong>",
+        "Bone loss is <strong>significant</strong> in <em>long</em> missions.",
+        "<ul>",
+        "<li>Density falls by <strong>1-2%</strong> per month</li>",
+        "<li>Muscle <em>atrophy</em> follows</li>",
+        "</ul>",
+        "<ol>",
+        "<li><strong>1.</strong> Exercise</li>",
+        "<li><strong>2.</strong> Diet with <strong>calcium</strong></li>",
+        "</ol>",
+        "",
+        "A stray * marker and an **open bold stay literal.",
+        "<ul>",
+        "<li>last item</li>",
+        "</ul>",
+    ]
+
+
+def test_empty_answers():
+    assert app.markdown_to_html('') == ''
+    assert streamed('', []) == ''
@@ -0,0 +1,58 @@
+import json
+import os
+import subprocess
+import sys
+
+import app
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def worker_file(directory, pid, requests):
+    snapshot = {
+        "buckets": list(app.METRICS_BUCKETS),
+        "counters": [["bioastra_http_requests_total", [["route", "/api/search"]], requests]],
+        "histograms": []
+    }
+    with open(os.path.join(directory, f"{pid}.json"), 'w') as f:
+        json.dump(snapshot, f)
+
+
+def requests_total(metrics):
+    _, counters, _ = metrics.collect()
+    return counters[("bioastra_http_requests_total", (("route", "/api/search"),))]
+
+
+def test_dead_workers_are_folded_into_retired(tmp_path):
+    live = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        metrics = app.Metrics(str(tmp_path), 5, app.METRICS_BUCKETS)
+        worker_file(tmp_path, live.pid, 1)
+        worker_file(tmp_path, dead_pid(), 2)
+        worker_file(tmp_path, dead_pid(), 4)
+
+        processes, _, _ = metrics.collect()
+        # This process and the live worker; the dead ones only add their counts
+        assert processes == 2
+        assert requests_total(metrics) == 7
+        assert sorted(os.listdir(tmp_path)) == sorted([f"{live.pid}.json", "retired.json"])
+
+        # Another restart later adds to what was already retired
+        worker_file(tmp_path, dead_pid(), 8)
+        assert requests_total(metrics) == 15
+        assert "bioastra_metrics_processes 2\n" in metrics.render()
+    finally:
+        live.kill()
+        live.wait()
+
+
+def test_a_held_lock_skips_retiring(tmp_path):
+    metrics = app.Metrics(str(tmp_path), 5, app.METRICS_BUCKETS)
+    (tmp_path / "retire.lock").write_text("")
+    worker_file(tmp_path, dead_pid(), 3)
+    assert requests_total(metrics) == 3
+    assert "retired.json" not in os.listdir(tmp_path)
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+import app
+from conftest import SMALL_CORPUS, write_papers
+
+NEW_PAPER = dict(SMALL_CORPUS[2], PMCId="PMC1000004", Title="Yeast under simulated microgravity")
+
+
+@pytest.fixture
+def reloader(monkeypatch):
+    reloader = app.CorpusReloader(0)
+    monkeypatch.setattr(app, 'corpus_reloader', reloader)
+    return reloader
+
+
+def add_paper(research_file):
+    write_papers(research_file, SMALL_CORPUS + [NEW_PAPER])
+
+
+def test_reload_swaps_in_the_edited_corpus(small_corpus, reloader):
+    previous = app.active_corpus
+    add_paper(small_corpus)
+    result = reloader.reload()
+    assert result["reloaded"] is True
+    assert result["research_papers"] == 4
+    assert result["previous_version"] == previous['version'][:12]
+    assert app.active_corpus['version'] != previous['version']
+
+    data = app.app.test_client().post('/api/search', json={"type": "all", "query": "yeast"}).get_json()
+    assert [r["pmcid"] for r in data["results"]] == ["PMC1000004"]
+
+
+def test_unchanged_sources_are_not_rebuilt(small_corpus, reloader):
+    previous = app.active_corpus
+    assert reloader.reload() == {"reloaded": False, "version": previous['version'][:12]}
+
+    # Touched but not edited: same indexes, new fingerprint
+    os.utime(small_corpus, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert reloader.reload()["reloaded"] is False
+    assert app.active_corpus['search_index'] is previous['search_index']
+    assert app.active_corpus['fingerprint'] == app.source_fingerprint()
+    assert reloader.reloads == 0
+
+
+def test_running_requests_keep_their_corpus(small_corpus, reloader):
+    with app.app.test_request_context():
+        pinned = app.current_corpus()
+        add_paper(small_corpus)
+        reloader.reload()
+        assert app.current_corpus() is pinned
+        assert len(app.current_corpus()['research_data']) == 3
+    assert len(app.current_corpus()['research_data']) == 4
+
+
+def test_failed_reload_keeps_the_active_corpus(small_corpus, reloader):
+    previous = app.active_corpus
+    small_corpus.write_text('[{"Title": ')
+    with pytest.raises(ValueError):
+        reloader.reload()
+    assert app.active_corpus is previous
+    assert reloader.failures == 1
+    # The poller leaves these sources alone until they change again
+    assert reloader.seen_fingerprint == app.source_fingerprint()
+
+
+def test_poller_reloads_in_the_background(small_corpus, monkeypatch):
+    reloader = app.CorpusReloader(0.01)
+    monkeypatch.setattr(app, 'corpus_reloader', reloader)
+    add_paper(small_corpus)
+    time.sleep(0.02)
+    reloader.maybe_check()
+    deadline = time.monotonic() + 10
+    while len(app.active_corpus['research_data']) != 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(app.active_corpus['research_data']) == 4
+
+
+def test_admin_reload_endpoint(small_corpus, reloader, monkeypatch):
+    client = app.app.test_client()
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    assert client.post('/api/admin/reload').status_code == 403
+
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/api/admin/reload', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+
+    add_paper(small_corpus)
+    response = client.post('/api/admin/reload', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.get_json()["research_papers"] == 4
+
+    with reloader.lock:
+        response = client.post('/api/admin/reload', headers={'X-Admin-Token': 'secret'}, json={"force": True})
+    assert response.status_code == 409
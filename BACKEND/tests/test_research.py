@@ -0,0 +1,65 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+@pytest.fixture
+def doc_ids():
+    return list(app.current_corpus()['research_data'].doc_ids[:3])
+
+
+def batch(client, **body):
+    return client.post('/api/research/batch', json=body)
+
+
+def test_batch_returns_papers_and_missing_ids(client, doc_ids):
+    data = batch(client, pmcids=doc_ids + ["PMC0000000", doc_ids[0]]).get_json()
+    assert data["success"] is True
+    assert sorted(data["data"]) == sorted(doc_ids)
+    assert data["missing"] == ["PMC0000000"]
+    # Without fields a paper matches /api/research/<pmcid>
+    single = client.get(f'/api/research/{doc_ids[0]}').get_json()
+    assert data["data"][doc_ids[0]]["title"] == single["data"]["title"]
+
+
+def test_batch_projects_fields(client, doc_ids):
+    data = batch(client, pmcids=doc_ids, fields="title, overview").get_json()
+    assert all(set(paper) == {"pmcid", "title", "overview"} for paper in data["data"].values())
+
+
+@pytest.mark.parametrize("body", [
+    {"pmcids": "PMC1"},
+    {"pmcids": [1, 2]},
+    {"pmcids": ["PMC1"], "fields": 5},
+    {"pmcids": ["PMC1"], "fields": [["title"]]},
+    {"pmcids": ["PMC1"], "fields": ["colour"]},
+    {"pmcids": [f"PMC{i}" for i in range(app.RESEARCH_BATCH_MAX_SIZE + 1)]},
+])
+def test_batch_rejects_malformed_requests(client, body):
+    response = batch(client, **body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def test_batch_papers_match_single_lookups(client):
+    papers = app.current_corpus()['research_data']
+    # Include the second paper of a shared PMCID, served under its own doc id
+    duplicated = next(o for o in papers.pmcid_ordinals.values() if len(o) > 1)
+    doc_ids = [papers.doc_ids[o] for o in duplicated] + list(papers.doc_ids[:2])
+    data = batch(client, pmcids=doc_ids).get_json()
+    assert data["total"] == len(doc_ids)
+    for doc_id in doc_ids:
+        assert data["data"][doc_id] == client.get(f'/api/research/{doc_id}').get_json()["data"]
+
+
+def test_batch_size_counts_distinct_ids(client, doc_ids):
+    pmcids = (doc_ids * app.RESEARCH_BATCH_MAX_SIZE)[:app.RESEARCH_BATCH_MAX_SIZE + 1]
+    response = batch(client, pmcids=pmcids, fields=["title"])
+    assert response.status_code == 200
+    assert response.get_json()["total"] == len(doc_ids)
+    assert batch(client, pmcids=[]).get_json()["data"] == {}
@@ -0,0 +1,45 @@
+import pytest
+
+import app
+from conftest import SMALL_CORPUS, write_papers
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_matching_etag_gets_a_304(client, small_corpus):
+    response = client.get('/api/categories')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+
+    revalidated = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == etag
+    assert client.get('/api/categories', headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_cached_body_is_served_again(client, small_corpus):
+    first = client.get('/api/research/PMC1000001')
+    second = client.get('/api/research/PMC1000001')
+    assert first.get_data() == second.get_data()
+    assert first.headers['ETag'] == second.headers['ETag']
+    # Each cache key has its own ETag
+    assert first.headers['ETag'] != client.get('/api/research/PMC1000002').headers['ETag']
+
+
+def test_new_corpus_version_invalidates_etags(client, small_corpus):
+    response = client.get('/api/categories')
+    etag = response.headers['ETag']
+    assert "Space Medicine" not in response.get_json()["categories"]
+
+    write_papers(small_corpus, SMALL_CORPUS + [dict(SMALL_CORPUS[0], PMCId="PMC1000004", Category="Space Medicine")])
+    assert app.CorpusReloader(0).reload()["reloaded"]
+
+    response = client.get('/api/categories', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert "Space Medicine" in response.get_json()["categories"]
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def search(client, facets):
+    return client.post('/api/search', json={"type": "Search_By_Title", "query": "", "facets": facets})
+
+
+def test_facets_accepts_a_single_name(client):
+    response = search(client, "category")
+    assert response.status_code == 200
+    assert list(response.get_json()["facets"]) == ["category"]
+
+
+def test_facets_accepts_true_and_lists(client):
+    assert set(search(client, True).get_json()["facets"]) == set(app.FacetIndex.FACETS)
+    assert list(search(client, ["year"]).get_json()["facets"]) == ["year"]
+
+
+@pytest.mark.parametrize("facets", [{"category": 1}, 3, ["year", 2], "colour"])
+def test_facets_rejects_other_values(client, facets):
+    response = search(client, facets)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
+
+
+def total(client, query, **body):
+    return client.post('/api/search', json={"type": "all", "query": query, **body}).get_json()["total"]
+
+
+def paper_text(papers, ordinal):
+    parts = []
+    for field in app.SearchIndex.FIELDS:
+        value = papers.field(ordinal, field)
+        parts.append(' '.join(map(str, value)) if isinstance(value, list) else str(value or ''))
+    return ' '.join(parts).lower()
+
+
+def test_query_terms_match_inside_words(client):
+    papers = app.current_corpus()['research_data']
+    response = client.post('/api/search', json={"type": "Search_By_Title", "query": "gravity", "limit": 200})
+    data = response.get_json()
+    # Every paper mentioning "microgravity" is found by "gravity"
+    containing = {papers.doc_ids[o] for o in range(len(papers)) if 'microgravity' in paper_text(papers, o)}
+    assert containing
+    found = {r["pmcid"] for r in data["results"]}
+    while data["next_offset"] is not None:
+        data = client.post('/api/search', json={"type": "Search_By_Title", "query": "gravity",
+                                                "limit": 200, "offset": data["next_offset"]}).get_json()
+        found.update(r["pmcid"] for r in data["results"])
+    assert containing <= found
+    assert total(client, "gravity") > total(client, "microgravity")
+
+
+def test_short_terms_match_word_starts():
+    index = app.current_corpus()['search_index']
+    assert all(index.vocabulary[t].startswith('ra') for t in index.expand('ra'))
+    assert any(not index.vocabulary[t].startswith('rad') for t in index.expand('rad'))
+
+
+@pytest.mark.parametrize("filters", [["year"], "2020", {"year_from": "soon"}, {"year_to": [2020]}, {"year": {"from": 2020}}])
+def test_malformed_filters_are_a_400(client, filters):
+    for path in ('/api/search', '/api/search/export'):
+        response = client.post(path, json={"type": "all", "query": "mice", "filters": filters})
+        assert response.status_code == 400
+        assert response.get_json()["success"] is False
+
+
+def test_year_bounds_filter_the_results(client):
+    data = client.post('/api/search', json={"type": "all", "query": "", "limit": 200,
+                                            "filters": {"year_from": "2015", "year_to": 2016}}).get_json()
+    assert data["total"] > 0
+    assert all(2015 <= int(r["year"]) <= 2016 for r in data["results"])
+
+
+@pytest.mark.parametrize("fields", [[["x"]], {"title": True}, 5])
+def test_export_rejects_fields_that_are_not_names(client, fields):
+    response = client.post('/api/search/export', json={"type": "all", "query": "mice", "fields": fields})
+    assert response.status_code == 400
+    assert "available_fields" in response.get_json()
+
+
+def test_export_streams_the_requested_fields(client):
+    response = client.post('/api/search/export', json={"type": "all", "query": "mice", "fields": "pmcid,title"})
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(rows) == int(response.headers['X-Total-Count'])
+    assert all(set(row) == {"pmcid", "title"} for row in rows)
+
+
+def search_page(client, query, **body):
+    return client.post('/api/search', json={"type": "all", "query": query, **body}).get_json()
+
+
+def test_title_hits_rank_above_abstract_hits(client, small_corpus):
+    data = search_page(client, "bone")
+    assert [r["pmcid"] for r in data["results"]] == ["PMC1000001", "PMC1000002"]
+    assert data["results"][0]["score"] > data["results"][1]["score"] > 0
+
+
+def test_empty_query_lists_papers_in_corpus_order(client, small_corpus):
+    data = search_page(client, "")
+    assert [r["pmcid"] for r in data["results"]] == ["PMC1000001", "PMC1000002", "PMC1000003"]
+    assert {r["score"] for r in data["results"]} == {0}
+
+
+def test_pages_partition_the_ranking(client):
+    full = search_page(client, "radiation mice", limit=app.SEARCH_MAX_LIMIT)
+    ranking = [r["pmcid"] for r in full["results"]]
+    scores = [r["score"] for r in full["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+    paged, offset = [], 0
+    while offset is not None and offset < len(ranking):
+        data = search_page(client, "radiation mice", limit=7, offset=offset)
+        assert data["total"] == full["total"] and data["offset"] == offset
+        paged.extend(r["pmcid"] for r in data["results"])
+        offset = data["next_offset"]
+    assert paged[:len(ranking)] == ranking
+
+
+def test_last_page_has_no_next_offset(client):
+    total = search_page(client, "arabidopsis")["total"]
+    data = search_page(client, "arabidopsis", limit=5, offset=total - 2)
+    assert len(data["results"]) == 2
+    assert data["next_offset"] is None
+    assert search_page(client, "arabidopsis", offset=total + 10)["results"] == []
+
+
+def test_limit_is_clamped(client):
+    assert search_page(client, "", limit=10 ** 6)["limit"] == app.SEARCH_MAX_LIMIT
+    assert search_page(client, "", limit=0)["limit"] == 1
+    response = client.post('/api/search', json={"type": "all", "query": "", "limit": "many"})
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+import pytest
+
+import app
+
+
+def paper_terms(papers, ordinal):
+    terms = set()
+    for field in app.SearchIndex.FIELDS:
+        value = papers.field(ordinal, field)
+        if isinstance(value, list):
+            value = ' '.join(str(v) for v in value)
+        terms.update(app.tokenize(value))
+    return terms
+
+
+def term_matches(term, token):
+    if len(token) >= app.SEARCH_INFIX_MIN_LENGTH:
+        return token in term
+    return term.startswith(token)
+
+
+def scan(papers, query, match):
+    # Linear scan over every paper's own fields, as the index should answer
+    tokens = app.tokenize(query)
+    combine = all if match == 'all' else any
+    return {ordinal for ordinal in range(len(papers))
+            if combine(any(term_matches(term, token) for term in paper_terms(papers, ordinal)) for token in tokens)}
+
+
+@pytest.mark.parametrize("query", ["mice", "bone loss", "gravity", "ra", "rad", "arabidopsis", "2b", "zzqx"])
+@pytest.mark.parametrize("match", ["any", "all"])
+def test_index_matches_a_linear_scan(query, match):
+    corpus = app.current_corpus()
+    # A search type with no SEARCHES source only uses the paper fields
+    scores = corpus['search_index'].search(query, 'none', match)
+    assert set(scores) == scan(corpus['research_data'], query, match)
+
+
+def test_sources_only_add_matches():
+    index = app.current_corpus()['search_index']
+    for query in ("mice", "radiation"):
+        assert set(index.search(query, 'none')) <= set(index.search(query, 'all'))
@@ -0,0 +1,24 @@
+import pytest
+
+import app
+
+
+def test_incomplete_store_fails_at_construction():
+    class HistoryOnlyStore(app.SessionStore):
+        def history(self, user_id):
+            return []
+
+    with pytest.raises(TypeError):
+        HistoryOnlyStore(10, 60, 5)
+
+
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: app.MemorySessionStore(10, 60, 2),
+    lambda tmp_path: app.SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), 10, 60, 2),
+])
+def test_history_keeps_the_newest_messages(tmp_path, make_store):
+    store = make_store(tmp_path)
+    store.touch("user")
+    for text in ("one", "two", "three"):
+        store.append_message("user", {"type": "question", "content": text})
+    assert [m["content"] for m in store.history("user")] == ["two", "three"]
@@ -0,0 +1,75 @@
+import pytest
+
+import app
+
+
+@pytest.fixture(scope='module')
+def built():
+    return app.build_corpus_from_sources()
+
+
+@pytest.fixture
+def snapshot(tmp_path, built):
+    path = str(tmp_path / 'corpus.snapshot')
+    app.write_snapshot(path, built)
+    return path
+
+
+def test_snapshot_round_trip(built, snapshot):
+    loaded = app.load_snapshot(snapshot)
+    assert loaded['source'] == 'snapshot'
+    assert loaded['version'] == built['version']
+    assert loaded['search_types'] == built['search_types']
+
+    papers = built['research_data']
+    assert list(loaded['research_data'].doc_ids) == list(papers.doc_ids)
+    for doc_id in papers:
+        assert loaded['research_data'][doc_id] == papers[doc_id]
+
+    for query in ("mice", "bone loss", "gravity", "ra", ""):
+        for search_type in ("all", "Search_By_Title", "Search_By_Author"):
+            scores = built['search_index'].search(query, search_type)
+            assert loaded['search_index'].search(query, search_type) == pytest.approx(scores)
+        bitmap = app.bitmap_from_ordinals(scores)
+        assert loaded['facet_index'].counts(bitmap) == built['facet_index'].counts(bitmap)
+
+    kinds = app.SuggestIndex.KINDS
+    for query in ("mi", "bone", "space b"):
+        assert (loaded['suggest_index'].suggest(query, kinds, 10, loaded['research_data'])
+                == built['suggest_index'].suggest(query, kinds, 10, papers))
+
+
+def test_stale_snapshot_is_ignored(snapshot, monkeypatch):
+    monkeypatch.setattr(app, 'source_fingerprint', lambda: [["RESEARCH_PAPER_DATA/new.json", 1, 1]])
+    assert app.load_snapshot(snapshot) is None
+
+
+def test_unreadable_snapshots_are_ignored(tmp_path, snapshot):
+    assert app.load_snapshot(str(tmp_path / 'missing.snapshot')) is None
+
+    garbage = tmp_path / 'garbage.snapshot'
+    garbage.write_bytes(b'not a snapshot at all')
+    assert app.load_snapshot(str(garbage)) is None
+
+    # Same file, another format version
+    with open(snapshot, 'rb') as f:
+        data = bytearray(f.read())
+    data[len(app.SNAPSHOT_MAGIC)] += 1
+    other_format = tmp_path / 'other.snapshot'
+    other_format.write_bytes(bytes(data))
+    assert app.load_snapshot(str(other_format)) is None
+
+
+def test_load_corpus_falls_back_to_the_sources(small_corpus, tmp_path, monkeypatch):
+    path = tmp_path / 'corpus.snapshot'
+    monkeypatch.setattr(app, 'CORPUS_SNAPSHOT_PATH', str(path))
+    assert app.load_corpus()['source'] == 'json'
+
+    app.write_snapshot(str(path), app.load_corpus())
+    assert app.load_corpus()['source'] == 'snapshot'
+
+    # Editing a source makes the snapshot stale
+    small_corpus.write_text(small_corpus.read_text() + '\n')
+    corpus = app.load_corpus()
+    assert corpus['source'] == 'json'
+    assert len(corpus['research_data']) == 3
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def table_of(entries):
+    return app.SuggestTable.build([(key, key.title(), count, 0) for key, count in entries])
+
+
+def ranked_scan(entries, prefix, limit):
+    # Best matching word start of every entry, ranked as the table should
+    entries = sorted(entries)
+    best = {}
+    for entry, (key, count) in enumerate(entries):
+        for match in app.SUGGEST_WORD_START.finditer(key):
+            start = match.start()
+            if start and match.end() - start < app.SUGGEST_MIN_WORD_LENGTH:
+                continue
+            if key[start:].startswith(prefix):
+                rank = (-count, start > 0, entry)
+                best[entry] = min(best.get(entry, rank), rank)
+    return sorted(best, key=best.get)[:limit]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_completions_match_a_ranked_scan(seed):
+    rng = random.Random(seed)
+    words = ['bone', 'bones', 'muscle', 'mice', 'microgravity', 'ra', 'radiation', 'root', 'rat']
+    keys = {' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(400)}
+    entries = [(key, rng.randint(1, 5)) for key in keys]
+    table = table_of(entries)
+    for prefix in ('b', 'bone', 'bones m', 'mi', 'micro', 'r', 'ra', 'rat', 'x'):
+        for limit in (1, 3, 20):
+            # Small limits make the wide-range search run, large ones the sort
+            assert table.complete(prefix, limit) == ranked_scan(entries, prefix, limit)
+
+
+def test_more_papers_first_then_matches_at_the_start():
+    table = table_of([("bone loss", 2), ("loss of bone", 2), ("bone density", 1), ("mice bone", 5)])
+    labels = [table.labels[entry] for entry in table.complete('bone', 10)]
+    assert labels == ["Mice Bone", "Bone Loss", "Loss Of Bone", "Bone Density"]
+
+
+def test_trailing_space_completes_whole_words():
+    index = app.SuggestIndex({'author': table_of([("john smith", 1), ("johnson", 3)])})
+    assert [m["value"] for m in index.suggest("John", ['author'], 5, None)['author']] == ["Johnson", "John Smith"]
+    assert [m["value"] for m in index.suggest("john ", ['author'], 5, None)['author']] == ["John Smith"]
+
+
+def test_suggest_endpoint(client, small_corpus):
+    data = client.get('/api/suggest?q=Micro').get_json()
+    assert data["suggestions"]["keyword"] == [{"value": "microgravity", "count": 1}]
+    assert data["suggestions"]["title"] == [
+        {"value": "Bone loss in microgravity", "count": 1, "pmcid": "PMC1000001"}]
+
+    data = client.get('/api/suggest?q=human&types=category').get_json()
+    assert data["suggestions"] == {"category": [{"value": "Human Research", "count": 2}]}
+    assert client.get('/api/suggest?q=').get_json()["suggestions"]["title"] == []
+
+
+def test_suggest_limit(client):
+    for limit in (1, 3):
+        suggestions = client.get(f'/api/suggest?q=s&types=keyword&limit={limit}').get_json()["suggestions"]
+        assert len(suggestions["keyword"]) == limit
+    counts = [m["count"] for m in client.get('/api/suggest?q=s&limit=1000').get_json()["suggestions"]["author"]]
+    assert len(counts) == app.SUGGEST_MAX_LIMIT
+    assert counts == sorted(counts, reverse=True)
+
+
+@pytest.mark.parametrize("query", ["types=colour", "limit=many"])
+def test_suggest_rejects_bad_parameters(client, query):
+    response = client.get(f'/api/suggest?q=bone&{query}')
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -30,48 +30,80 @@ const Chatbot = ({ paperContext = {} }) => {
     setInputMessage('');
     setIsTyping(true);
 
+    const botId = messages.length + 2;
+    const updateBotMessage = (text) => {
+      setMessages(prev => {
+        if (prev.some(message => message.id === botId)) {
+          return prev.map(message => (message.id === botId ? { ...message, text } : message));
+        }
+        return [...prev, { id: botId, text, sender: 'bot', timestamp: new Date() }];
+      });
+    };
+
     try {
-      // Call Gemini API through backend
-      const response = await fetch(`${API_BASE}/api/chat`, {
+      // Stream the Gemini answer through the backend (Server-Sent Events)
+      const response = await fetch(`${API_BASE}/api/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
         credentials: 'include', // Important for session management
-        body: JSON.stringify({
-          message: inputMessage,
-          paper_context: paperContext
-        })
+        // The backend builds the paper context itself from the doc id, which
+        // unlike the PMCID is unique to the paper on screen
+        body: JSON.stringify(paperContext.doc_id
+          ? { message: inputMessage, doc_id: paperContext.doc_id }
+          : { message: inputMessage, paper_context: paperContext })
       });
 
-      const data = await response.json();
+      if (!response.ok || !response.body) {
+        const data = await response.json();
+        updateBotMessage(`Sorry, I encountered an error: ${data.error}. Please try again.`);
+        return;
+      }
 
-      if (data.success) {
-        const botResponse = {
-          id: messages.length + 2,
-          text: data.response,
-          sender: 'bot',
-          timestamp: new Date()
-        };
-        setMessages(prev => [...prev, botResponse]);
-      } else {
-        const errorResponse = {
-          id: messages.length + 2,
-          text: `Sorry, I encountered an error: ${data.error}. Please try again.`,
-          sender: 'bot',
-          timestamp: new Date()
-        };
-        setMessages(prev => [...prev, errorResponse]);
+      // HTML of the completed lines, plus the raw text of the line in progress
+      let html = '';
+      let rawText = '';
+      let buffer = '';
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+
+      const escapeHtml = (text) => text
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;');
+
+      const handleEvent = (event, data) => {
+        if (event === 'chunk') {
+          html += data.html;
+          rawText += data.text;
+          const pendingLine = rawText.slice(rawText.lastIndexOf('\n') + 1);
+          setIsTyping(false);
+          updateBotMessage(html + (html && pendingLine ? '<br>' : '') + escapeHtml(pendingLine));
+        } else if (event === 'done') {
+          updateBotMessage(html + data.html);
+        } else if (event === 'error') {
+          updateBotMessage(`Sorry, I encountered an error: ${data.error}. Please try again.`);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const rawEvent of events) {
+          const eventLine = rawEvent.split('\n').find(line => line.startsWith('event: '));
+          const dataLine = rawEvent.split('\n').find(line => line.startsWith('data: '));
+          if (eventLine && dataLine) {
+            handleEvent(eventLine.slice(7), JSON.parse(dataLine.slice(6)));
+          }
+        }
       }
     } catch (error) {
       console.error('Chat error:', error);
-      const errorResponse = {
-        id: messages.length + 2,
-        text: "Sorry, I'm having trouble connecting to the AI service. Please check your internet connection and try again.",
-        sender: 'bot',
-        timestamp: new Date()
-      };
-      setMessages(prev => [...prev, errorResponse]);
+      updateBotMessage("Sorry, I'm having trouble connecting to the AI service. Please check your internet connection and try again.");
     } finally {
       setIsTyping(false);
     }
@@ -93,7 +125,8 @@ const Chatbot = ({ paperContext = {} }) => {
     setExportStatus('Preparing PDF export...');
 
     try {
-      const response = await fetch(`${API_BASE}/api/export-chat`, {
+      // Start a background export job (answered at once if this conversation was exported before)
+      const jobResponse = await fetch(`${API_BASE}/api/export-chat/jobs`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -103,6 +136,22 @@ const Chatbot = ({ paperContext = {} }) => {
           paper_title: paperContext.title || 'Research Paper Discussion'
         })
       });
+      let job = await jobResponse.json();
+
+      // Poll until the PDF is rendered
+      while (job.success && job.status === 'pending') {
+        await new Promise(resolve => setTimeout(resolve, 500));
+        const statusResponse = await fetch(`${API_BASE}${job.status_url}`, { credentials: 'include' });
+        job = await statusResponse.json();
+      }
+
+      if (!job.success) {
+        setExportStatus(`❌ Export failed: ${job.error}`);
+        setTimeout(() => setExportStatus(''), 5000);
+        return;
+      }
+
+      const response = await fetch(`${API_BASE}${job.download_url}`, { credentials: 'include' });
 
       if (response.ok) {
         // Get the PDF blob
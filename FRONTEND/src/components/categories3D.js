@@ -223,7 +223,11 @@ export default function ConstellationOfProgressViz({ animateIntro = false, preSe
     async function load() {
       try {
         setIsLoading(true);
-        const res = await fetch(`${API_BASE}/api/research-papers`);
+        // Summary is not used here, so leave it out of the payload
+        const fields = ["Experiment No.", "Title", "Link", "PMCId", "Category", "Study Year", "Abstract"];
+        const res = await fetch(
+          `${API_BASE}/api/research-papers?fields=${encodeURIComponent(fields.join(","))}`
+        );
         const json = await res.json();
         if (!res.ok || json.success === false) {
           throw new Error(json.error || `Failed to load research papers`);
@@ -1,6 +1,10 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 const API_BASE = "https://bio-astra-backend.onrender.com";
+// Search fields with typeahead, and the /api/suggest type each one completes
+const SUGGEST_TYPES = { title: 'title', author: 'author', keywords: 'keyword' };
+// Results fetched per /api/search request; "Load more" fetches the next page
+const SEARCH_PAGE_SIZE = 50;
 
 const FindYourInterest = () => {
   const navigate = useNavigate();
@@ -8,6 +12,9 @@ const FindYourInterest = () => {
   const [searchResults, setSearchResults] = useState([]);
   const [overviewOpenMap, setOverviewOpenMap] = useState({});
   const [isSearching, setIsSearching] = useState(false);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  // The last search request, its total match count and where the next page starts
+  const [searchPaging, setSearchPaging] = useState(null);
   const [showRestoredMessage, setShowRestoredMessage] = useState(false);
   const [searchParams, setSearchParams] = useState({
     title: '',
@@ -16,11 +23,14 @@ const FindYourInterest = () => {
     keywords: '',
     timeRange: 'all'
   });
+  const [suggestions, setSuggestions] = useState({ title: [], author: [], keywords: [] });
+  const suggestTimer = useRef(null);
 
   // Load search state from localStorage on component mount
   useEffect(() => {
     const savedSearchResults = localStorage.getItem('searchResults');
     const savedSearchParams = localStorage.getItem('searchParams');
+    const savedSearchPaging = localStorage.getItem('searchPaging');
     
     if (savedSearchResults) {
       try {
@@ -43,6 +53,14 @@ const FindYourInterest = () => {
         console.error('Error parsing saved search params:', error);
       }
     }
+
+    if (savedSearchPaging) {
+      try {
+        setSearchPaging(JSON.parse(savedSearchPaging));
+      } catch (error) {
+        console.error('Error parsing saved search paging:', error);
+      }
+    }
   }, []);
 
   // Save search state to localStorage whenever it changes
@@ -56,6 +74,12 @@ const FindYourInterest = () => {
     localStorage.setItem('searchParams', JSON.stringify(searchParams));
   }, [searchParams]);
 
+  useEffect(() => {
+    if (searchPaging) {
+      localStorage.setItem('searchPaging', JSON.stringify(searchPaging));
+    }
+  }, [searchPaging]);
+
   // Sample search results for demonstration
   const sampleResults = [
     {
@@ -90,67 +114,137 @@ const FindYourInterest = () => {
     }
   ];
 
+  // Overviews for a page of results in one request instead of one per paper
+  const loadOverviews = async (pmcids) => {
+    const batchSize = 100;
+    for (let i = 0; i < pmcids.length; i += batchSize) {
+      try {
+        const resp = await fetch(`${API_BASE}/api/research/batch`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ pmcids: pmcids.slice(i, i + batchSize), fields: ['overview'] })
+        });
+        const data = await resp.json();
+        if (!data.success) continue;
+        const papers = data.data || {};
+        setSearchResults(prev => prev.map(r => {
+          if (r.overviewLoaded || !papers[r.pmcid]) return r;
+          const overviewText = papers[r.pmcid].overview || '';
+          return { ...r, overview: overviewText, overviewPreview: getPreviewText(overviewText, 4), overviewLoaded: true };
+        }));
+      } catch (e) {
+        // Overviews still load one at a time when opened
+      }
+    }
+  };
+
+  // One page of results for a search request, starting at offset
+  const fetchSearchPage = async (request, offset) => {
+    const response = await fetch(`${API_BASE}/api/search`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ ...request, limit: SEARCH_PAGE_SIZE, offset })
+    });
+    const data = await response.json();
+    if (!data.success) {
+      throw new Error(data.error);
+    }
+    // Matching and ranking happen on the server, so pages line up with total
+    return { results: data.results || [], total: data.total, nextOffset: data.next_offset };
+  };
+
   const handleSearch = async (e) => {
     e.preventDefault();
     setIsSearching(true);
     
-    try {
-      const response = await fetch(`${API_BASE}/api/search`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          type: searchParams.category || 'all',
-          query: searchParams.title || searchParams.author || searchParams.keywords,
-          filters: {
-            year: searchParams.timeRange !== 'all' ? searchParams.timeRange : null,
-            category: searchParams.category || null
-          }
-        })
-      });
-      
-      const data = await response.json();
-      
-      if (data.success) {
-        let results = data.results || [];
-        const q = (searchParams.title || searchParams.author || searchParams.keywords || '').toLowerCase();
-        if (q && q.trim()) {
-          results = results.filter(r => {
-            const inTitle = (r.title || '').toLowerCase().includes(q);
-            const inAuthor = (r.author || '').toLowerCase().includes(q);
-            const inCategory = (r.category || '').toLowerCase().includes(q);
-            const inKeywords = Array.isArray(r.keywords) ? r.keywords.join(' ').toLowerCase().includes(q) : (r.keywords || '').toLowerCase().includes(q);
-            return inTitle || inAuthor || inCategory || inKeywords;
-          });
-        }
-        setSearchResults(results);
-      } else {
-        console.error('Search failed:', data.error);
-        setSearchResults([]);
+    const request = {
+      type: searchParams.category || 'all',
+      query: searchParams.title || searchParams.author || searchParams.keywords,
+      filters: {
+        year: searchParams.timeRange !== 'all' ? searchParams.timeRange : null,
+        category: searchParams.category || null
       }
+    };
+    
+    try {
+      const { results, total, nextOffset } = await fetchSearchPage(request, 0);
+      setSearchResults(results);
+      setSearchPaging({ request, total, nextOffset });
+      loadOverviews(results.map(r => r.pmcid).filter(Boolean));
     } catch (error) {
       console.error('Search error:', error);
       setSearchResults([]);
+      setSearchPaging(null);
     } finally {
       setIsSearching(false);
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!searchPaging || searchPaging.nextOffset == null) return;
+    setIsLoadingMore(true);
+    try {
+      const { results, total, nextOffset } = await fetchSearchPage(searchPaging.request, searchPaging.nextOffset);
+      setSearchResults(prev => {
+        const seen = new Set(prev.map(r => r.pmcid));
+        return [...prev, ...results.filter(r => !seen.has(r.pmcid))];
+      });
+      setSearchPaging(prev => ({ ...prev, total, nextOffset }));
+      loadOverviews(results.map(r => r.pmcid).filter(Boolean));
+    } catch (error) {
+      console.error('Search error:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const handleInputChange = (field, value) => {
     setSearchParams(prev => ({
       ...prev,
       [field]: value
     }));
+    if (SUGGEST_TYPES[field]) {
+      requestSuggestions(field, value);
+    }
+  };
+
+  // Typeahead: completions for what is being typed, once typing pauses
+  const requestSuggestions = (field, value) => {
+    clearTimeout(suggestTimer.current);
+    // Keywords are comma-separated: complete the last one
+    const head = field === 'keywords' ? value.slice(0, value.lastIndexOf(',') + 1) : '';
+    const q = value.slice(head.length).trimStart();
+    if (!q) {
+      setSuggestions(prev => ({ ...prev, [field]: [] }));
+      return;
+    }
+    suggestTimer.current = setTimeout(async () => {
+      try {
+        const type = SUGGEST_TYPES[field];
+        const resp = await fetch(`${API_BASE}/api/suggest?q=${encodeURIComponent(q)}&types=${type}&limit=8`);
+        const data = await resp.json();
+        if (data.success) {
+          const values = data.suggestions[type].map(s => (head ? `${head} ` : '') + s.value);
+          setSuggestions(prev => ({ ...prev, [field]: values }));
+        }
+      } catch (error) {
+        console.error('Suggest error:', error);
+      }
+    }, 120);
   };
 
   const clearSearchResults = () => {
     setSearchResults([]);
+    setSearchPaging(null);
     localStorage.removeItem('searchResults');
+    localStorage.removeItem('searchPaging');
   };
 
   const clearAllSearch = () => {
     setSearchResults([]);
+    setSearchPaging(null);
     setOverviewOpenMap({});
     setSearchParams({
       title: '',
@@ -161,6 +255,7 @@ const FindYourInterest = () => {
     });
     localStorage.removeItem('searchResults');
     localStorage.removeItem('searchParams');
+    localStorage.removeItem('searchPaging');
   };
 
   const getPreviewText = (text, lines = 3) => {
@@ -262,7 +357,12 @@ const FindYourInterest = () => {
                   onChange={(e) => handleInputChange('title', e.target.value)}
                   placeholder="Enter publication title..."
                   className="input-field w-full"
+                  list="suggest-title"
+                  autoComplete="off"
                 />
+                <datalist id="suggest-title">
+                  {suggestions.title.map(value => <option key={value} value={value} />)}
+                </datalist>
               </div>
 
               {/* Search by Author */}
@@ -276,7 +376,12 @@ const FindYourInterest = () => {
                   onChange={(e) => handleInputChange('author', e.target.value)}
                   placeholder="Enter author name..."
                   className="input-field w-full"
+                  list="suggest-author"
+                  autoComplete="off"
                 />
+                <datalist id="suggest-author">
+                  {suggestions.author.map(value => <option key={value} value={value} />)}
+                </datalist>
               </div>
 
               {/* Search by Category */}
@@ -327,7 +432,12 @@ const FindYourInterest = () => {
                 onChange={(e) => handleInputChange('keywords', e.target.value)}
                 placeholder="Enter keywords (comma-separated)..."
                 className="input-field w-full"
+                list="suggest-keywords"
+                autoComplete="off"
               />
+              <datalist id="suggest-keywords">
+                {suggestions.keywords.map(value => <option key={value} value={value} />)}
+              </datalist>
             </div>
 
             {/* Search Buttons */}
@@ -417,7 +527,9 @@ const FindYourInterest = () => {
         {searchResults.length > 0 && (
           <div className="card">
             <h2 className="text-2xl font-bold text-white mb-6">
-              Search Results ({searchResults.length} publications found)
+              Search Results ({searchPaging && searchPaging.total != null
+                ? `showing ${searchResults.length} of ${searchPaging.total} publications found`
+                : `${searchResults.length} publications found`})
             </h2>
             
             <div className="space-y-4">
@@ -496,6 +608,19 @@ const FindYourInterest = () => {
                 </div>
               ))}
             </div>
+            
+            {searchPaging && searchPaging.nextOffset != null && (
+              <div className="mt-6 text-center">
+                <button
+                  type="button"
+                  onClick={handleLoadMore}
+                  disabled={isLoadingMore}
+                  className="btn-secondary text-lg px-6 py-3 disabled:opacity-50"
+                >
+                  {isLoadingMore ? 'Loading...' : `Load More (${searchPaging.total - searchPaging.nextOffset} remaining)`}
+                </button>
+              </div>
+            )}
           </div>
         )}
 
@@ -326,6 +326,7 @@ const ResearchPage = () => {
                     abstract: researchData.Abstract || researchData.abstract,
                     conclusion: researchData.Conclusion || researchData.conclusion,
                     pmcid: researchData.PMCId || researchData.pmcid,
+                    doc_id: pmcid,
                     year: researchData['Study Year'] || researchData.year
                   }}
                 />